@@ -0,0 +1,31 @@
+"""
+Storage backends for data.db_connect.
+db_connect's functions do the caching, invalidation and error mapping;
+a backend only knows how to run the underlying document operations.
+The backend is picked with the DB_BACKEND env var:
+    mongo (the default): MongoDB through PyMongo.
+    sqlite: JSON documents in an embedded SQLite file (SQLITE_PATH),
+        for single-node deployments and tests with no Mongo server.
+"""
+import os
+
+BACKEND_VAR = 'DB_BACKEND'
+SQLITE_PATH_VAR = 'SQLITE_PATH'
+
+MONGO = 'mongo'
+SQLITE = 'sqlite'
+BACKENDS = [MONGO, SQLITE]
+
+DEFAULT_SQLITE_PATH = 'se_data.sqlite3'
+
+
+def get_backend_name() -> str:
+    name = os.environ.get(BACKEND_VAR, MONGO).lower()
+    if name not in BACKENDS:
+        raise ValueError(f'Bad {BACKEND_VAR}: {name}; '
+                         f'must be one of {BACKENDS}')
+    return name
+
+
+def get_sqlite_path() -> str:
+    return os.environ.get(SQLITE_PATH_VAR, DEFAULT_SQLITE_PATH)
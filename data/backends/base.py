@@ -0,0 +1,120 @@
+"""
+The interface every storage backend implements.
+Filters, projections and update documents use MongoDB's syntax
+(the subset this app uses), so callers are the same on every backend.
+"""
+# bulk_write() op kinds; each op is a tuple starting with its kind:
+#   (INSERT, doc), (UPDATE, filt, update, upsert), (DELETE, filt)
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+
+ASCENDING = 1
+DESCENDING = -1
+# the direction of each field of a full-text index:
+TEXT = 'text'
+
+
+class DuplicateKeyError(ValueError):
+    """
+    A write would have broken a unique index.
+    """
+    pass
+
+
+class StorageBackend:
+    name = None
+
+    def create_index(self, db: str, collection: str, keys: list,
+                     unique: bool = False) -> tuple:
+        """
+        Build the index on `keys` (a list of (field, direction) pairs)
+        if it is not there. Returns (index name, whether it was built).
+        """
+        raise NotImplementedError()
+
+    def insert_one(self, db: str, collection: str, doc: dict):
+        """
+        Insert `doc` and return its _id.
+        """
+        raise NotImplementedError()
+
+    def find(self, db: str, collection: str, filt: dict = None,
+             projection=None, sort: list = None, limit: int = None,
+             batch_size: int = None):
+        """
+        Return an iterable of the docs matching `filt`.
+        """
+        raise NotImplementedError()
+
+    def find_one(self, db: str, collection: str, filt: dict,
+                 projection=None):
+        for doc in self.find(db, collection, filt, projection, limit=1):
+            return doc
+        return None
+
+    def update_one(self, db: str, collection: str, filt: dict,
+                   update: dict, upsert: bool = False) -> tuple:
+        """
+        Apply `update` to the first doc matching `filt`.
+        Returns (number matched, number modified).
+        """
+        raise NotImplementedError()
+
+    def find_one_and_update(self, db: str, collection: str, filt: dict,
+                            update: dict, projection=None,
+                            return_new: bool = True):
+        raise NotImplementedError()
+
+    def delete_one(self, db: str, collection: str, filt: dict) -> int:
+        raise NotImplementedError()
+
+    def find_one_and_delete(self, db: str, collection: str, filt: dict,
+                            projection=None):
+        """
+        Delete the first doc matching `filt` and return it,
+        or None if nothing matched.
+        """
+        raise NotImplementedError()
+
+    def bulk_write(self, db: str, collection: str, ops: list,
+                   ordered: bool = False) -> tuple:
+        """
+        Run `ops` (see INSERT, UPDATE and DELETE above).
+        Returns (counts in Mongo's bulk_api_result form,
+        {op index: error message}).
+        """
+        raise NotImplementedError()
+
+    def group(self, db: str, collection: str, key: str, value: str,
+              filt: dict = None) -> dict:
+        """
+        Return {each distinct `key`: the `value`s of the docs with it},
+        each list sorted, for the docs matching `filt`.
+        Docs missing `key` are grouped under None.
+        """
+        raise NotImplementedError()
+
+    def text_search(self, db: str, collection: str, query: str,
+                    projection=None, limit: int = None,
+                    skip: int = 0) -> list:
+        """
+        Rank the docs matching any word of `query` on the collection's
+        text index. Returns (doc, score) pairs, best first.
+        Raises NotImplementedError where there is no text index to use.
+        """
+        raise NotImplementedError(f'{self.name} has no text search')
+
+    def explain(self, db: str, collection: str, filt: dict = None,
+                sort: list = None) -> list:
+        """
+        Summarize how the backend would run a find:
+        one line per plan step, naming any index used.
+        """
+        raise NotImplementedError()
+
+    def watch(self, db: str, pipeline: list, **kwargs):
+        """
+        Open a change stream on `db`, where the backend has them.
+        """
+        raise NotImplementedError(f'{self.name} has no change streams')
@@ -0,0 +1,162 @@
+"""
+MongoDB through PyMongo.
+The client itself is owned by data.db_connect (it is per-process and
+fork-aware); this backend is handed a function that returns it.
+"""
+import pymongo as pm
+
+from data.backends import MONGO
+import data.backends.base as bkb
+
+# where text_search() asks for each doc's relevance:
+SCORE = '_score'
+
+
+def make_op(op: tuple):
+    kind = op[0]
+    if kind == bkb.INSERT:
+        return pm.InsertOne(op[1])
+    if kind == bkb.UPDATE:
+        return pm.UpdateOne(op[1], op[2], upsert=op[3])
+    if kind == bkb.DELETE:
+        return pm.DeleteOne(op[1])
+    raise ValueError(f'Bad bulk op: {kind}')
+
+
+class MongoBackend(bkb.StorageBackend):
+    name = MONGO
+
+    def __init__(self, get_client):
+        self.get_client = get_client
+
+    def coll(self, db, collection):
+        return self.get_client()[db][collection]
+
+    def create_index(self, db, collection, keys, unique=False):
+        coll = self.coll(db, collection)
+        existing = coll.index_information()
+        if all(direction == bkb.TEXT for _, direction in keys):
+            self.drop_other_text_indexes(coll, keys, existing)
+        name = coll.create_index(keys, unique=unique)
+        return name, name not in existing
+
+    def drop_other_text_indexes(self, coll, keys, existing):
+        """
+        A collection has at most one text index, so one over other
+        fields is dropped to make way for the one declared now.
+        """
+        name = '_'.join(f'{field}_{direction}' for field, direction in keys)
+        for old, info in existing.items():
+            if old != name and any(direction == bkb.TEXT
+                                   for _, direction in info['key']):
+                try:
+                    coll.drop_index(old)
+                except pm.errors.OperationFailure:
+                    pass  # another process dropped it first
+
+    def insert_one(self, db, collection, doc):
+        try:
+            return self.coll(db, collection).insert_one(doc).inserted_id
+        except pm.errors.DuplicateKeyError as err:
+            raise bkb.DuplicateKeyError(str(err.details))
+
+    def find(self, db, collection, filt=None, projection=None, sort=None,
+             limit=None, batch_size=None):
+        kwargs = {}
+        if batch_size:
+            kwargs['batch_size'] = batch_size
+        cursor = self.coll(db, collection).find(filt or {}, projection,
+                                                **kwargs)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    def find_one(self, db, collection, filt, projection=None):
+        return self.coll(db, collection).find_one(filt, projection)
+
+    def update_one(self, db, collection, filt, update, upsert=False):
+        try:
+            result = self.coll(db, collection).update_one(filt, update,
+                                                          upsert=upsert)
+        except pm.errors.DuplicateKeyError as err:
+            raise bkb.DuplicateKeyError(str(err.details))
+        return result.matched_count, result.modified_count
+
+    def find_one_and_update(self, db, collection, filt, update,
+                            projection=None, return_new=True):
+        ret_doc = (pm.ReturnDocument.AFTER if return_new
+                   else pm.ReturnDocument.BEFORE)
+        return self.coll(db, collection).find_one_and_update(
+            filt, update, projection=projection, return_document=ret_doc)
+
+    def delete_one(self, db, collection, filt):
+        return self.coll(db, collection).delete_one(filt).deleted_count
+
+    def find_one_and_delete(self, db, collection, filt, projection=None):
+        return self.coll(db, collection).find_one_and_delete(
+            filt, projection=projection)
+
+    def bulk_write(self, db, collection, ops, ordered=False):
+        errors = {}
+        try:
+            result = self.coll(db, collection).bulk_write(
+                [make_op(op) for op in ops], ordered=ordered)
+            details = result.bulk_api_result
+        except pm.errors.BulkWriteError as err:
+            details = err.details
+            for write_err in details.get('writeErrors', []):
+                errors[write_err['index']] = write_err['errmsg']
+        return details, errors
+
+    def group(self, db, collection, key, value, filt=None):
+        pipeline = [
+            {'$match': filt or {}},
+            # sorting first lets a (key, value) index feed the group:
+            {'$sort': {key: pm.ASCENDING, value: pm.ASCENDING}},
+            {'$group': {'_id': f'${key}', 'values': {'$push': f'${value}'}}},
+        ]
+        return {group['_id']: group['values']
+                for group in self.coll(db, collection).aggregate(pipeline)}
+
+    def text_search(self, db, collection, query, projection=None,
+                    limit=None, skip=0):
+        score = {'$meta': 'textScore'}
+        pipeline = [
+            {'$match': {'$text': {'$search': query}}},
+            {'$sort': {SCORE: score}},
+        ]
+        if skip:
+            pipeline.append({'$skip': skip})
+        if limit:
+            pipeline.append({'$limit': limit})
+        if projection:
+            pipeline.append({'$project': {SCORE: score,
+                                          **dict.fromkeys(projection, 1)}})
+        else:
+            pipeline.append({'$addFields': {SCORE: score}})
+        return [(doc, doc.pop(SCORE)) for doc
+                in self.coll(db, collection).aggregate(pipeline)]
+
+    def explain(self, db, collection, filt=None, sort=None):
+        cursor = self.coll(db, collection).find(filt or {})
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()
+        steps = []
+        stage = plan.get('queryPlanner', {}).get('winningPlan', {})
+        while stage:
+            step = stage.get('stage', '?')
+            if stage.get('indexName'):
+                step += f" {stage['indexName']}"
+            steps.append(step)
+            stage = stage.get('inputStage')
+        stats = plan.get('executionStats', {})
+        if stats:
+            steps.append(f"keys examined: {stats.get('totalKeysExamined')}, "
+                         f"docs examined: {stats.get('totalDocsExamined')}")
+        return steps
+
+    def watch(self, db, pipeline, **kwargs):
+        return self.get_client()[db].watch(pipeline, **kwargs)
@@ -0,0 +1,672 @@
+"""
+An embedded SQLite backend: each collection is a table of JSON documents
+(one row per doc: its encoded _id and the rest of the doc as JSON).
+Mongo-style filters are translated to SQL on json_extract(), and
+declared indexes become expression indexes on the same expressions,
+so lookups on hot keys (email, title, state...) are index seeks.
+Only the query and update operators this app uses are supported;
+anything else raises ValueError rather than silently matching wrong.
+A text index is an FTS5 table kept in step with its collection
+by triggers, so every process sees every write, ranked with bm25().
+"""
+from copy import deepcopy
+import itertools
+import os
+import re
+import sqlite3
+import threading
+
+from bson import json_util, ObjectId
+
+from data.backends import SQLITE
+import data.backends.base as bkb
+
+MONGO_ID = '_id'
+ID_COL = 'id'
+DOC_COL = 'doc'
+MEMORY = ':memory:'
+
+BUSY_TIMEOUT = 5.0  # seconds to wait for another writer
+
+# Top-level fields that have held an array in some doc, per table.
+# Filters on them must look inside the array (as Mongo does),
+# which an index on the field cannot serve.
+ARRAY_FIELDS_TABLE = '_array_fields'
+
+# a collection's text index is the FTS5 table named for it plus this:
+FTS_SUFFIX = '.fts'
+
+COMPARISONS = {'$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}
+
+memory_ids = itertools.count()
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_name(db: str, collection: str) -> str:
+    return f'{db}.{collection}'
+
+
+def field_expr(field: str) -> str:
+    """
+    The SQL for a (possibly dotted) field of the doc.
+    Queries and index definitions must use the very same text
+    for SQLite to use an expression index.
+    """
+    if field == MONGO_ID:
+        return ID_COL
+    if '"' in field or "'" in field:
+        raise ValueError(f'Bad field name: {field}')
+    path = '$' + ''.join(f'."{part}"' for part in field.split('.'))
+    return f"json_extract({DOC_COL}, '{path}')"
+
+
+def json_path(field: str) -> str:
+    return "'$" + ''.join(f'."{part}"' for part in field.split('.')) + "'"
+
+
+def encode_id(doc_id) -> str:
+    return json_util.dumps(doc_id)
+
+
+def encode_doc(doc: dict) -> str:
+    return json_util.dumps({key: val for key, val in doc.items()
+                            if key != MONGO_ID})
+
+
+def decode_row(row) -> dict:
+    doc = {MONGO_ID: json_util.loads(row[0])}
+    doc.update(json_util.loads(row[1]))
+    return doc
+
+
+def sql_value(val):
+    """
+    Turn a filter value into something SQLite compares the way
+    json_extract() returns the stored value.
+    """
+    if isinstance(val, bool):
+        return int(val)
+    if isinstance(val, (str, int, float)):
+        return val
+    raise ValueError(f'Unsupported filter value: {val!r}')
+
+
+def get_path(doc: dict, field: str):
+    for part in field.split('.'):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def has_path(doc: dict, field: str) -> bool:
+    for part in field.split('.'):
+        if not isinstance(doc, dict) or part not in doc:
+            return False
+        doc = doc[part]
+    return True
+
+
+def set_path(doc: dict, field: str, val):
+    parts = field.split('.')
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = val
+
+
+def unset_path(doc: dict, field: str):
+    parts = field.split('.')
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def apply_update(doc: dict, update: dict, inserting: bool = False):
+    """
+    Apply Mongo update operators to `doc` in place.
+    """
+    for oper, fields in update.items():
+        if oper == '$set' or (oper == '$setOnInsert' and inserting):
+            for field, val in fields.items():
+                set_path(doc, field, deepcopy(val))
+        elif oper == '$setOnInsert':
+            continue
+        elif oper == '$unset':
+            for field in fields:
+                unset_path(doc, field)
+        elif oper == '$inc':
+            for field, val in fields.items():
+                set_path(doc, field, (get_path(doc, field) or 0) + val)
+        elif oper == '$push':
+            for field, val in fields.items():
+                items = get_path(doc, field)
+                if items is None:
+                    items = []
+                    set_path(doc, field, items)
+                if not isinstance(items, list):
+                    raise ValueError(f'Cannot $push to non-array {field}')
+                if isinstance(val, dict) and '$each' in val:
+                    items.extend(deepcopy(val['$each']))
+                else:
+                    items.append(deepcopy(val))
+        else:
+            raise ValueError(f'Unsupported update operator: {oper}')
+    if MONGO_ID in update.get('$set', {}):
+        raise ValueError(f'{MONGO_ID} cannot be updated')
+
+
+def seed_from_filter(filt: dict) -> dict:
+    """
+    The doc an upsert starts from: the filter's equality conditions.
+    """
+    doc = {}
+    for field, cond in (filt or {}).items():
+        if field == '$and':
+            for sub_filt in cond:
+                doc.update(seed_from_filter(sub_filt))
+        elif field.startswith('$'):
+            continue
+        elif isinstance(cond, dict) and any(key.startswith('$')
+                                            for key in cond):
+            if '$eq' in cond:
+                set_path(doc, field, cond['$eq'])
+        else:
+            set_path(doc, field, cond)
+    return doc
+
+
+def apply_projection(doc: dict, projection) -> dict:
+    if projection is None:
+        return doc
+    if isinstance(projection, dict):
+        include_id = bool(projection.get(MONGO_ID, 1))
+        fields = {field: val for field, val in projection.items()
+                  if field != MONGO_ID}
+        if fields and not any(fields.values()):
+            ret = deepcopy(doc)
+            for field in fields:
+                unset_path(ret, field)
+            if not include_id:
+                ret.pop(MONGO_ID, None)
+            return ret
+        fields = [field for field, val in fields.items() if val]
+    else:
+        include_id = True
+        fields = [field for field in projection if field != MONGO_ID]
+    ret = {}
+    if include_id and MONGO_ID in doc:
+        ret[MONGO_ID] = doc[MONGO_ID]
+    for field in fields:
+        if has_path(doc, field):
+            set_path(ret, field, get_path(doc, field))
+    return ret
+
+
+class SQLiteBackend(bkb.StorageBackend):
+    name = SQLITE
+
+    def __init__(self, path: str = MEMORY):
+        if path == MEMORY:
+            # a named shared-cache memory DB, so all threads see one DB:
+            self.uri = f'file:se_mem_{next(memory_ids)}?mode=memory' \
+                       '&cache=shared'
+            self.memory = True
+        else:
+            self.uri = f'file:{path}'
+            self.memory = False
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.pid = None
+        self.tables = set()
+        self.array_fields = {}
+        # an in-memory DB lives only while a connection to it is open:
+        self.anchor = self.connect() if self.memory else None
+
+    def connect(self):
+        conn = sqlite3.connect(self.uri, uri=True, timeout=BUSY_TIMEOUT,
+                               isolation_level=None,
+                               check_same_thread=False)
+        if not self.memory:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {ARRAY_FIELDS_TABLE} '
+                     '(tbl TEXT, field TEXT, PRIMARY KEY (tbl, field))')
+        return conn
+
+    def get_conn(self):
+        """
+        Each thread (and each forked process) gets its own connection.
+        """
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.local = threading.local()
+                    self.tables = set()
+                    self.pid = os.getpid()
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            self.local.conn = conn
+        return conn
+
+    def table(self, db, collection) -> str:
+        name = table_name(db, collection)
+        if name not in self.tables:
+            self.get_conn().execute(
+                f'CREATE TABLE IF NOT EXISTS {quote(name)} '
+                f'({ID_COL} TEXT PRIMARY KEY, {DOC_COL} TEXT NOT NULL)')
+            self.tables.add(name)
+        return name
+
+    def transaction(self):
+        return Transaction(self.get_conn())
+
+    # array field bookkeeping:
+
+    def load_array_fields(self):
+        """
+        Re-read the array fields if any connection has committed
+        since we last looked (other workers may have added some).
+        """
+        conn = self.get_conn()
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if version != getattr(self.local, 'data_version', None):
+            fields = {}
+            for tbl, field in conn.execute(
+                    f'SELECT tbl, field FROM {ARRAY_FIELDS_TABLE}'):
+                fields.setdefault(tbl, set()).add(field)
+            self.array_fields = fields
+            self.local.data_version = version
+
+    def note_arrays(self, conn, tbl, doc):
+        known = self.array_fields.setdefault(tbl, set())
+        for field, val in doc.items():
+            if isinstance(val, list) and field not in known:
+                conn.execute(f'INSERT OR IGNORE INTO {ARRAY_FIELDS_TABLE} '
+                             'VALUES (?, ?)', (tbl, field))
+                known.add(field)
+
+    # filter translation:
+
+    def is_array_field(self, tbl, field) -> bool:
+        return field.split('.')[0] in self.array_fields.get(tbl, ())
+
+    def match_values(self, tbl, field, sql_op, vals, params) -> str:
+        """
+        SQL true when `field` (or, for array fields, any element of it)
+        stands in `sql_op` relation to the values.
+        """
+        if field == MONGO_ID:
+            vals = [encode_id(val) for val in vals]
+        else:
+            vals = [sql_value(val) for val in vals]
+        params.extend(vals)
+        if sql_op == 'IN':
+            rhs = '(' + ', '.join('?' * len(vals)) + ')'
+        else:
+            rhs = '?'
+        if field != MONGO_ID and self.is_array_field(tbl, field):
+            # json_each() of a scalar is the scalar itself,
+            # so this also matches docs where the field is not an array:
+            return (f'EXISTS (SELECT 1 FROM json_each({DOC_COL}, '
+                    f'{json_path(field)}) WHERE value {sql_op} {rhs})')
+        return f'{field_expr(field)} {sql_op} {rhs}'
+
+    def field_cond(self, tbl, field, cond, params) -> str:
+        if not (isinstance(cond, dict)
+                and any(key.startswith('$') for key in cond)):
+            cond = {'$eq': cond}
+        clauses = []
+        for oper, val in cond.items():
+            if oper == '$eq':
+                if val is None:
+                    clauses.append(f'{field_expr(field)} IS NULL')
+                else:
+                    clauses.append(self.match_values(tbl, field, '=',
+                                                     [val], params))
+            elif oper == '$ne':
+                clauses.append('NOT COALESCE(' + self.field_cond(
+                    tbl, field, {'$eq': val}, params) + ', 0)')
+            elif oper in ('$in', '$nin'):
+                vals = [item for item in val if item is not None]
+                ors = []
+                if len(vals) < len(val):
+                    ors.append(f'{field_expr(field)} IS NULL')
+                if vals:
+                    ors.append(self.match_values(tbl, field, 'IN', vals,
+                                                 params))
+                in_sql = '(' + (' OR '.join(ors) or '0') + ')'
+                if oper == '$nin':
+                    in_sql = f'NOT COALESCE({in_sql}, 0)'
+                clauses.append(in_sql)
+            elif oper in COMPARISONS:
+                clauses.append(self.match_values(tbl, field,
+                                                 COMPARISONS[oper],
+                                                 [val], params))
+            elif oper == '$exists':
+                test = 'IS NOT NULL' if val else 'IS NULL'
+                if field == MONGO_ID:
+                    clauses.append(f'{ID_COL} {test}')
+                else:
+                    clauses.append(f'json_type({DOC_COL}, '
+                                   f'{json_path(field)}) {test}')
+            else:
+                raise ValueError(f'Unsupported query operator: {oper}')
+        return ' AND '.join(f'({clause})' for clause in clauses)
+
+    def where(self, tbl, filt, params) -> str:
+        clauses = []
+        for field, cond in (filt or {}).items():
+            if field in ('$and', '$or', '$nor'):
+                subs = [self.where(tbl, sub, params) or '1' for sub in cond]
+                joiner = ' AND ' if field == '$and' else ' OR '
+                sql = '(' + joiner.join(f'({sub})' for sub in subs) + ')'
+                if field == '$nor':
+                    sql = f'NOT {sql}'
+                clauses.append(sql)
+            elif field.startswith('$'):
+                raise ValueError(f'Unsupported query operator: {field}')
+            else:
+                clauses.append(self.field_cond(tbl, field, cond, params))
+        return ' AND '.join(f'({clause})' for clause in clauses)
+
+    def select_sql(self, tbl, filt, sort=None, limit=None) -> tuple:
+        self.load_array_fields()
+        params = []
+        sql = f'SELECT {ID_COL}, {DOC_COL} FROM {quote(tbl)}'
+        where = self.where(tbl, filt, params)
+        if where:
+            sql += f' WHERE {where}'
+        if sort:
+            sql += ' ORDER BY ' + ', '.join(
+                field_expr(field)
+                + (' DESC' if direction == bkb.DESCENDING else ' ASC')
+                for field, direction in sort)
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return sql, params
+
+    # the backend interface:
+
+    def create_index(self, db, collection, keys, unique=False):
+        tbl = self.table(db, collection)
+        name = '_'.join(f'{field}_{direction}' for field, direction in keys)
+        if all(direction == bkb.TEXT for _, direction in keys):
+            return self.create_text_index(tbl, name,
+                                          [field for field, _ in keys])
+        index = f'{tbl}.{name}'
+        conn = self.get_conn()
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+            (index,)).fetchone()
+        if exists:
+            return name, False
+        cols = ', '.join(
+            field_expr(field)
+            + (' DESC' if direction == bkb.DESCENDING else '')
+            for field, direction in keys)
+        try:
+            conn.execute(f'CREATE {"UNIQUE " if unique else ""}INDEX '
+                         f'IF NOT EXISTS {quote(index)} '
+                         f'ON {quote(tbl)} ({cols})')
+        except sqlite3.IntegrityError as err:
+            raise bkb.DuplicateKeyError(f'Cannot build {name}: {err}')
+        return name, True
+
+    def has_table(self, name) -> bool:
+        return self.get_conn().execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (name,)).fetchone() is not None
+
+    def create_text_index(self, tbl, name, fields):
+        """
+        An FTS5 table holding `fields` of each doc under the doc's rowid,
+        filled from the docs there now and kept current by triggers.
+        (Rowids only change on VACUUM; rebuild the index after one.)
+        """
+        fts = tbl + FTS_SUFFIX
+        replace = self.has_table(fts)
+        if replace and self.fts_fields(fts) == fields:
+            return name, False
+        cols = ', '.join(quote(field) for field in fields)
+
+        def values(row):
+            return ', '.join(f'json_extract({row}.{DOC_COL}, '
+                             f'{json_path(field)})' for field in fields)
+
+        insert_sql = (f'INSERT INTO {quote(fts)} (rowid, {cols}) '
+                      f'VALUES (new.rowid, {values("new")});')
+        delete_sql = f'DELETE FROM {quote(fts)} WHERE rowid = old.rowid;'
+        with self.transaction() as conn:
+            if replace:
+                # one text index per collection, as in Mongo:
+                self.drop_text_index(conn, fts)
+            conn.execute(f'CREATE VIRTUAL TABLE {quote(fts)} '
+                         f'USING fts5({cols})')
+            conn.execute(f'INSERT INTO {quote(fts)} (rowid, {cols}) '
+                         f'SELECT rowid, {values(quote(tbl))} '
+                         f'FROM {quote(tbl)}')
+            for event, body in [('INSERT', insert_sql),
+                                ('DELETE', delete_sql),
+                                ('UPDATE', delete_sql + ' ' + insert_sql)]:
+                conn.execute(f'CREATE TRIGGER {quote(f"{fts}.{event}")} '
+                             f'AFTER {event} ON {quote(tbl)} '
+                             f'BEGIN {body} END')
+        return name, True
+
+    def fts_fields(self, fts) -> list:
+        return [row[1] for row in self.get_conn().execute(
+            f'PRAGMA table_info({quote(fts)})')]
+
+    def drop_text_index(self, conn, fts):
+        for event in ['INSERT', 'DELETE', 'UPDATE']:
+            conn.execute(f'DROP TRIGGER IF EXISTS {quote(f"{fts}.{event}")}')
+        conn.execute(f'DROP TABLE IF EXISTS {quote(fts)}')
+
+    def insert(self, conn, tbl, doc):
+        if MONGO_ID not in doc:
+            # as PyMongo does, give the caller's doc its new _id:
+            doc[MONGO_ID] = ObjectId()
+        try:
+            conn.execute(f'INSERT INTO {quote(tbl)} VALUES (?, ?)',
+                         (encode_id(doc[MONGO_ID]), encode_doc(doc)))
+        except sqlite3.IntegrityError as err:
+            raise bkb.DuplicateKeyError(f'{err}: {doc.get(MONGO_ID)}')
+        self.note_arrays(conn, tbl, doc)
+        return doc[MONGO_ID]
+
+    def insert_one(self, db, collection, doc):
+        tbl = self.table(db, collection)
+        with self.transaction() as conn:
+            return self.insert(conn, tbl, doc)
+
+    def find(self, db, collection, filt=None, projection=None, sort=None,
+             limit=None, batch_size=None):
+        tbl = self.table(db, collection)
+        sql, params = self.select_sql(tbl, filt, sort, limit)
+        cursor = self.get_conn().execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size or cursor.arraysize)
+            if not rows:
+                return
+            for row in rows:
+                yield apply_projection(decode_row(row), projection)
+
+    def update(self, conn, tbl, filt, update, upsert=False) -> tuple:
+        """
+        Update the first doc matching `filt` inside the caller's
+        transaction. Returns (before, after, upserted id); before
+        is None if nothing matched.
+        """
+        if not update or not all(oper.startswith('$') for oper in update):
+            raise ValueError('Updates must use update operators')
+        sql, params = self.select_sql(tbl, filt, limit=1)
+        row = conn.execute(sql, params).fetchone()
+        if row is None:
+            if not upsert:
+                return None, None, None
+            doc = seed_from_filter(filt)
+            apply_update(doc, update, inserting=True)
+            return None, doc, self.insert(conn, tbl, doc)
+        before = decode_row(row)
+        after = deepcopy(before)
+        apply_update(after, update)
+        if after != before:
+            try:
+                conn.execute(f'UPDATE {quote(tbl)} SET {DOC_COL} = ? '
+                             f'WHERE {ID_COL} = ?',
+                             (encode_doc(after), row[0]))
+            except sqlite3.IntegrityError as err:
+                raise bkb.DuplicateKeyError(str(err))
+            self.note_arrays(conn, tbl, after)
+        return before, after, None
+
+    def update_one(self, db, collection, filt, update, upsert=False):
+        tbl = self.table(db, collection)
+        with self.transaction() as conn:
+            before, after, _ = self.update(conn, tbl, filt, update, upsert)
+        if before is None:
+            return 0, 0
+        return 1, int(before != after)
+
+    def find_one_and_update(self, db, collection, filt, update,
+                            projection=None, return_new=True):
+        tbl = self.table(db, collection)
+        with self.transaction() as conn:
+            before, after, _ = self.update(conn, tbl, filt, update)
+        doc = after if return_new else before
+        if before is None or doc is None:
+            return None
+        return apply_projection(doc, projection)
+
+    def delete(self, conn, tbl, filt) -> int:
+        sql, params = self.select_sql(tbl, filt, limit=1)
+        return conn.execute(
+            f'DELETE FROM {quote(tbl)} WHERE {ID_COL} = '
+            f'(SELECT {ID_COL} FROM ({sql}))', params).rowcount
+
+    def delete_one(self, db, collection, filt):
+        tbl = self.table(db, collection)
+        with self.transaction() as conn:
+            return self.delete(conn, tbl, filt)
+
+    def find_one_and_delete(self, db, collection, filt, projection=None):
+        tbl = self.table(db, collection)
+        with self.transaction() as conn:
+            sql, params = self.select_sql(tbl, filt, limit=1)
+            row = conn.execute(sql, params).fetchone()
+            if row is None:
+                return None
+            conn.execute(f'DELETE FROM {quote(tbl)} WHERE {ID_COL} = ?',
+                         (row[0],))
+        return apply_projection(decode_row(row), projection)
+
+    def bulk_write(self, db, collection, ops, ordered=False):
+        """
+        All ops run in one transaction; an op that breaks a unique index
+        is reported and skipped (ordered: and so is everything after it).
+        """
+        tbl = self.table(db, collection)
+        details = {'nInserted': 0, 'nMatched': 0, 'nModified': 0,
+                   'nRemoved': 0, 'nUpserted': 0, 'upserted': [],
+                   'writeErrors': []}
+        errors = {}
+        with self.transaction() as conn:
+            for idx, op in enumerate(ops):
+                try:
+                    if op[0] == bkb.INSERT:
+                        self.insert(conn, tbl, op[1])
+                        details['nInserted'] += 1
+                    elif op[0] == bkb.UPDATE:
+                        before, after, new_id = self.update(
+                            conn, tbl, op[1], op[2], upsert=op[3])
+                        if new_id is not None:
+                            details['nUpserted'] += 1
+                            details['upserted'].append(
+                                {'index': idx, MONGO_ID: new_id})
+                        elif before is not None:
+                            details['nMatched'] += 1
+                            details['nModified'] += int(before != after)
+                    elif op[0] == bkb.DELETE:
+                        details['nRemoved'] += self.delete(conn, tbl, op[1])
+                    else:
+                        raise ValueError(f'Bad bulk op: {op[0]}')
+                except bkb.DuplicateKeyError as err:
+                    errors[idx] = str(err)
+                    details['writeErrors'].append(
+                        {'index': idx, 'errmsg': str(err)})
+                    if ordered:
+                        break
+        return details, errors
+
+    def group(self, db, collection, key, value, filt=None):
+        tbl = self.table(db, collection)
+        self.load_array_fields()
+        params = []
+        where = self.where(tbl, filt, params)
+        key_expr = field_expr(key)
+        value_expr = field_expr(value)
+        # ordered by (key, value), so a (key, value) index covers it:
+        sql = (f'SELECT {key_expr}, {value_expr} FROM {quote(tbl)}'
+               + (f' WHERE {where}' if where else '')
+               + f' ORDER BY {key_expr}, {value_expr}')
+        groups = {}
+        for key_val, value_val in self.get_conn().execute(sql, params):
+            groups.setdefault(key_val, []).append(value_val)
+        return groups
+
+    def text_search(self, db, collection, query, projection=None,
+                    limit=None, skip=0):
+        tbl = self.table(db, collection)
+        fts = tbl + FTS_SUFFIX
+        if not self.has_table(fts):
+            raise NotImplementedError(f'No text index on {collection}')
+        # any of the words, each quoted so FTS5 syntax is never parsed:
+        words = re.findall(r'\w+', query)
+        match = ' OR '.join(f'"{word}"' for word in words)
+        if not match:
+            return []
+        rows = self.get_conn().execute(
+            f'SELECT t.{ID_COL}, t.{DOC_COL}, bm25({quote(fts)}) AS rank '
+            f'FROM {quote(fts)} JOIN {quote(tbl)} t '
+            f'ON t.rowid = {quote(fts)}.rowid '
+            f'WHERE {quote(fts)} MATCH ? ORDER BY rank LIMIT ? OFFSET ?',
+            (match, limit or -1, skip or 0))
+        # bm25() is lower for better matches:
+        return [(apply_projection(decode_row(row), projection), -row[2])
+                for row in rows]
+
+    def explain(self, db, collection, filt=None, sort=None) -> list:
+        """
+        Return SQLite's query plan for a find, to check index use.
+        """
+        tbl = self.table(db, collection)
+        sql, params = self.select_sql(tbl, filt, sort)
+        return [row[-1] for row in self.get_conn().execute(
+            f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+class Transaction:
+    """
+    BEGIN IMMEDIATE takes the write lock up front, so a
+    read-modify-write cannot interleave with another writer.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+        return False
@@ -0,0 +1,201 @@
+from bson import ObjectId
+import pytest
+
+import data.backends.base as bkb
+import data.backends.sqlite as sql
+import data.db_connect as dbc
+import data.people as ppl
+import data.roles as rls
+
+TEST_DB = 'testDB'
+TEST_COLLECT = 'things'
+
+
+@pytest.fixture
+def backend():
+    backend = sql.SQLiteBackend()
+    backend.create_index(TEST_DB, TEST_COLLECT, [('email', bkb.ASCENDING)],
+                         unique=True)
+    backend.create_index(TEST_DB, TEST_COLLECT, [('state', bkb.ASCENDING)])
+    return backend
+
+
+@pytest.fixture
+def things(backend):
+    for num, (email, state, roles) in enumerate([
+        ('a@nyu.edu', 'SUB', ['AU']),
+        ('b@nyu.edu', 'REV', ['ED', 'RE']),
+        ('c@nyu.edu', 'SUB', []),
+    ]):
+        backend.insert_one(TEST_DB, TEST_COLLECT,
+                           {'email': email, 'state': state,
+                            'roles': roles, 'num': num})
+    return backend
+
+
+def find(backend, filt, **kwargs):
+    return list(backend.find(TEST_DB, TEST_COLLECT, filt, **kwargs))
+
+
+def test_insert_assigns_object_id(backend):
+    doc = {'email': 'a@nyu.edu'}
+    doc_id = backend.insert_one(TEST_DB, TEST_COLLECT, doc)
+    assert isinstance(doc_id, ObjectId)
+    assert doc['_id'] == doc_id
+    found = backend.find_one(TEST_DB, TEST_COLLECT, {'_id': doc_id})
+    assert found == {'_id': doc_id, 'email': 'a@nyu.edu'}
+
+
+def test_unique_index(things):
+    with pytest.raises(bkb.DuplicateKeyError):
+        things.insert_one(TEST_DB, TEST_COLLECT, {'email': 'a@nyu.edu'})
+
+
+def test_create_index_idempotent(backend):
+    assert backend.create_index(TEST_DB, TEST_COLLECT,
+                                [('email', bkb.ASCENDING)]) == \
+        ('email_1', False)
+
+
+def test_lookup_uses_expression_index(things):
+    plan = things.explain(TEST_DB, TEST_COLLECT, {'email': 'a@nyu.edu'})
+    assert any('USING INDEX' in step for step in plan)
+
+
+@pytest.mark.parametrize('filt, nums', [
+    ({'state': 'SUB'}, [0, 2]),
+    ({'roles': 'ED'}, [1]),
+    ({'roles': {'$in': ['AU', 'RE']}}, [0, 1]),
+    ({'num': {'$gt': 0}}, [1, 2]),
+    ({'num': {'$ne': 1}}, [0, 2]),
+    ({'missing': {'$in': [None, 0]}}, [0, 1, 2]),
+    ({'missing': {'$exists': True}}, []),
+    ({'$or': [{'num': 0}, {'state': 'REV'}]}, [0, 1]),
+    ({'$and': [{'state': 'SUB'}, {'num': {'$gte': 1}}]}, [2]),
+])
+def test_filters(things, filt, nums):
+    assert sorted(doc['num'] for doc in find(things, filt)) == nums
+
+
+def test_sort_and_limit(things):
+    docs = find(things, {}, sort=[('num', bkb.DESCENDING)], limit=2)
+    assert [doc['num'] for doc in docs] == [2, 1]
+
+
+def test_projection(things):
+    doc = find(things, {'num': 0}, projection=['email'])[0]
+    assert set(doc) == {'_id', 'email'}
+    doc = find(things, {'num': 0}, projection={'roles': 0, '_id': 0})[0]
+    assert set(doc) == {'email', 'state', 'num'}
+
+
+def test_unsupported_operator(things):
+    with pytest.raises(ValueError):
+        find(things, {'email': {'$regex': 'a'}})
+
+
+def test_find_one_and_update(things):
+    update = {'$set': {'state': 'REJ'}, '$push': {'roles': 'X'},
+              '$inc': {'num': 10}}
+    before = things.find_one_and_update(TEST_DB, TEST_COLLECT,
+                                        {'num': 0}, update,
+                                        return_new=False)
+    assert before['state'] == 'SUB'
+    after = things.find_one(TEST_DB, TEST_COLLECT, {'email': 'a@nyu.edu'})
+    assert after['state'] == 'REJ'
+    assert after['roles'] == ['AU', 'X']
+    assert after['num'] == 10
+
+
+def test_update_one_upsert(things):
+    assert things.update_one(TEST_DB, TEST_COLLECT, {'email': 'd@nyu.edu'},
+                             {'$inc': {'num': 1}}, upsert=True) == (0, 0)
+    doc = things.find_one(TEST_DB, TEST_COLLECT, {'email': 'd@nyu.edu'})
+    assert doc['num'] == 1
+
+
+def test_delete_one(things):
+    assert things.delete_one(TEST_DB, TEST_COLLECT, {'state': 'SUB'}) == 1
+    assert len(find(things, {'state': 'SUB'})) == 1
+
+
+@pytest.mark.parametrize('ordered, inserted', [(False, 2), (True, 1)])
+def test_bulk_write(backend, ordered, inserted):
+    ops = [(bkb.INSERT, {'email': 'x@nyu.edu'}),
+           (bkb.INSERT, {'email': 'x@nyu.edu'}),
+           (bkb.INSERT, {'email': 'y@nyu.edu'})]
+    details, errors = backend.bulk_write(TEST_DB, TEST_COLLECT, ops,
+                                         ordered=ordered)
+    assert details['nInserted'] == inserted
+    assert list(errors) == [1]
+
+
+@pytest.fixture
+def sqlite_dbc():
+    old_backend = dbc.get_backend()
+    dbc.use_backend(sql.SQLiteBackend())
+    yield dbc.get_backend()
+    dbc.use_backend(old_backend)
+
+
+def test_failed_unique_index_does_not_block_creates(sqlite_dbc):
+    # written before the unique index on email existed:
+    for _ in range(2):
+        sqlite_dbc.insert_one(dbc.SE_DB, ppl.PEOPLE_COLLECT,
+                              {ppl.EMAIL: 'twice@nyu.edu'})
+    dbc.ensure_indexes()
+    assert (dbc.SE_DB, ppl.PEOPLE_COLLECT) in dbc.indexed
+    dbc.create(ppl.PEOPLE_COLLECT, {ppl.EMAIL: 'ok@nyu.edu'})
+    assert ppl.read_one('ok@nyu.edu')
+
+
+def test_db_connect_on_sqlite(sqlite_dbc):
+    ppl.create_person('Pat', 'NYU', 'pat@nyu.edu', rls.TEST_CODE)
+    with pytest.raises(ValueError):
+        ppl.create_person('Pat', 'NYU', 'pat@nyu.edu', rls.TEST_CODE)
+    assert ppl.read_one('pat@nyu.edu')[ppl.NAME] == 'Pat'
+    docs, next_token = ppl.read_page(limit=1)
+    assert len(docs) == 1
+    assert next_token is None
+
+
+def test_group(things):
+    groups = things.group(TEST_DB, TEST_COLLECT, 'state', 'email')
+    assert groups == {'SUB': ['a@nyu.edu', 'c@nyu.edu'],
+                      'REV': ['b@nyu.edu']}
+
+
+def test_find_one_and_delete(things):
+    doc = things.find_one_and_delete(TEST_DB, TEST_COLLECT, {'num': 1},
+                                     projection=['state'])
+    assert set(doc) == {'_id', 'state'}
+    assert find(things, {'num': 1}) == []
+    assert things.find_one_and_delete(TEST_DB, TEST_COLLECT,
+                                      {'num': 1}) is None
+
+
+def test_text_search(things):
+    with pytest.raises(NotImplementedError):
+        things.text_search(TEST_DB, TEST_COLLECT, 'nyu')
+    things.create_index(TEST_DB, TEST_COLLECT,
+                        [('email', bkb.TEXT), ('state', bkb.TEXT)])
+    things.insert_one(TEST_DB, TEST_COLLECT,
+                      {'email': 'd@nyu.edu', 'state': 'SUB SUB'})
+    # FTS5 syntax in the query is not parsed:
+    hits = things.text_search(TEST_DB, TEST_COLLECT, 'sub" OR',
+                              projection=['email'])
+    assert [doc['email'] for doc, _ in hits][0] == 'd@nyu.edu'
+    assert len(hits) == 3
+    things.delete_one(TEST_DB, TEST_COLLECT, {'email': 'd@nyu.edu'})
+    assert len(things.text_search(TEST_DB, TEST_COLLECT, 'sub')) == 2
+
+
+def test_text_index_replaced(things):
+    things.create_index(TEST_DB, TEST_COLLECT, [('email', bkb.TEXT)])
+    name, is_new = things.create_index(TEST_DB, TEST_COLLECT,
+                                       [('state', bkb.TEXT)])
+    assert is_new
+    assert things.create_index(TEST_DB, TEST_COLLECT,
+                               [('state', bkb.TEXT)]) == (name, False)
+    assert things.text_search(TEST_DB, TEST_COLLECT, 'nyu') == []
+    assert len(things.text_search(TEST_DB, TEST_COLLECT, 'sub')) == 2
@@ -0,0 +1,171 @@
+"""
+Keeps each worker's in-process caches in step with writes made
+by other workers.
+A background thread watches a MongoDB change stream for our collections
+and invalidates the local caches for whatever changed.
+If the stream breaks, it is reopened where it left off (from the last
+resume token), so changes made meanwhile are still delivered.
+Change streams need a replica set, so on a standalone mongod
+(or mongomock in tests) we fall back to polling a per-collection
+version counter that every write bumps.
+Our own writes come back to us too; those are told apart (see
+dbc.is_own_write() and dbc.read_other_versions()) so listeners that
+apply this process's writes themselves are not told about them again.
+"""
+import os
+import threading
+
+import pymongo as pm
+
+import data.db_connect as dbc
+import data.logger as lg
+
+log = lg.get_logger(__name__)
+
+WATCHED_COLLECTIONS = ['people', 'manuscripts', 'users', 'security']
+
+POLL_INTERVAL = 1.0  # seconds
+MAX_AWAIT_MS = 1000  # how long each change stream read waits for events
+RETRY_INTERVAL = 5.0  # seconds before reopening a broken change stream
+
+CHANGE_STREAM = 'change_stream'
+POLLING = 'polling'
+
+watcher = None
+watcher_pid = None
+watcher_lock = threading.Lock()
+
+
+class CacheWatcher(threading.Thread):
+    def __init__(self, collections: list = None, db=dbc.SE_DB,
+                 poll_interval: float = POLL_INTERVAL):
+        super().__init__(name='cache-watcher', daemon=True)
+        self.collections = collections or WATCHED_COLLECTIONS
+        self.db = db
+        self.poll_interval = poll_interval
+        self.mode = None
+        self.stopped = threading.Event()
+        self.versions = {}
+        # where to reopen a broken stream from:
+        self.resume_token = None
+        # set when a stream broke and we cannot resume it, so
+        # changes may have been missed:
+        self.missed = False
+
+    def invalidate_all(self):
+        for collection in self.collections:
+            dbc.invalidate(collection, self.db, remote=True)
+
+    def open_stream(self):
+        pipeline = [{'$match': {'ns.coll': {'$in': self.collections}}}]
+        kwargs = {'max_await_time_ms': MAX_AWAIT_MS}
+        if self.resume_token is not None:
+            kwargs['resume_after'] = self.resume_token
+        return dbc.get_backend().watch(self.db, pipeline, **kwargs)
+
+    def watch(self, stream):
+        with stream:
+            while not self.stopped.is_set():
+                change = stream.try_next()
+                # the token moves on even when no change came back:
+                self.resume_token = stream.resume_token
+                if change is None:
+                    continue
+                collection = change.get('ns', {}).get('coll')
+                if collection in self.collections:
+                    dbc.invalidate(
+                        collection, self.db,
+                        remote=not dbc.is_own_write(collection, self.db))
+
+    def poll_once(self):
+        versions = dbc.read_other_versions(self.db)
+        for collection in self.collections:
+            version = versions.get(collection, 0)
+            if version != self.versions.get(collection, 0):
+                dbc.invalidate(collection, self.db, remote=True)
+        self.versions = versions
+
+    def poll(self):
+        while not self.stopped.wait(self.poll_interval):
+            try:
+                self.poll_once()
+            except dbc.DB_ERRORS as err:
+                log.warning('cache_sync.poll.failed', error=str(err))
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                stream = self.open_stream()
+            except pm.errors.OperationFailure as err:
+                if self.resume_token is None:
+                    self.start_polling(err)
+                    return
+                # our place in the stream has aged out of the oplog:
+                log.warning('cache_sync.stream.resume_failed',
+                            error=str(err))
+                self.resume_token = None
+                self.missed = True
+                continue
+            except (NotImplementedError, TypeError, AttributeError) as err:
+                self.start_polling(err)
+                return
+            except pm.errors.PyMongoError as err:
+                log.warning('cache_sync.stream.open_failed',
+                            error=str(err))
+                self.stopped.wait(RETRY_INTERVAL)
+                continue
+            self.mode = CHANGE_STREAM
+            if self.missed:
+                # invalidate only now the new stream is open, so any
+                # write after this point is still seen
+                self.invalidate_all()
+                self.missed = False
+            try:
+                self.watch(stream)
+            except pm.errors.PyMongoError as err:
+                log.warning('cache_sync.stream.broken', error=str(err))
+                self.missed = self.resume_token is None
+                self.stopped.wait(RETRY_INTERVAL)
+
+    def start_polling(self, err):
+        """
+        No change streams here (a standalone server, a mock or a backend
+        without them): poll the version counters instead, until stopped.
+        """
+        log.info('cache_sync.polling', reason=str(err))
+        self.mode = POLLING
+        dbc.bump_versions = True
+        try:
+            self.versions = dbc.read_other_versions(self.db)
+        except dbc.DB_ERRORS as read_err:
+            log.warning('cache_sync.versions.failed', error=str(read_err))
+        self.poll()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def ensure_started() -> CacheWatcher:
+    """
+    Start this process's watcher if it is not running.
+    Threads do not survive a fork, so a forked worker starts its own.
+    Cheap enough to call on every request.
+    """
+    global watcher, watcher_pid
+    if watcher is not None and watcher_pid == os.getpid():
+        return watcher
+    with watcher_lock:
+        if watcher is None or watcher_pid != os.getpid():
+            watcher = CacheWatcher()
+            watcher_pid = os.getpid()
+            watcher.start()
+    return watcher
+
+
+def stop():
+    global watcher, watcher_pid
+    with watcher_lock:
+        if watcher is not None:
+            watcher.stop()
+        watcher = None
+        watcher_pid = None
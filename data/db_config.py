@@ -0,0 +1,102 @@
+"""
+Connection settings for our MongoClient.
+Every setting can come from a JSON config file (named by MONGO_CONFIG_FILE)
+and/or an environment variable; the environment wins.
+The defaults are sized for a WSGI worker running a handful of threads:
+each worker process gets its own pool.
+"""
+import json
+import os
+
+CONFIG_FILE_VAR = 'MONGO_CONFIG_FILE'
+
+# MongoClient option names:
+MAX_POOL_SIZE = 'maxPoolSize'
+MIN_POOL_SIZE = 'minPoolSize'
+MAX_IDLE_TIME_MS = 'maxIdleTimeMS'
+SERVER_SELECTION_TIMEOUT_MS = 'serverSelectionTimeoutMS'
+CONNECT_TIMEOUT_MS = 'connectTimeoutMS'
+SOCKET_TIMEOUT_MS = 'socketTimeoutMS'
+COMPRESSORS = 'compressors'
+
+DEFAULTS = {
+    # a few threads per worker, plus headroom for streaming responses:
+    MAX_POOL_SIZE: 20,
+    # keep a couple of warm connections so the first requests don't wait:
+    MIN_POOL_SIZE: 2,
+    # drop connections idle for a minute:
+    MAX_IDLE_TIME_MS: 60_000,
+    # fail fast if the server is down rather than hang a request:
+    SERVER_SELECTION_TIMEOUT_MS: 5_000,
+    CONNECT_TIMEOUT_MS: 5_000,
+    SOCKET_TIMEOUT_MS: 10_000,
+    # zlib ships with Python; zstd and snappy need extra packages:
+    COMPRESSORS: 'zlib',
+}
+
+# the env var that overrides each option:
+ENV_VARS = {
+    MAX_POOL_SIZE: 'MONGO_MAX_POOL_SIZE',
+    MIN_POOL_SIZE: 'MONGO_MIN_POOL_SIZE',
+    MAX_IDLE_TIME_MS: 'MONGO_MAX_IDLE_TIME_MS',
+    SERVER_SELECTION_TIMEOUT_MS: 'MONGO_SERVER_SELECTION_TIMEOUT_MS',
+    CONNECT_TIMEOUT_MS: 'MONGO_CONNECT_TIMEOUT_MS',
+    SOCKET_TIMEOUT_MS: 'MONGO_SOCKET_TIMEOUT_MS',
+    COMPRESSORS: 'MONGO_COMPRESSORS',
+}
+
+VALID_COMPRESSORS = ['zstd', 'snappy', 'zlib']
+
+
+def read_config_file(path: str) -> dict:
+    """
+    Return the options in a JSON config file.
+    Unknown keys are an error, so typos don't pass silently.
+    """
+    with open(path) as f:
+        config = json.load(f)
+    for key in config:
+        if key not in DEFAULTS:
+            raise ValueError(f'Unknown Mongo option in {path}: {key}')
+    return config
+
+
+def check_compressors(compressors: str) -> str:
+    for compressor in compressors.split(','):
+        if compressor and compressor not in VALID_COMPRESSORS:
+            raise ValueError(f'Bad Mongo compressor: {compressor}')
+    return compressors
+
+
+def get_client_options() -> dict:
+    """
+    Merge defaults, the config file and env vars (in that order)
+    into the keyword args for MongoClient.
+    """
+    options = dict(DEFAULTS)
+    config_file = os.environ.get(CONFIG_FILE_VAR)
+    if config_file:
+        options.update(read_config_file(config_file))
+    for option, env_var in ENV_VARS.items():
+        val = os.environ.get(env_var)
+        if val is None:
+            continue
+        if option == COMPRESSORS:
+            options[option] = val
+        else:
+            try:
+                options[option] = int(val)
+            except ValueError:
+                raise ValueError(f'{env_var} must be an integer: {val}')
+    options[COMPRESSORS] = check_compressors(options[COMPRESSORS])
+    if options[MIN_POOL_SIZE] > options[MAX_POOL_SIZE]:
+        raise ValueError(f'{MIN_POOL_SIZE} cannot exceed {MAX_POOL_SIZE}')
+    return options
+
+
+def main():
+    print(get_client_options())
+
+
+if __name__ == '__main__':
+    main()
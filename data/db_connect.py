@@ -1,10 +1,33 @@
 """
-All interaction with MongoDB should be through this file!
-We may be required to use a new database at any point.
+All interaction with the database should be through this file!
+We may be required to use a new database at any point:
+the document operations go through a storage backend
+(see data.backends), MongoDB by default.
 """
+import base64
+import binascii
+from collections import Counter, deque
+import json
 import os
+import sqlite3
+import threading
+import time
 
+from bson import ObjectId
+from bson.errors import InvalidId
 import pymongo as pm
+from pymongo import monitoring
+
+import data.backends as bk
+import data.backends.base as bkb
+from data.backends.mongo import MongoBackend
+from data.backends.sqlite import SQLiteBackend
+import data.db_config as dbcfg
+import data.db_metrics as dbm
+import data.logger as lg
+import data.query_cache as qc
+
+log = lg.get_logger(__name__)
 
 LOCAL = "0"
 CLOUD = "1"
@@ -12,45 +35,444 @@ CLOUD = "1"
 SE_DB = 'seDB'
 
 client = None
+client_pid = None
+client_lock = threading.RLock()
+
+# the storage backend every operation below goes through,
+# wrapped so every call is timed (see data.db_metrics):
+backend = None
+
+# what a failed database operation raises, on any backend:
+DB_ERRORS = (pm.errors.PyMongoError, sqlite3.Error)
+
+# Indexes declared by the data modules, built by ensure_indexes().
+# Each entry is (collection, keys, unique).
+INDEXES = []
+# the direction to give each field of a full-text index:
+TEXT_INDEX = bkb.TEXT
+# (db, collection) pairs whose declared indexes have been built:
+indexed = set()
+
+# Collections opt in to read caching with cache_collection().
+query_cache = qc.QueryCache()
+# Functions called with (db, collection) whenever a collection's
+# cached data goes stale; see on_invalidate().
+invalidation_listeners = []
+# ...and those called only when another worker wrote to it:
+remote_listeners = []
+# When other workers cannot see our writes through change streams,
+# each write also bumps a per-collection counter they poll.
+bump_versions = False
+VERSIONS_COLLECT = 'cache_versions'
+# Collections no worker caches, so writes to them bump no counter;
+# see skip_sync().
+unsynced = set()
+VERSION = 'version'
+
+# This process's own writes, so data.cache_sync can tell them from
+# other workers' when they come back to us: the version bumps we made,
+# per (db, collection), and when we made each recent write
+# (see is_own_write()).
+own_bumps = Counter()
+own_writes = {}
+own_lock = threading.Lock()
+# how long after our write a change stream event may be its echo:
+ECHO_WINDOW = 5.0  # seconds
 
 MONGO_ID = '_id'
 
+DEFAULT_BATCH_SIZE = 500
+MAX_PAGE_LIMIT = 1000
 
-def connect_db():
+# keys inside an opaque page token:
+TOKEN_KEY = 'k'
+TOKEN_ID = 'i'
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
     """
-    This provides a uniform way to connect to the DB across all uses.
-    Returns a mongo client object... maybe we shouldn't?
-    Also set global client variable.
-    We should probably either return a client OR set a
-    client global.
-    """
-    global client
-    if client is None:  # not connected yet!
-        print("Setting client because it is None.")
-        if os.environ.get("CLOUD_MONGO", LOCAL) == CLOUD:
-            password = os.environ.get("GAME_MONGO_PW")
-            if not password:
-                raise ValueError('You must set MONGO_PW to your password '
-                                 + 'to use Mongo in the cloud.')
-            print("Connecting to Mongo in the cloud.")
-            client = pm.MongoClient(
-                'mongodb+srv://'
+    Counts connection pool events so we can see how busy the pool is.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.stats = {
+            'created': 0,
+            'closed': 0,
+            'checked_out': 0,
+            'checked_in': 0,
+            'checkout_failed': 0,
+            'pools_cleared': 0,
+        }
+
+    def in_use(self) -> int:
+        return self.stats['checked_out'] - self.stats['checked_in']
+
+    def open(self) -> int:
+        return self.stats['created'] - self.stats['closed']
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.stats['pools_cleared'] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.stats['created'] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.stats['closed'] += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.stats['checkout_failed'] += 1
+
+    def connection_checked_out(self, event):
+        self.stats['checked_out'] += 1
+
+    def connection_checked_in(self, event):
+        self.stats['checked_in'] += 1
+
+
+pool_listener = PoolStatsListener()
+
+
+def get_pool_stats() -> dict:
+    """
+    Return the connection pool counters plus the current
+    number of open and in-use connections.
+    """
+    return {
+        **pool_listener.stats,
+        'open': pool_listener.open(),
+        'in_use': pool_listener.in_use(),
+    }
+
+
+def get_mongo_uri():
+    """
+    Return the URI of our cloud DB if CLOUD_MONGO is set,
+    else None, meaning the local server.
+    """
+    if os.environ.get("CLOUD_MONGO", LOCAL) == CLOUD:
+        password = os.environ.get("GAME_MONGO_PW")
+        if not password:
+            raise ValueError('You must set MONGO_PW to your password '
+                             + 'to use Mongo in the cloud.')
+        log.info('mongo.connect', where='cloud')
+        return ('mongodb+srv://'
                 f'404-error-not-found:{password}'
                 '@cluster0.cmb6h.mongodb.net/'
-                '?retryWrites=true&w=majority&appName=Cluster0',
-            )
-        else:
-            print("Connecting to Mongo locally.")
-            client = pm.MongoClient()
+                '?retryWrites=true&w=majority&appName=Cluster0')
+    log.info('mongo.connect', where='local')
+    return None
+
+
+def make_client():
+    """
+    Build a new MongoClient for this process.
+    """
+    return pm.MongoClient(get_mongo_uri(),
+                          event_listeners=[pool_listener],
+                          **dbcfg.get_client_options())
+
+
+def get_client():
+    """
+    Return this process's MongoClient, creating it on first use.
+    MongoClient is not fork-safe, so a client made before a fork
+    (e.g., by a preloading WSGI server) is never reused by the child:
+    the child builds its own on its first query.
+    """
+    global client, client_pid
+    if client is not None and client_pid == os.getpid():
+        return client
+    with client_lock:
+        if client is None or client_pid != os.getpid():
+            log.debug('mongo.client.create', pid=os.getpid())
+            client = make_client()
+            client_pid = os.getpid()
     return client
 
 
+def make_backend() -> bkb.StorageBackend:
+    """
+    Build the backend DB_BACKEND names.
+    """
+    if bk.get_backend_name() == bk.SQLITE:
+        return SQLiteBackend(bk.get_sqlite_path())
+    return MongoBackend(get_client)
+
+
+def get_backend() -> bkb.StorageBackend:
+    """
+    Return the storage backend, creating it on first use.
+    The first use also builds any missing declared indexes.
+    """
+    global backend
+    if backend is not None:
+        return backend
+    with client_lock:
+        if backend is None:
+            backend = dbm.InstrumentedBackend(make_backend())
+            if not indexed:
+                ensure_indexes()
+    return backend
+
+
+def use_backend(new_backend: bkb.StorageBackend):
+    """
+    Switch to `new_backend` (e.g., an in-memory SQLite DB for tests).
+    Indexes are rebuilt and cached queries dropped.
+    """
+    global backend
+    if not isinstance(new_backend, dbm.InstrumentedBackend):
+        new_backend = dbm.InstrumentedBackend(new_backend)
+    with client_lock:
+        backend = new_backend
+        indexed.clear()
+        query_cache.clear()
+
+
+def reset_client():
+    """
+    Forget the current client (and its pool stats) without closing it.
+    Runs in every forked child: the parent's sockets are not ours.
+    """
+    global client, client_pid
+    client = None
+    client_pid = None
+    pool_listener.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_client)
+
+
+def connect_db():
+    """
+    This provides a uniform way to connect to the DB across all uses.
+    Kept for callers that want the client itself; it is the same
+    lazily created, per-process client get_client() returns.
+    """
+    return get_client()
+
+
+def declare_index(collection: str, keys, unique: bool = False):
+    """
+    Record an index that `collection` needs.
+    `keys` is a field name or a list of (field, direction) pairs.
+    Data modules call this at import; ensure_indexes() builds them.
+    """
+    if isinstance(keys, str):
+        keys = [(keys, pm.ASCENDING)]
+    spec = (collection, list(keys), unique)
+    if spec not in INDEXES:
+        INDEXES.append(spec)
+
+
+def is_unique_key(collection: str, key: str) -> bool:
+    """
+    Is `key` alone declared unique on `collection`?
+    """
+    return key == MONGO_ID or any(
+        coll == collection and unique and [field for field, _ in keys] == [key]
+        for coll, keys, unique in INDEXES)
+
+
+def ensure_indexes(db=SE_DB, collections: list = None) -> dict:
+    """
+    Build every declared index (on `collections`, if given)
+    that is not there yet.
+    Safe to call repeatedly: existing indexes are left alone.
+    An index that cannot be built (e.g., a unique one over data that
+    already has duplicates) is logged and skipped; it is not retried
+    until the next ensure_indexes() on its collection.
+    Returns the names of the indexes built, keyed on collection.
+    """
+    built = {}
+    for collection, keys, unique in INDEXES:
+        if collections is not None and collection not in collections:
+            continue
+        try:
+            name, is_new = get_backend().create_index(db, collection, keys,
+                                                      unique=unique)
+        except (bkb.DuplicateKeyError,) + DB_ERRORS as err:
+            log.error('db.index.failed', collection=collection,
+                      keys=str(keys), unique=unique, error=str(err))
+            continue
+        if is_new:
+            built.setdefault(collection, []).append(name)
+    for collection in collections or {spec[0] for spec in INDEXES}:
+        indexed.add((db, collection))
+    for collection, names in built.items():
+        log.info('db.indexes.built', collection=collection, names=names)
+    return built
+
+
+def cache_collection(collection: str, ttl: float = qc.DEFAULT_TTL):
+    """
+    Opt `collection` in to the read-through query cache.
+    Cached reads live at most `ttl` seconds, and every write through
+    this module drops the collection's cached reads.
+    """
+    query_cache.enable(collection, ttl)
+
+
+def get_cache_stats() -> dict:
+    return query_cache.get_stats()
+
+
+def on_invalidate(listener, local: bool = True):
+    """
+    Register `listener(db, collection)` to be called whenever
+    a collection is written to, here or (via data.cache_sync)
+    by another worker, so in-process caches can drop stale data.
+    A listener that applies this process's writes itself passes
+    `local=False`, to hear only about other workers' writes.
+    """
+    listeners = invalidation_listeners if local else remote_listeners
+    if listener not in listeners:
+        listeners.append(listener)
+
+
+def invalidate(collection, db=SE_DB, remote: bool = False):
+    """
+    Drop everything this process has cached for `collection`.
+    `remote` if another worker wrote to it.
+    """
+    query_cache.invalidate(db, collection)
+    for listener in invalidation_listeners:
+        listener(db, collection)
+    if remote:
+        for listener in remote_listeners:
+            listener(db, collection)
+
+
+def skip_sync(collection: str):
+    """
+    Declare that no worker caches `collection` (e.g., an append-only
+    log that is always read from the database), so writes to it
+    need not bump a version counter for other workers to poll.
+    """
+    unsynced.add(collection)
+
+
+def needs_version_bump(collection) -> bool:
+    return (bump_versions and collection != VERSIONS_COLLECT
+            and collection not in unsynced)
+
+
+def note_write(collection, db=SE_DB):
+    """
+    Called after every write: invalidate our own caches and,
+    if other workers are polling for changes, bump the version
+    counter they watch.
+    """
+    invalidate(collection, db)
+    if needs_version_bump(collection):
+        # counted under the lock read_other_versions() reads under,
+        # so a poll never sees the bump without the count:
+        with own_lock:
+            get_backend().update_one(db, VERSIONS_COLLECT,
+                                     {MONGO_ID: collection},
+                                     {'$inc': {VERSION: 1}}, upsert=True)
+            own_bumps[(db, collection)] += 1
+    else:
+        note_own_write(collection, db)
+
+
+def read_versions(db=SE_DB) -> dict:
+    """
+    Return the write counter for each collection that has one.
+    """
+    return {doc[MONGO_ID]: doc.get(VERSION, 0)
+            for doc in get_backend().find(db, VERSIONS_COLLECT)}
+
+
+def read_other_versions(db=SE_DB) -> dict:
+    """
+    read_versions() less this process's own bumps: what other
+    workers' writes have added.
+    """
+    with own_lock:
+        versions = read_versions(db)
+        return {collection: version - own_bumps[(db, collection)]
+                for collection, version in versions.items()}
+
+
+def note_own_write(collection, db=SE_DB):
+    now = time.monotonic()
+    with own_lock:
+        writes = own_writes.setdefault((db, collection), deque())
+        writes.append(now)
+        while writes[0] < now - ECHO_WINDOW:
+            writes.popleft()
+
+
+def is_own_write(collection, db=SE_DB) -> bool:
+    """
+    Is a change to `collection` just seen on a change stream probably
+    one of our own writes coming back?
+    Each of our writes is taken as the echo of at most one change.
+    A guess: a write that changed nothing has no echo, so another
+    worker's change soon after it is taken for ours.
+    """
+    cutoff = time.monotonic() - ECHO_WINDOW
+    with own_lock:
+        writes = own_writes.get((db, collection))
+        while writes and writes[0] < cutoff:
+            writes.popleft()
+        if writes:
+            writes.popleft()
+            return True
+    return False
+
+
+def cached(collection, db, op, args, loader):
+    """
+    Return loader()'s result, served from the query cache
+    when `collection` is cached and the same query was run recently.
+    """
+    if not query_cache.is_enabled(collection):
+        return loader()
+    key = query_cache.make_key(db, collection, op, args)
+    found, val = query_cache.get(key)
+    if found:
+        return val
+    val = loader()
+    query_cache.put(key, val)
+    return val
+
+
 def create(collection, doc, db=SE_DB):
     """
     Insert a single doc into collection.
+    Uniqueness is enforced by the collection's unique indexes,
+    so there is no need to check for the doc first:
+    a duplicate raises ValueError.
     """
-    print(f'{db=}')
-    return client[db][collection].insert_one(doc)
+    log.debug('db.create', sample=lg.HOT, db=db, collection=collection)
+    if (db, collection) not in indexed:
+        ensure_indexes(db, [collection])
+    try:
+        return get_backend().insert_one(db, collection, doc)
+    except bkb.DuplicateKeyError as err:
+        raise ValueError(f'Duplicate key in {collection}: {err}')
+    finally:
+        note_write(collection, db)
 
 
 # def fetch_one(collection, filt, db=SE_DB):
@@ -64,32 +486,45 @@ def create(collection, doc, db=SE_DB):
 #             doc[MONGO_ID] = str(doc[MONGO_ID])
 #         return doc
 
-def fetch_one(collection, filt, db=SE_DB):
+def fetch_one(collection, filt, db=SE_DB, projection=None):
     """
     Find a document with a filter and return the first document found.
     Converts the MongoDB `_id` to a string for JSON compatibility.
     Returns None if no document is found.
     """
-    try:
-        doc = client[db][collection].find_one(filt)
+    def load():
+        doc = get_backend().find_one(db, collection, filt, projection)
         if doc and MONGO_ID in doc:
             # Convert MongoDB ObjectID to string
             doc[MONGO_ID] = str(doc[MONGO_ID])
         return doc
-    except Exception as e:
-        print(f"Error in fetch_one: {e}")
+
+    try:
+        return cached(collection, db, 'fetch_one', [filt, projection], load)
+    except Exception:
+        log.exception('db.fetch_one.failed', collection=collection,
+                      filter=lambda: dbm.filter_shape(filt))
         return None
 
 
-def read_one(collection, filt, db=SE_DB):
+def read_one(collection, filt, db=SE_DB, projection=None,
+             fresh: bool = False):
     """
     Find with a filter and return on the first doc found
     Return None if not found.
+    With `fresh`, skip the query cache: for reads that a later write
+    is conditioned on, which must not see another worker's stale data.
     """
-    for doc in client[db][collection].find(filt):
-        convert_mongo_id(doc)
+    def load():
+        doc = get_backend().find_one(db, collection, filt, projection)
+        if doc:
+            convert_mongo_id(doc)
         return doc
 
+    if fresh:
+        return load()
+    return cached(collection, db, 'read_one', [filt, projection], load)
+
 
 def convert_mongo_id(doc: dict):
     if MONGO_ID in doc:
@@ -101,38 +536,357 @@ def delete(collection: str, filt: dict, db=SE_DB):
     """
     Find with a filter and return on the first doc found.
     """
-    print(f'{filt=}')
-    del_result = client[db][collection].delete_one(filt)
-    return del_result.deleted_count
+    log.debug('db.delete', sample=lg.HOT, collection=collection,
+              filter=lambda: dbm.filter_shape(filt))
+    try:
+        return get_backend().delete_one(db, collection, filt)
+    finally:
+        note_write(collection, db)
+
+
+def delete_and_return(collection: str, filt: dict, db=SE_DB,
+                      projection=None):
+    """
+    Delete the first doc matching `filt` and return it, in one round
+    trip. Return None if nothing matched.
+    """
+    try:
+        doc = get_backend().find_one_and_delete(db, collection, filt,
+                                                projection=projection)
+    finally:
+        note_write(collection, db)
+    if doc:
+        convert_mongo_id(doc)
+    return doc
 
 
 def update_doc(collection, filters, update_dict, db=SE_DB):
-    return client[db][collection].update_one(filters, {'$set': update_dict})
+    try:
+        return get_backend().update_one(db, collection, filters,
+                                        {'$set': update_dict})
+    finally:
+        note_write(collection, db)
+
+
+def increment(collection, filt, inc_dict, db=SE_DB):
+    """
+    Atomically add to the (possibly dotted) numeric fields in
+    `inc_dict` of the doc matching `filt`, creating it if need be.
+    """
+    try:
+        return get_backend().update_one(db, collection, filt,
+                                        {'$inc': inc_dict}, upsert=True)
+    finally:
+        note_write(collection, db)
+
+
+def modify_and_return(collection, filt, update, return_new=True,
+                      db=SE_DB, projection=None):
+    """
+    Apply the update operators in `update` (e.g., $set, $push, $inc)
+    to the first doc matching `filt` and return it in a single
+    atomic round trip: the post-image if `return_new`,
+    else the doc as it was before the update.
+    Return None if no doc matched.
+    """
+    try:
+        doc = get_backend().find_one_and_update(
+            db, collection, filt, update, projection=projection,
+            return_new=return_new)
+    finally:
+        note_write(collection, db)
+    if doc:
+        convert_mongo_id(doc)
+    return doc
+
+
+def update_and_return(collection, filt, set_dict, return_new=True,
+                      db=SE_DB, projection=None):
+    """
+    Set the fields in `set_dict` on the first doc matching `filt`
+    and return it atomically; see modify_and_return().
+    """
+    return modify_and_return(collection, filt, {'$set': set_dict},
+                             return_new=return_new, db=db,
+                             projection=projection)
+
+
+def run_bulk(collection, ops: list, ordered: bool, db=SE_DB) -> tuple:
+    """
+    Send `ops` (see data.backends.base) in one bulk write
+    (pymongo splits it into batches).
+    Returns (result counts, {op index: error message}, number attempted).
+    An ordered bulk stops at the first error, so later ops are
+    not attempted; an unordered one tries them all.
+    """
+    if not ops:
+        return {}, {}, 0
+    try:
+        details, errors = get_backend().bulk_write(db, collection, ops,
+                                                   ordered=ordered)
+    finally:
+        note_write(collection, db)
+    attempted = len(ops)
+    if ordered and errors:
+        attempted = min(errors) + 1
+    return details, errors, attempted
+
+
+def bulk_create(collection, docs: list, ordered: bool = False,
+                db=SE_DB) -> dict:
+    """
+    Insert many docs in as few round trips as possible.
+    Returns the number inserted, per-row errors (e.g., duplicate keys)
+    keyed on the row's index in `docs`, and how many rows were attempted.
+    """
+    if (db, collection) not in indexed:
+        ensure_indexes(db, [collection])
+    details, errors, attempted = run_bulk(
+        collection, [(bkb.INSERT, doc) for doc in docs], ordered, db)
+    return {
+        'inserted': details.get('nInserted', 0),
+        'errors': errors,
+        'attempted': attempted,
+    }
 
 
-def read(collection, db=SE_DB, no_id=True) -> list:
+def bulk_update(collection, updates: list, upsert: bool = False,
+                ordered: bool = False, db=SE_DB) -> dict:
+    """
+    Apply many (filter, set_dict) updates in as few round trips as
+    possible. With `upsert`, rows that match nothing are inserted;
+    their indexes are listed under 'upserted'.
+    """
+    if upsert and (db, collection) not in indexed:
+        ensure_indexes(db, [collection])
+    ops = [(bkb.UPDATE, filt, {'$set': set_dict}, upsert)
+           for filt, set_dict in updates]
+    details, errors, attempted = run_bulk(collection, ops, ordered, db)
+    return {
+        'matched': details.get('nMatched', 0),
+        'modified': details.get('nModified', 0),
+        'upserted': [upsert['index']
+                     for upsert in details.get('upserted', [])],
+        'errors': errors,
+        'attempted': attempted,
+    }
+
+
+def bulk_delete(collection, filts: list, ordered: bool = False,
+                db=SE_DB) -> dict:
+    """
+    Delete the first doc matching each filter, in as few round trips
+    as possible.
+    """
+    details, errors, attempted = run_bulk(
+        collection, [(bkb.DELETE, filt) for filt in filts], ordered, db)
+    return {
+        'deleted': details.get('nRemoved', 0),
+        'errors': errors,
+        'attempted': attempted,
+    }
+
+
+# per-row bulk statuses:
+BULK_STATUS = 'status'
+BULK_MESSAGE = 'message'
+BULK_CREATED = 'created'
+BULK_UPDATED = 'updated'
+BULK_FAILED = 'failed'
+BULK_SKIPPED = 'not attempted'
+
+
+def bulk_row_results(num_rows: int, invalid: dict, valid_rows: list,
+                     result: dict) -> list:
+    """
+    Turn a bulk_create/bulk_update result into one status per input row.
+    `invalid` maps rows that failed validation (and were never sent)
+    to their error; `valid_rows` lists the input row of each op sent.
+    """
+    rows = [None] * num_rows
+    for row, msg in invalid.items():
+        rows[row] = {BULK_STATUS: BULK_FAILED, BULK_MESSAGE: msg}
+    upserted = set(result.get('upserted', []))
+    for op_idx, row in enumerate(valid_rows):
+        if op_idx in result['errors']:
+            rows[row] = {BULK_STATUS: BULK_FAILED,
+                         BULK_MESSAGE: result['errors'][op_idx]}
+        elif op_idx >= result['attempted']:
+            rows[row] = {BULK_STATUS: BULK_SKIPPED}
+        elif 'upserted' in result and op_idx not in upserted:
+            rows[row] = {BULK_STATUS: BULK_UPDATED}
+        else:
+            rows[row] = {BULK_STATUS: BULK_CREATED}
+    return rows
+
+
+def with_fields(projection, *fields):
+    """
+    Make sure a list projection also fetches `fields`
+    (e.g., the key a dict of docs is built on).
+    Dict projections and None are returned unchanged.
+    """
+    if projection is None or isinstance(projection, dict):
+        return projection
+    return list(projection) + [fld for fld in fields
+                               if fld not in projection]
+
+
+def iter_docs(collection, filt=None, projection=None,
+              batch_size=DEFAULT_BATCH_SIZE, db=SE_DB, no_id=True,
+              sort=None):
+    """
+    Yield docs one at a time as the cursor fetches them,
+    so callers never hold the whole collection in memory.
+    `sort` is a list of (field, direction) pairs.
+    """
+    for doc in get_backend().find(db, collection, filt, projection,
+                                  sort=sort, batch_size=batch_size):
+        if no_id:
+            doc.pop(MONGO_ID, None)
+        else:
+            convert_mongo_id(doc)
+        yield doc
+
+
+def read(collection, db=SE_DB, no_id=True, filt=None,
+         projection=None, sort=None) -> list:
     """
     Returns a list from the db.
+    An optional filter restricts the docs returned,
+    an optional projection restricts the fields in each doc,
+    and an optional sort orders them.
     """
-    ret = []
-    for doc in client[db][collection].find():
+    def load():
+        return list(iter_docs(collection, filt=filt, projection=projection,
+                              db=db, no_id=no_id, sort=sort))
+
+    return cached(collection, db, 'read', [filt, projection, no_id, sort],
+                  load)
+
+
+def encode_page_token(key_val, doc_id) -> str:
+    """
+    Turn the sort key and _id of the last doc on a page
+    into an opaque token the client hands back for the next page.
+    """
+    raw = json.dumps({TOKEN_KEY: key_val, TOKEN_ID: str(doc_id)})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_page_token(token: str) -> tuple:
+    """
+    Reverse encode_page_token().
+    Raises ValueError on a token we did not issue.
+    """
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return raw[TOKEN_KEY], ObjectId(raw[TOKEN_ID])
+    except (binascii.Error, ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError(f'Bad page token: {token}')
+
+
+def read_page(collection, key, limit, after=None, filt=None,
+              projection=None, db=SE_DB, no_id=True) -> tuple:
+    """
+    Keyset pagination: return up to `limit` docs sorted on (key, _id)
+    that come after the position encoded in the `after` token,
+    plus the token for the next page (None on the last page).
+    The query is a range scan on key, so deep pages cost
+    the same as the first one, as long as an index serves it:
+    a unique key (declared with declare_index) is ranged and sorted
+    on alone, so its own index does (or a compound index ending in it,
+    with equality filters on the fields before it); any other key
+    needs a (key, _id) index.
+    """
+    if limit < 1 or limit > MAX_PAGE_LIMIT:
+        raise ValueError(f'Page limit must be between 1 and '
+                         f'{MAX_PAGE_LIMIT}: {limit}')
+    unique = is_unique_key(collection, key)
+    query = filt or {}
+    if after:
+        key_val, last_id = decode_page_token(after)
+        if key == MONGO_ID:
+            range_filt = {MONGO_ID: {'$gt': last_id}}
+        elif unique:
+            range_filt = {key: {'$gt': key_val}}
+        else:
+            range_filt = {'$or': [
+                {key: {'$gt': key_val}},
+                {key: key_val, MONGO_ID: {'$gt': last_id}},
+            ]}
+        query = {'$and': [query, range_filt]} if query else range_filt
+    sort = [(key, pm.ASCENDING)]
+    if not unique:
+        sort.append((MONGO_ID, pm.ASCENDING))
+    docs = list(get_backend().find(db, collection, query,
+                                   with_fields(projection, key),
+                                   sort=sort, limit=limit + 1))
+    next_token = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_token = encode_page_token(
+            None if key == MONGO_ID else last[key], last[MONGO_ID])
+    for doc in docs:
         if no_id:
-            del doc[MONGO_ID]
-        ret.append(doc)
-    return ret
+            doc.pop(MONGO_ID, None)
+        else:
+            convert_mongo_id(doc)
+    return docs, next_token
+
+
+def read_dict(collection, key, db=SE_DB, no_id=True,
+              projection=None) -> dict:
+    def load():
+        recs_as_dict = {}
+        for rec in iter_docs(collection,
+                             projection=with_fields(projection, key),
+                             db=db, no_id=no_id):
+            recs_as_dict[rec[key]] = rec
+        return recs_as_dict
 
+    return cached(collection, db, 'read_dict', [key, projection, no_id],
+                  load)
+
+
+def group_values(collection, key, value, filt=None, db=SE_DB) -> dict:
+    """
+    Return {each distinct `key`: sorted list of the `value`s with it},
+    grouped by the database rather than here.
+    """
+    def load():
+        return get_backend().group(db, collection, key, value, filt=filt)
+
+    return cached(collection, db, 'group_values', [key, value, filt], load)
+
+
+def text_search(collection, query: str, projection=None, limit=None,
+                skip=0, db=SE_DB, no_id=True) -> list:
+    """
+    Rank the docs matching `query` on the collection's text index:
+    a list of (doc, score), best first.
+    Raises NotImplementedError if the backend cannot.
+    """
+    def load():
+        hits = get_backend().text_search(db, collection, query,
+                                         projection=projection,
+                                         limit=limit, skip=skip)
+        for doc, _ in hits:
+            if no_id:
+                doc.pop(MONGO_ID, None)
+            else:
+                convert_mongo_id(doc)
+        return hits
 
-def read_dict(collection, key, db=SE_DB, no_id=True) -> dict:
-    recs = read(collection, db=db, no_id=no_id)
-    recs_as_dict = {}
-    for rec in recs:
-        recs_as_dict[rec[key]] = rec
-    return recs_as_dict
+    return cached(collection, db, 'text_search',
+                  [query, projection, limit, skip, no_id], load)
 
 
-def fetch_all_as_dict(key, collection, db=SE_DB):
+def fetch_all_as_dict(key, collection, db=SE_DB, projection=None):
     ret = {}
-    for doc in client[db][collection].find():
-        del doc[MONGO_ID]
+    projection = with_fields(projection, key)
+    for doc in get_backend().find(db, collection, {}, projection):
+        doc.pop(MONGO_ID, None)
         ret[doc[key]] = doc
     return ret
@@ -0,0 +1,209 @@
+"""
+The async twin of data.db_connect, on Motor.
+Same functions, same arguments, same return values; just await them.
+It shares db_connect's index declarations, query cache and
+invalidation, so sync and async callers see the same data.
+It always talks to MongoDB, whatever backend db_connect uses.
+Every Motor call is timed into data.db_metrics, as db_connect's
+backend calls are, so it shows in the metrics and is counted
+against the request's DB budget.
+"""
+import asyncio
+import os
+
+import motor.motor_asyncio as motor
+import pymongo as pm
+
+import data.db_config as dbcfg
+import data.db_connect as dbc
+import data.db_metrics as dbm
+import data.logger as lg
+
+log = lg.get_logger(__name__)
+
+SE_DB = dbc.SE_DB
+MONGO_ID = dbc.MONGO_ID
+
+client = None
+client_pid = None
+client_loop = None
+
+
+def get_client():
+    """
+    Return the Motor client for this process and event loop,
+    creating it on first use.
+    A Motor client is bound to the loop it first runs on,
+    so a new loop (or a forked process) gets a new client,
+    and the old one is closed.
+    """
+    global client, client_pid, client_loop
+    loop = asyncio.get_running_loop()
+    if (client is None or client_pid != os.getpid()
+            or client_loop is not loop):
+        if client is not None:
+            client.close()
+        client = motor.AsyncIOMotorClient(dbc.get_mongo_uri(),
+                                          **dbcfg.get_client_options())
+        client_pid = os.getpid()
+        client_loop = loop
+    return client
+
+
+def call(db, collection, op, filt=None) -> dbm.Call:
+    """
+    Time one Motor call: `with call(...) as timed: await ...`.
+    """
+    return dbm.Call(None, db, collection, op, filt)
+
+
+async def ensure_indexes(db=SE_DB, collections: list = None) -> dict:
+    """
+    Build missing declared indexes; see dbc.ensure_indexes().
+    """
+    built = {}
+    for collection, keys, unique in dbc.INDEXES:
+        if collections is not None and collection not in collections:
+            continue
+        coll = get_client()[db][collection]
+        try:
+            with call(db, collection, 'index_information'):
+                existing = await coll.index_information()
+            with call(db, collection, 'create_index'):
+                name = await coll.create_index(keys, unique=unique)
+        except pm.errors.PyMongoError as err:
+            log.error('db.index.failed', collection=collection,
+                      keys=str(keys), unique=unique, error=str(err))
+            continue
+        if name not in existing:
+            built.setdefault(collection, []).append(name)
+    for collection in collections or {spec[0] for spec in dbc.INDEXES}:
+        dbc.indexed.add((db, collection))
+    return built
+
+
+async def note_write(collection, db=SE_DB):
+    dbc.invalidate(collection, db)
+    if dbc.needs_version_bump(collection):
+        with call(db, dbc.VERSIONS_COLLECT, 'update_one',
+                  {MONGO_ID: collection}):
+            await get_client()[db][dbc.VERSIONS_COLLECT].update_one(
+                {MONGO_ID: collection}, {'$inc': {dbc.VERSION: 1}},
+                upsert=True)
+
+
+async def cached(collection, db, op, args, loader):
+    """
+    Await loader(), unless the sync or async side ran the same query
+    recently and the result is still in the shared query cache.
+    """
+    if not dbc.query_cache.is_enabled(collection):
+        return await loader()
+    key = dbc.query_cache.make_key(db, collection, op, args)
+    found, val = dbc.query_cache.get(key)
+    if found:
+        return val
+    val = await loader()
+    dbc.query_cache.put(key, val)
+    return val
+
+
+async def create(collection, doc, db=SE_DB):
+    """
+    Insert a single doc into collection.
+    A duplicate on a unique index raises ValueError.
+    """
+    if (db, collection) not in dbc.indexed:
+        await ensure_indexes(db, [collection])
+    try:
+        with call(db, collection, 'insert_one') as timed:
+            timed.docs = 1
+            return await get_client()[db][collection].insert_one(doc)
+    except pm.errors.DuplicateKeyError as err:
+        raise ValueError(f'Duplicate key in {collection}: {err.details}')
+    finally:
+        await note_write(collection, db)
+
+
+async def read_one(collection, filt, db=SE_DB, projection=None):
+    """
+    Find with a filter and return the first doc found.
+    Return None if not found.
+    """
+    async def load():
+        with call(db, collection, 'find_one', filt) as timed:
+            doc = await get_client()[db][collection].find_one(filt,
+                                                              projection)
+            timed.add_doc(doc)
+        if doc:
+            dbc.convert_mongo_id(doc)
+        return doc
+
+    return await cached(collection, db, 'read_one', [filt, projection],
+                        load)
+
+
+async def read(collection, db=SE_DB, no_id=True, filt=None,
+               projection=None) -> list:
+    async def load():
+        ret = []
+        with call(db, collection, 'find', filt) as timed:
+            cursor = get_client()[db][collection].find(filt or {},
+                                                       projection)
+            docs = await cursor.to_list(None)
+            for doc in docs:
+                timed.add_doc(doc)
+        for doc in docs:
+            if no_id:
+                doc.pop(MONGO_ID, None)
+            else:
+                dbc.convert_mongo_id(doc)
+            ret.append(doc)
+        return ret
+
+    return await cached(collection, db, 'read', [filt, projection, no_id],
+                        load)
+
+
+async def read_dict(collection, key, db=SE_DB, no_id=True,
+                    projection=None) -> dict:
+    async def load():
+        recs_as_dict = {}
+        with call(db, collection, 'find') as timed:
+            cursor = get_client()[db][collection].find(
+                {}, dbc.with_fields(projection, key))
+            recs = await cursor.to_list(None)
+            for rec in recs:
+                timed.add_doc(rec)
+        for rec in recs:
+            if no_id:
+                rec.pop(MONGO_ID, None)
+            else:
+                dbc.convert_mongo_id(rec)
+            recs_as_dict[rec[key]] = rec
+        return recs_as_dict
+
+    return await cached(collection, db, 'read_dict',
+                        [key, projection, no_id], load)
+
+
+async def update_doc(collection, filters, update_dict, db=SE_DB):
+    try:
+        with call(db, collection, 'update_one', filters):
+            return await get_client()[db][collection].update_one(
+                filters, {'$set': update_dict})
+    finally:
+        await note_write(collection, db)
+
+
+async def delete(collection: str, filt: dict, db=SE_DB):
+    """
+    Delete the first doc matching filt; return how many were deleted.
+    """
+    try:
+        with call(db, collection, 'delete_one', filt):
+            del_result = await get_client()[db][collection].delete_one(
+                filt)
+    finally:
+        await note_write(collection, db)
+    return del_result.deleted_count
@@ -0,0 +1,365 @@
+"""
+Per-call instrumentation for data.db_connect.
+Every backend operation is timed and counted (docs returned and
+BSON bytes decoded, estimated from a sample of the docs), labeled
+with its collection and op, and rolled up into latency histograms.
+Calls slower than the slow-query threshold go to a bounded slow-query
+log with the shape of their filter and, optionally, an explain() summary,
+so unindexed scans show up in production.
+"""
+from collections import deque
+import contextvars
+from datetime import datetime, timezone
+import os
+import threading
+import time
+
+import bson
+
+import data.logger as lg
+
+log = lg.get_logger(__name__)
+
+SLOW_QUERY_MS_VAR = 'DB_SLOW_QUERY_MS'
+EXPLAIN_SLOW_VAR = 'DB_EXPLAIN_SLOW'
+BYTES_SAMPLE_VAR = 'DB_BYTES_SAMPLE'
+
+DEFAULT_SLOW_QUERY_MS = 100
+# sizing a doc means encoding it again, so only every Nth doc of a call
+# is sized (starting with the first); 0 turns sizing off:
+DEFAULT_BYTES_SAMPLE = 16
+SLOW_LOG_SIZE = 100
+
+# upper bounds (ms) of the latency histogram buckets; the last is open:
+BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+OVERFLOW = f'>{BUCKETS_MS[-1]}'
+
+# ops that read with a filter, and so can be explained:
+EXPLAINABLE = ['find', 'find_one', 'find_one_and_update', 'update_one',
+               'delete_one', 'find_one_and_delete']
+
+LOGICAL_OPS = ['$and', '$or', '$nor']
+
+# stats keys:
+COUNT = 'count'
+TOTAL_MS = 'total_ms'
+MAX_MS = 'max_ms'
+DOCS = 'docs'
+BYTES = 'bytes'
+HISTOGRAM = 'histogram'
+
+slow_query_ms = float(os.environ.get(SLOW_QUERY_MS_VAR,
+                                     DEFAULT_SLOW_QUERY_MS))
+explain_slow = os.environ.get(EXPLAIN_SLOW_VAR, '0') == '1'
+bytes_sample = int(os.environ.get(BYTES_SAMPLE_VAR, DEFAULT_BYTES_SAMPLE))
+
+lock = threading.Lock()
+op_stats = {}
+slow_queries = deque(maxlen=SLOW_LOG_SIZE)
+# Functions called with (collection, op, seconds) after every call;
+# see on_query().
+query_listeners = []
+# the QueryCounter of the request (or other unit of work) being run:
+current_counter = contextvars.ContextVar('db_query_counter', default=None)
+
+
+def bucket_label(millis: float) -> str:
+    for bound in BUCKETS_MS:
+        if millis <= bound:
+            return f'<={bound}'
+    return OVERFLOW
+
+
+def new_stats() -> dict:
+    return {
+        COUNT: 0,
+        TOTAL_MS: 0.0,
+        MAX_MS: 0.0,
+        DOCS: 0,
+        BYTES: 0,
+        HISTOGRAM: {**{bucket_label(bound): 0 for bound in BUCKETS_MS},
+                    OVERFLOW: 0},
+    }
+
+
+def filter_shape(filt):
+    """
+    The filter with its values blanked out, e.g.
+    {'email': '?', 'roles': {'$in': '?'}}: enough to see which fields
+    a slow query used without logging anyone's data.
+    """
+    if not isinstance(filt, dict):
+        return '?'
+    shape = {}
+    for key, val in filt.items():
+        if key in LOGICAL_OPS:
+            shape[key] = [filter_shape(sub_filt) for sub_filt in val]
+        else:
+            shape[key] = filter_shape(val)
+    return shape
+
+
+class QueryCounter:
+    """
+    Counts the DB round trips made by one request.
+    Cached reads never reach the backend, so they are not counted.
+    """
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.ops = []
+
+    def add(self, collection: str, op: str, seconds: float):
+        self.queries += 1
+        self.seconds += seconds
+        self.ops.append(f'{op} {collection}')
+
+
+def start_counting() -> QueryCounter:
+    """
+    Count every DB call made from this context from now on.
+    """
+    counter = QueryCounter()
+    current_counter.set(counter)
+    return counter
+
+
+def stop_counting():
+    current_counter.set(None)
+
+
+def get_counter() -> QueryCounter:
+    return current_counter.get()
+
+
+def on_query(listener):
+    """
+    Register `listener(collection, op, seconds)`, called after
+    every database call.
+    """
+    if listener not in query_listeners:
+        query_listeners.append(listener)
+
+
+def record(collection: str, op: str, seconds: float, docs: int = 0,
+           nbytes: int = 0):
+    millis = seconds * 1000
+    with lock:
+        stats = op_stats.get((collection, op))
+        if stats is None:
+            stats = op_stats[(collection, op)] = new_stats()
+        stats[COUNT] += 1
+        stats[TOTAL_MS] += millis
+        stats[MAX_MS] = max(stats[MAX_MS], millis)
+        stats[DOCS] += docs
+        stats[BYTES] += nbytes
+        stats[HISTOGRAM][bucket_label(millis)] += 1
+    counter = current_counter.get()
+    if counter is not None:
+        counter.add(collection, op, seconds)
+    for listener in query_listeners:
+        listener(collection, op, seconds)
+
+
+def log_slow(backend, db, collection, op, millis, docs, filt, sort=None):
+    entry = {
+        'time': datetime.now(timezone.utc).isoformat(),
+        'collection': collection,
+        'op': op,
+        'ms': round(millis, 3),
+        'docs': docs,
+        'filter': filter_shape(filt or {}),
+        'explain': None,
+    }
+    if sort:
+        entry['sort'] = [field for field, _ in sort]
+    # (calls not made through a backend, e.g. Motor's, cannot explain)
+    if explain_slow and backend is not None and op in EXPLAINABLE:
+        try:
+            entry['explain'] = backend.explain(db, collection, filt, sort)
+        except Exception as err:
+            entry['explain'] = f'explain failed: {err}'
+    slow_queries.append(entry)
+    log.warning('db.slow_query', **entry)
+
+
+def get_metrics() -> list:
+    """
+    Return the stats for each (collection, op), busiest first.
+    """
+    with lock:
+        rows = [{'collection': collection, 'op': op, **stats,
+                 HISTOGRAM: dict(stats[HISTOGRAM]),
+                 'avg_ms': stats[TOTAL_MS] / stats[COUNT]}
+                for (collection, op), stats in op_stats.items()]
+    return sorted(rows, key=lambda row: row[TOTAL_MS], reverse=True)
+
+
+def get_slow_queries() -> list:
+    return list(slow_queries)
+
+
+def reset():
+    with lock:
+        op_stats.clear()
+        slow_queries.clear()
+
+
+def doc_size(doc) -> int:
+    try:
+        return len(bson.encode(doc))
+    except (TypeError, bson.errors.InvalidDocument):
+        return 0
+
+
+class Call:
+    """
+    Times one backend call and records it when done.
+    """
+    def __init__(self, backend, db, collection, op, filt=None, sort=None):
+        self.backend = backend
+        self.db = db
+        self.collection = collection
+        self.op = op
+        self.filt = filt
+        self.sort = sort
+        self.seconds = 0.0
+        self.docs = 0
+        # the docs sized so far, and their bytes:
+        self.sized = 0
+        self.sized_bytes = 0
+
+    def add_doc(self, doc):
+        if doc is None:
+            return
+        if bytes_sample and self.docs % bytes_sample == 0:
+            self.sized += 1
+            self.sized_bytes += doc_size(doc)
+        self.docs += 1
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The bytes of the docs sized, scaled up to all the docs seen.
+        """
+        if not self.sized:
+            return 0
+        return round(self.sized_bytes * self.docs / self.sized)
+
+    def done(self):
+        record(self.collection, self.op, self.seconds, self.docs,
+               self.nbytes)
+        millis = self.seconds * 1000
+        if millis >= slow_query_ms:
+            log_slow(self.backend, self.db, self.collection, self.op,
+                     millis, self.docs, self.filt, self.sort)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.seconds += time.perf_counter() - self.start
+        self.done()
+        return False
+
+
+class InstrumentedBackend:
+    """
+    Wraps a storage backend so every call through it is measured.
+    Anything not wrapped here is passed straight through.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def call(self, db, collection, op, filt=None, sort=None):
+        return Call(self.backend, db, collection, op, filt, sort)
+
+    def insert_one(self, db, collection, doc):
+        with self.call(db, collection, 'insert_one') as call:
+            call.docs = 1
+            return self.backend.insert_one(db, collection, doc)
+
+    def find(self, db, collection, filt=None, projection=None, sort=None,
+             limit=None, batch_size=None):
+        """
+        Only time spent fetching counts, not time the caller spends
+        between docs (e.g., streaming them to a client).
+        """
+        call = self.call(db, collection, 'find', filt, sort)
+        start = time.perf_counter()
+        try:
+            docs = iter(self.backend.find(db, collection, filt, projection,
+                                          sort=sort, limit=limit,
+                                          batch_size=batch_size))
+            for doc in docs:
+                call.add_doc(doc)
+                call.seconds += time.perf_counter() - start
+                start = None
+                yield doc
+                start = time.perf_counter()
+        finally:
+            if start is not None:
+                call.seconds += time.perf_counter() - start
+            call.done()
+
+    def find_one(self, db, collection, filt, projection=None):
+        with self.call(db, collection, 'find_one', filt) as call:
+            doc = self.backend.find_one(db, collection, filt, projection)
+            call.add_doc(doc)
+            return doc
+
+    def update_one(self, db, collection, filt, update, upsert=False):
+        with self.call(db, collection, 'update_one', filt) as call:
+            matched, modified = self.backend.update_one(
+                db, collection, filt, update, upsert=upsert)
+            call.docs = modified
+            return matched, modified
+
+    def find_one_and_update(self, db, collection, filt, update,
+                            projection=None, return_new=True):
+        with self.call(db, collection, 'find_one_and_update',
+                       filt) as call:
+            doc = self.backend.find_one_and_update(
+                db, collection, filt, update, projection=projection,
+                return_new=return_new)
+            call.add_doc(doc)
+            return doc
+
+    def delete_one(self, db, collection, filt):
+        with self.call(db, collection, 'delete_one', filt) as call:
+            call.docs = self.backend.delete_one(db, collection, filt)
+            return call.docs
+
+    def find_one_and_delete(self, db, collection, filt, projection=None):
+        with self.call(db, collection, 'find_one_and_delete', filt) as call:
+            doc = self.backend.find_one_and_delete(db, collection, filt,
+                                                   projection=projection)
+            call.add_doc(doc)
+            return doc
+
+    def group(self, db, collection, key, value, filt=None):
+        with self.call(db, collection, 'group', filt) as call:
+            groups = self.backend.group(db, collection, key, value,
+                                        filt=filt)
+            call.docs = sum(len(values) for values in groups.values())
+            return groups
+
+    def text_search(self, db, collection, query, projection=None,
+                    limit=None, skip=0):
+        with self.call(db, collection, 'text_search') as call:
+            hits = self.backend.text_search(db, collection, query,
+                                            projection=projection,
+                                            limit=limit, skip=skip)
+            for doc, _ in hits:
+                call.add_doc(doc)
+            return hits
+
+    def bulk_write(self, db, collection, ops, ordered=False):
+        with self.call(db, collection, 'bulk_write') as call:
+            call.docs = len(ops)
+            return self.backend.bulk_write(db, collection, ops,
+                                           ordered=ordered)
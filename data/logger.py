@@ -0,0 +1,144 @@
+"""
+The one logging facility for data, security and server.
+Every log line is an event name plus keyword fields, written as JSON:
+
+    log = lg.get_logger(__name__)
+    log.debug('people.read', count=len(people))
+
+Nothing is formatted unless the level is enabled, and a field whose
+value is a callable is only called then, so debug logging on a hot
+path costs one level check when it is off.
+High-frequency events can be sampled: `sample=lg.HOT` keeps about
+LOG_SAMPLE_RATE of them (each line records the rate it was kept at).
+
+Set LOG_LEVEL and LOG_FORMAT (json or text) in the environment.
+By default the cloud deployment (CLOUD_MONGO=1) logs warnings and up
+only; elsewhere we log info and up.
+"""
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import random
+import sys
+
+LEVEL_VAR = 'LOG_LEVEL'
+FORMAT_VAR = 'LOG_FORMAT'
+SAMPLE_RATE_VAR = 'LOG_SAMPLE_RATE'
+
+JSON = 'json'
+TEXT = 'text'
+
+PROD_LEVEL = 'WARNING'
+DEV_LEVEL = 'INFO'
+
+# the packages whose loggers we configure:
+ROOTS = ['data', 'security', 'server']
+
+# where a record carries its fields:
+FIELDS = 'fields'
+
+HOT = float(os.environ.get(SAMPLE_RATE_VAR, 0.01))
+
+
+def is_production() -> bool:
+    return os.environ.get('CLOUD_MONGO', '0') == '1'
+
+
+def default_level() -> str:
+    return os.environ.get(LEVEL_VAR,
+                          PROD_LEVEL if is_production() else DEV_LEVEL)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record) -> str:
+        payload = {
+            'ts': datetime.fromtimestamp(record.created,
+                                         timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+            **getattr(record, FIELDS, {}),
+        }
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record) -> str:
+        fields = ' '.join(f'{key}={val!r}' for key, val
+                          in getattr(record, FIELDS, {}).items())
+        line = (f'{self.formatTime(record)} {record.levelname} '
+                f'{record.name} {record.getMessage()} {fields}').rstrip()
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def configure(level: str = None, fmt: str = None, stream=None):
+    """
+    (Re)configure the loggers under ROOTS.
+    Called on import with the environment's settings;
+    call it again to change them (tests pass a stream).
+    """
+    fmt = fmt or os.environ.get(FORMAT_VAR, JSON)
+    if fmt not in (JSON, TEXT):
+        raise ValueError(f'Bad {FORMAT_VAR}: {fmt}')
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == JSON
+                         else TextFormatter())
+    for root in ROOTS:
+        logger = logging.getLogger(root)
+        for old_handler in list(logger.handlers):
+            logger.removeHandler(old_handler)
+        logger.addHandler(handler)
+        logger.setLevel((level or default_level()).upper())
+        logger.propagate = False
+
+
+class StructLogger:
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def is_enabled(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def log(self, level: int, event: str, sample: float = 1.0,
+            exc_info=None, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        if sample < 1.0:
+            if random.random() >= sample:
+                return
+            fields['sample_rate'] = sample
+        for key, val in fields.items():
+            if callable(val):
+                fields[key] = val()
+        self.logger.log(level, event, exc_info=exc_info,
+                        extra={FIELDS: fields}, stacklevel=3)
+
+    def debug(self, event: str, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields):
+        self.log(logging.ERROR, event, **fields)
+
+    def exception(self, event: str, **fields):
+        """
+        Log at error level with the exception being handled.
+        """
+        self.log(logging.ERROR, event, exc_info=True, **fields)
+
+
+def get_logger(name: str) -> StructLogger:
+    return StructLogger(logging.getLogger(name))
+
+
+configure()
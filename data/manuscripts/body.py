@@ -0,0 +1,150 @@
+"""
+Manuscript bodies are stored zlib-compressed in their own field,
+and only read when asked for, so listings, existence checks and
+state changes never carry them.
+Its distinct words are stored alongside, in plain text,
+for the search index to cover.
+Manuscripts written before that keep their text inline
+(or have no words stored) until migrate() fixes them:
+
+    python -m data.manuscripts.body
+"""
+import re
+import zlib
+
+import data.backends.base as bkb
+import data.db_connect as dbc
+
+MANUSCRIPTS_COLLECT = 'manuscripts'
+TITLE = 'title'
+TEXT = 'text'
+# where the compressed body is kept:
+TEXT_Z = 'text_z'
+# the body's distinct words, lowercased, for full-text search:
+TEXT_TERMS = 'text_terms'
+
+LEVEL = 6
+ENCODING = 'utf-8'
+MIGRATE_BATCH = 500
+
+# what reads without the body leave out (inline text included):
+NO_BODY = {TEXT: 0, TEXT_Z: 0, TEXT_TERMS: 0}
+
+WORD = re.compile(r'\w+')
+
+
+def compress(text: str) -> bytes:
+    if text is None:
+        return None
+    return zlib.compress(text.encode(ENCODING), LEVEL)
+
+
+def decompress(blob: bytes) -> str:
+    if blob is None:
+        return None
+    return zlib.decompress(bytes(blob)).decode(ENCODING)
+
+
+def terms(text: str) -> str:
+    """
+    The distinct words of `text`, in order of first use.
+    """
+    if text is None:
+        return None
+    return ' '.join(dict.fromkeys(WORD.findall(text.lower())))
+
+
+def pack(fields: dict) -> dict:
+    """
+    Return a copy of a manuscript (or of an update to one)
+    with its text compressed, as we store it.
+    """
+    if TEXT not in fields:
+        return fields
+    packed = {field: val for field, val in fields.items() if field != TEXT}
+    packed[TEXT_Z] = compress(fields[TEXT])
+    packed[TEXT_TERMS] = terms(fields[TEXT])
+    return packed
+
+
+def pack_update(updates: dict) -> dict:
+    """
+    The update operators that store `updates`.
+    A new text also drops any inline copy left from before bodies
+    were compressed.
+    """
+    update = {'$set': pack(updates)}
+    if TEXT in updates:
+        update['$unset'] = {TEXT: ''}
+    return update
+
+
+def unpack(manuscript: dict) -> dict:
+    """
+    Return a manuscript as read with its text decompressed.
+    Docs read without the body are returned as they are,
+    so a cached read is never changed.
+    """
+    if not manuscript or TEXT_Z not in manuscript:
+        return manuscript
+    unpacked = {field: val for field, val in manuscript.items()
+                if field not in (TEXT_Z, TEXT_TERMS)}
+    unpacked[TEXT] = decompress(manuscript[TEXT_Z])
+    return unpacked
+
+
+def projection(fields: list = None, with_body: bool = False):
+    """
+    What to ask the database for: `fields` (all of them if None,
+    bar the search terms), with the body only if `with_body` or
+    `fields` names the text.
+    """
+    if fields is None:
+        return {TEXT_TERMS: 0} if with_body else dict(NO_BODY)
+    if TEXT in fields or with_body:
+        return [field for field in fields if field not in NO_BODY] + [
+            TEXT, TEXT_Z]
+    return fields
+
+
+def migrate() -> int:
+    """
+    Compress the text of every manuscript still holding it inline,
+    and store the words of any body without them.
+    Writes MIGRATE_BATCH manuscripts at a time as the cursor
+    yields them, so it runs in bounded memory.
+    Returns how many were changed.
+    """
+    changed = 0
+    ops = []
+    for manu in dbc.iter_docs(MANUSCRIPTS_COLLECT,
+                              filt={'$or': [{TEXT: {'$exists': True}},
+                                            {TEXT_TERMS: {'$exists': False}}]},
+                              projection=[TITLE, TEXT, TEXT_Z],
+                              batch_size=MIGRATE_BATCH):
+        text = manu[TEXT] if TEXT in manu else decompress(manu.get(TEXT_Z))
+        ops.append((bkb.UPDATE, {TITLE: manu[TITLE]},
+                    pack_update({TEXT: text}), False))
+        if len(ops) == MIGRATE_BATCH:
+            changed += flush(ops)
+    return changed + flush(ops)
+
+
+def flush(ops: list) -> int:
+    """
+    Write and clear a batch of migrate()'s updates.
+    """
+    if not ops:
+        return 0
+    dbc.run_bulk(MANUSCRIPTS_COLLECT, ops, ordered=False)
+    count = len(ops)
+    ops.clear()
+    return count
+
+
+def main():
+    print(f'Migrated {migrate()} manuscripts.')
+
+
+if __name__ == '__main__':
+    main()
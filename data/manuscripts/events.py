@@ -0,0 +1,189 @@
+"""
+Every manuscript's history as an append-only log of events:
+one per state transition, saying what was done, by whom and when.
+The projections callers ask about are kept up to date as each event
+is recorded, never recomputed by scanning the log:
+  - each manuscript's current state and when it entered it
+    (STATE and STATE_SINCE on the manuscript, set by the same write
+    as the transition);
+  - for each state, how many manuscripts are in it and how long
+    those that left it spent there (for the average dwell time).
+Events and projections are separate writes: if a process dies between
+them, rebuild_projections() replays the log.
+"""
+from datetime import datetime, timezone
+
+import data.backends.base as bkb
+import data.db_connect as dbc
+import data.manuscripts.fields as flds
+import data.manuscripts.query as qy
+
+EVENTS_COLLECT = 'manuscript_events'
+PROJECTIONS_COLLECT = 'manuscript_state_projections'
+
+MONGO_ID = '_id'
+
+# event fields:
+TITLE = flds.TITLE
+ACTION = 'action'
+FROM_STATE = 'from_state'
+TO_STATE = 'to_state'
+ACTOR = 'actor'
+REFEREE = 'referee'
+TIMESTAMP = 'timestamp'
+# how long the manuscript was in FROM_STATE, where we know:
+DWELL_SECONDS = 'dwell_seconds'
+
+# the events that start and end a manuscript's log:
+CREATED = 'NEW'
+DELETED = 'DEL'
+
+# per-state projection fields (each projection's _id is its state):
+COUNT = 'count'
+DWELL_TOTAL = 'dwell_total'
+EXITS = 'exits'
+AVG_DWELL_SECONDS = 'avg_dwell_seconds'
+
+dbc.declare_index(EVENTS_COLLECT, [(TITLE, 1), (TIMESTAMP, 1)])
+# both are always read from the database:
+dbc.skip_sync(EVENTS_COLLECT)
+dbc.skip_sync(PROJECTIONS_COLLECT)
+
+
+def now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def as_utc(when: datetime) -> datetime:
+    """
+    Stored datetimes come back naive, but they are in UTC.
+    """
+    if when.tzinfo is None:
+        return when.replace(tzinfo=timezone.utc)
+    return when
+
+
+def make_event(title: str, action: str, from_state: str, to_state: str,
+               when: datetime, since: datetime = None, actor: str = None,
+               referee: str = None) -> dict:
+    """
+    `since` is when the manuscript entered `from_state`; manuscripts
+    stored before we kept an event log do not have it.
+    """
+    event = {
+        TITLE: title,
+        ACTION: action,
+        FROM_STATE: from_state,
+        TO_STATE: to_state,
+        ACTOR: actor,
+        REFEREE: referee,
+        TIMESTAMP: when,
+    }
+    if since is not None and from_state != to_state:
+        event[DWELL_SECONDS] = (as_utc(when) - as_utc(since)).total_seconds()
+    return event
+
+
+def projection_ops(event: dict) -> list:
+    """
+    The per-state updates `event` makes, as bulk ops:
+    the manuscript leaves its from state and enters its to state.
+    Manuscripts from before the log are only counted from their
+    first event on, so they never push a count below zero.
+    """
+    from_state = event[FROM_STATE]
+    to_state = event[TO_STATE]
+    if from_state == to_state:
+        return []
+    ops = []
+    if from_state and DWELL_SECONDS in event:
+        inc = {COUNT: -1}
+        if event[ACTION] != DELETED:
+            inc[DWELL_TOTAL] = event[DWELL_SECONDS]
+            inc[EXITS] = 1
+        ops.append((bkb.UPDATE, {MONGO_ID: from_state}, {'$inc': inc},
+                    True))
+    if to_state:
+        ops.append((bkb.UPDATE, {MONGO_ID: to_state},
+                    {'$inc': {COUNT: 1}}, True))
+    return ops
+
+
+def record(title: str, action: str, from_state: str, to_state: str,
+           since: datetime = None, actor: str = None, referee: str = None,
+           when: datetime = None) -> dict:
+    """
+    Append an event to the log and apply it to the projections.
+    Returns the event.
+    """
+    event = make_event(title, action, from_state, to_state,
+                       when or now(), since, actor, referee)
+    dbc.create(EVENTS_COLLECT, event)
+    dbc.run_bulk(PROJECTIONS_COLLECT, projection_ops(event), ordered=False)
+    return event
+
+
+def record_all(events: list):
+    """
+    Append many events (see make_event()) and apply them
+    to the projections, in one round trip each.
+    """
+    if not events:
+        return
+    dbc.bulk_create(EVENTS_COLLECT, events)
+    dbc.run_bulk(PROJECTIONS_COLLECT,
+                 [op for event in events for op in projection_ops(event)],
+                 ordered=False)
+
+
+def read_history(title: str) -> list:
+    """
+    Return a manuscript's events, oldest first.
+    """
+    return dbc.read(EVENTS_COLLECT, filt={TITLE: title},
+                    sort=[(TIMESTAMP, bkb.ASCENDING)])
+
+
+def new_projection() -> dict:
+    return {COUNT: 0, DWELL_TOTAL: 0.0, EXITS: 0}
+
+
+def read_state_stats() -> dict:
+    """
+    Return {state: {count, avg_dwell_seconds}} for every state,
+    from the projections: one small read however long the log is.
+    The average is None for a state no manuscript has left yet.
+    """
+    projections = {doc[MONGO_ID]: doc for doc
+                   in dbc.read(PROJECTIONS_COLLECT, no_id=False)}
+    stats = {}
+    for state in qy.VALID_STATES:
+        projection = projections.get(state) or new_projection()
+        exits = projection.get(EXITS, 0)
+        stats[state] = {
+            COUNT: projection.get(COUNT, 0),
+            AVG_DWELL_SECONDS: (projection.get(DWELL_TOTAL, 0) / exits
+                                if exits else None),
+        }
+    return stats
+
+
+def rebuild_projections() -> dict:
+    """
+    Recompute the projections by replaying the whole log, in order,
+    and store them. Returns them keyed on state.
+    """
+    projections = {state: new_projection() for state in qy.VALID_STATES}
+    for event in dbc.iter_docs(EVENTS_COLLECT,
+                               sort=[(TIMESTAMP, bkb.ASCENDING),
+                                     (MONGO_ID, bkb.ASCENDING)]):
+        for _, filt, update, _ in projection_ops(event):
+            projection = projections.setdefault(filt[MONGO_ID],
+                                                new_projection())
+            for field, val in update['$inc'].items():
+                projection[field] += val
+    dbc.bulk_update(PROJECTIONS_COLLECT,
+                    [({MONGO_ID: state}, projection)
+                     for state, projection in projections.items()],
+                    upsert=True)
+    return projections
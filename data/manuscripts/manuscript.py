@@ -1,6 +1,10 @@
 import data.db_connect as dbc
 import data.people as ppl
+import data.suggest as sg
+import data.manuscripts.body as bdy
+import data.manuscripts.events as evt
 import data.manuscripts.query as qy
+import data.manuscripts.stats as stats
 
 # Required Fields
 TITLE = 'title'
@@ -8,25 +12,149 @@ AUTHOR = 'author'
 AUTHOR_EMAIL = 'author_email'
 STATE = 'state'
 REFEREES = 'referees'
-TEXT = 'text'
+TEXT = bdy.TEXT
 ABSTRACT = 'abstract'
 HISTORY = 'history'
 EDITOR_EMAIL = 'editor_email'
 MANUSCRIPTS_COLLECT = 'manuscripts'
 ACTION = 'action'
-def read() -> dict:
+VERSION = 'version'
+# when the manuscript entered its current state:
+STATE_SINCE = 'state_since'
+
+# actions that change the referee list as well as the state:
+REFEREE_ACTIONS = [qy.ASSIGN_REF, qy.DELETE_REF]
+
+dbc.declare_index(MANUSCRIPTS_COLLECT, TITLE, unique=True)
+# serves state filters, in title order, for the summary listing:
+dbc.declare_index(MANUSCRIPTS_COLLECT, [(STATE, 1), (TITLE, 1)])
+dbc.declare_index(MANUSCRIPTS_COLLECT, AUTHOR_EMAIL)
+dbc.declare_index(MANUSCRIPTS_COLLECT, EDITOR_EMAIL)
+# full-text search (see data.manuscripts.search); the body is stored
+# compressed, so its words are searched instead:
+SEARCH_FIELDS = [TITLE, ABSTRACT, bdy.TEXT_TERMS, AUTHOR]
+dbc.declare_index(MANUSCRIPTS_COLLECT,
+                  [(field, dbc.TEXT_INDEX) for field in SEARCH_FIELDS])
+
+CACHE_TTL = 10
+dbc.cache_collection(MANUSCRIPTS_COLLECT, CACHE_TTL)
+
+
+def make_suggest_entry(manuscript: dict) -> tuple:
+    return (manuscript[TITLE], sg.make_keys(manuscript[TITLE]),
+            {TITLE: manuscript[TITLE], AUTHOR: manuscript.get(AUTHOR)})
+
+
+# title autocomplete; our writes below keep it current:
+suggester = sg.Suggester(MANUSCRIPTS_COLLECT,
+                         lambda: iter_manuscripts([TITLE, AUTHOR]),
+                         make_suggest_entry)
+
+
+def suggest(prefix: str, limit: int = sg.DEFAULT_LIMIT) -> list:
+    """
+    Return up to `limit` manuscripts ({title, author}) whose title,
+    or a word of it, starts with `prefix`.
+    """
+    return suggester.suggest(prefix, limit)
+
+
+def read(fields: list = None, with_body: bool = False) -> dict:
+    """
+    return all the manuscripts,
+    limited to `fields` (plus the title) if given;
+    the text only comes with `with_body` or when `fields` names it
+    """
+    manuscripts = dbc.read_dict(MANUSCRIPTS_COLLECT, TITLE,
+                                projection=bdy.projection(fields, with_body))
+    return {title: bdy.unpack(manu) for title, manu in manuscripts.items()}
+
+
+def read_page(limit: int, after: str = None, fields: list = None) -> tuple:
+    """
+    Return one page of manuscripts keyed on title (in title order)
+    and the token for the next page, or None on the last page.
+    """
+    manuscripts, next_token = dbc.read_page(MANUSCRIPTS_COLLECT, TITLE,
+                                            limit, after=after,
+                                            projection=bdy.projection(fields))
+    return {manu[TITLE]: bdy.unpack(manu) for manu in manuscripts}, next_token
+
+
+def iter_manuscripts(fields: list = None):
+    """
+    Yield manuscripts one at a time, for streaming responses.
+    """
+    return map(bdy.unpack, dbc.iter_docs(MANUSCRIPTS_COLLECT,
+                                         projection=bdy.projection(fields)))
+
+
+REFEREE_COUNT = 'referee_count'
+# what dashboards show; never the (long) text or abstract:
+SUMMARY_FIELDS = [TITLE, AUTHOR, STATE, EDITOR_EMAIL, REFEREES]
+SUMMARY_FILTERS = [STATE, AUTHOR_EMAIL, EDITOR_EMAIL]
+
+
+def summary_filter(state: str = None, author_email: str = None,
+                   editor_email: str = None) -> dict:
+    filt = {}
+    for field, val in zip(SUMMARY_FILTERS,
+                          [state, author_email, editor_email]):
+        if val:
+            filt[field] = val
+    return filt
+
+
+def make_summary(manuscript: dict) -> dict:
+    """
+    Swap the referee list for its length.
+    """
+    manuscript[REFEREE_COUNT] = len(manuscript.pop(REFEREES, None) or [])
+    return manuscript
+
+
+def read_summaries(state: str = None, author_email: str = None,
+                   editor_email: str = None) -> list:
+    """
+    Return title, author, state, editor and referee count of every
+    manuscript (matching the optional filters), in title order.
+    """
+    filt = summary_filter(state, author_email, editor_email)
+    manuscripts = dbc.read(MANUSCRIPTS_COLLECT, filt=filt,
+                           projection=SUMMARY_FIELDS, sort=[(TITLE, 1)])
+    return [make_summary(manu) for manu in manuscripts]
+
+
+def read_summaries_page(limit: int, after: str = None, state: str = None,
+                        author_email: str = None,
+                        editor_email: str = None) -> tuple:
+    """
+    One page of read_summaries() and the token for the next page.
+    """
+    filt = summary_filter(state, author_email, editor_email)
+    manuscripts, next_token = dbc.read_page(MANUSCRIPTS_COLLECT, TITLE,
+                                            limit, after=after, filt=filt,
+                                            projection=SUMMARY_FIELDS)
+    return [make_summary(manu) for manu in manuscripts], next_token
+
+
+def read_titles_by_state() -> dict:
     """
-    return all the manuscripts
+    Return {state: titles in that state, sorted}, grouped
+    by the database (on the (state, title) index).
     """
-    manuscripts = dbc.read_dict(MANUSCRIPTS_COLLECT, TITLE)
-    return manuscripts
+    return dbc.group_values(MANUSCRIPTS_COLLECT, STATE, TITLE)
 
 
-def read_one(title: str) -> dict:
+def read_one(title: str, fields: list = None,
+             with_body: bool = False) -> dict:
     """
-    return a specific manuscript
+    return a specific manuscript, without its text
+    unless `with_body` or `fields` names it
     """
-    return dbc.read_one(MANUSCRIPTS_COLLECT, {TITLE: title})
+    return bdy.unpack(dbc.read_one(
+        MANUSCRIPTS_COLLECT, {TITLE: title},
+        projection=bdy.projection(fields, with_body)))
 
 def exists(title: str) -> bool:
     """
@@ -37,6 +165,10 @@ def exists(title: str) -> bool:
 def is_valid_manuscript(title: str, author: str,
                         author_email: str, text: str,
                         abstract: str, editor_email: str) -> bool:
+    for field, val in zip(NEW_MANU_FIELDS, [title, author, author_email,
+                                            text, abstract, editor_email]):
+        if not isinstance(val, str):
+            raise TypeError(f'{field} must be a string: {val!r}')
     if not ppl.is_valid_email(author_email):
         raise ValueError(f'Author email invalid: {author_email}')
     if not ppl.is_valid_email(editor_email):
@@ -51,34 +183,103 @@ def is_valid_manuscript(title: str, author: str,
         raise ValueError("Abstract cannot be blank")
     return True
 
+def make_manuscript(title: str, author: str, author_email: str,
+                    text: str, abstract: str, editor_email: str) -> dict:
+    """
+    Validate a new manuscript and return the record we store for it.
+    """
+    is_valid_manuscript(title, author, author_email, text,
+                        abstract, editor_email)
+    return bdy.pack({
+        TITLE: title,
+        AUTHOR: author,
+        AUTHOR_EMAIL: author_email,
+        STATE: qy.SUBMITTED,
+        REFEREES: [],
+        TEXT: text,
+        ABSTRACT: abstract,
+        HISTORY: [qy.SUBMITTED],
+        EDITOR_EMAIL: editor_email,
+        VERSION: 0,
+        STATE_SINCE: evt.now(),
+    })
+
+
 def create(title: str, author: str, author_email: str,
            text: str, abstract: str, editor_email: str):
-    if exists(title):
-        raise ValueError(f"Manuscript with {title=} already exists.")
-    if is_valid_manuscript(title, author, author_email, text,
-                           abstract, editor_email):
-        manuscript = {
-            TITLE: title,
-            AUTHOR: author,
-            AUTHOR_EMAIL: author_email,
-            STATE: qy.SUBMITTED,
-            REFEREES: [],
-            TEXT: text,
-            ABSTRACT: abstract,
-            HISTORY: [qy.SUBMITTED],
-            EDITOR_EMAIL: editor_email,
-        }
+    manuscript = make_manuscript(title, author, author_email, text,
+                                 abstract, editor_email)
+    try:
         dbc.create(MANUSCRIPTS_COLLECT, manuscript)
-        return title
+    except ValueError:
+        raise ValueError(f"Manuscript with {title=} already exists.")
+    suggester.put(manuscript)
+    stats.record(after=manuscript)
+    evt.record(title, evt.CREATED, None, qy.SUBMITTED,
+               actor=author_email, when=manuscript[STATE_SINCE])
+    return title
+
+
+NEW_MANU_FIELDS = [TITLE, AUTHOR, AUTHOR_EMAIL, TEXT, ABSTRACT, EDITOR_EMAIL]
+
+
+def bulk_create(rows: list, ordered: bool = False) -> list:
+    """
+    Validate and store many new manuscripts at once.
+    Each row is a dict with the same fields create() takes.
+    Returns one result per row, in order, with the row's title.
+    """
+    invalid = {}
+    manuscripts = []
+    valid_rows = []
+    for row_num, row in enumerate(rows):
+        if not isinstance(row, dict):
+            invalid[row_num] = f'Row {row_num} is not an object'
+            continue
+        try:
+            manuscripts.append(make_manuscript(
+                *[row.get(fld) or '' for fld in NEW_MANU_FIELDS]))
+            valid_rows.append(row_num)
+        except (ValueError, TypeError) as err:
+            invalid[row_num] = str(err)
+    result = dbc.bulk_create(MANUSCRIPTS_COLLECT, manuscripts,
+                             ordered=ordered)
+    results = dbc.bulk_row_results(len(rows), invalid, valid_rows, result)
+    created = [manu for row_num, manu in zip(valid_rows, manuscripts)
+               if results[row_num][dbc.BULK_STATUS] == dbc.BULK_CREATED]
+    for manu in created:
+        suggester.put(manu)
+    stats.record_all(created)
+    evt.record_all([
+        evt.make_event(manu[TITLE], evt.CREATED, None, qy.SUBMITTED,
+                       manu[STATE_SINCE], actor=manu[AUTHOR_EMAIL])
+        for manu in created
+    ])
+    for row, row_result in zip(rows, results):
+        if isinstance(row, dict):
+            row_result[TITLE] = row.get(TITLE)
+    return results
+
+class StateChangeError(ValueError):
+    """
+    Raised when update() is asked to change the state,
+    which only update_state() may do (so the transition is logged).
+    """
+
 
 def update(title: str, updates: dict) -> dict:
+    """
+    Apply `updates` to a manuscript in one round trip and return it
+    as stored (with its text only if that was updated).
+    """
     if not title.strip():
         raise ValueError("Title cannot be blank")
-    manuscript = read_one(title)
-    if not manuscript:
-        raise ValueError(f"Manuscript with title '{title}' does not exist.")
     if TITLE in updates:
         del updates[TITLE]
+    if updates.get(STATE) is not None:
+        raise StateChangeError(
+            "Change a manuscript's state with an action, not an update")
+    updates.pop(STATE, None)
     if AUTHOR_EMAIL in updates:
         if updates[AUTHOR_EMAIL] and not ppl.is_valid_email(updates[AUTHOR_EMAIL]):
             raise ValueError(f'Invalid author email: {updates[AUTHOR_EMAIL]}')
@@ -91,34 +292,105 @@ def update(title: str, updates: dict) -> dict:
         elif not updates[EDITOR_EMAIL]:
             del updates[EDITOR_EMAIL]
 
-    dbc.update_doc(MANUSCRIPTS_COLLECT, {TITLE: title}, updates)
-    return read_one(title)
+    # one atomic write, returning the doc as it was: the counters follow
+    # the change from it, and it plus `updates` is exactly what is stored
+    before = dbc.modify_and_return(MANUSCRIPTS_COLLECT, {TITLE: title},
+                                   bdy.pack_update(updates),
+                                   return_new=False, projection=bdy.NO_BODY)
+    if not before:
+        raise ValueError(f"Manuscript with title '{title}' does not exist.")
+    manuscript = {**before, **updates}
+    suggester.put(manuscript)
+    stats.record(before, manuscript)
+    return manuscript
+
+
+class ManuscriptNotFoundError(ValueError):
+    pass
 
 
 def delete(title: str) -> bool:
+    """
+    Delete a manuscript in one round trip (and log that it went);
+    raise ManuscriptNotFoundError if there was none with that title.
+    """
     if not title.strip():
         raise ValueError("Title cannot be blank")
-    manuscript = read_one(title)
-    if not manuscript:
-        raise ValueError(f"Manuscript with title '{title}' does not exist.")
-
-    dbc.delete(MANUSCRIPTS_COLLECT, {TITLE: title})
+    deleted = dbc.delete_and_return(
+        MANUSCRIPTS_COLLECT, {TITLE: title},
+        projection=[STATE, STATE_SINCE, *stats.COUNTED_FIELDS])
+    if not deleted:
+        raise ManuscriptNotFoundError(
+            f"Manuscript with title '{title}' does not exist.")
+    suggester.delete(title)
+    stats.record(before=deleted)
+    evt.record(title, evt.DELETED, deleted.get(STATE), None,
+               since=deleted.get(STATE_SINCE))
     return True
-def update_state(title: str, action: str, **kwargs):
-    manuscript = read_one(title)
+
+
+class StateConflictError(ValueError):
+    """
+    Raised when a manuscript's state moved between reading it
+    and writing the transition.
+    """
+
+
+def update_state(title: str, action: str, expected_state: str = None,
+                 actor: str = None, **kwargs) -> dict:
+    """
+    Apply `action` to a manuscript and return the updated manuscript,
+    or None if there is no manuscript with that title.
+    The write only lands if the manuscript still has the state
+    (and version) we read; otherwise StateConflictError is raised.
+    If `expected_state` is given it must also match the current state.
+    The new state is appended to the history with $push,
+    and the transition is logged as an event (by `actor`).
+    """
+    # not from the query cache: the write below is conditioned on it
+    manuscript = dbc.read_one(MANUSCRIPTS_COLLECT, {TITLE: title},
+                              projection=[STATE, REFEREES, VERSION,
+                                          STATE_SINCE, EDITOR_EMAIL],
+                              fresh=True)
+    if not manuscript:
+        return None
     current_state = manuscript[STATE]
+    if expected_state is not None and expected_state != current_state:
+        raise StateConflictError(
+            f"{title=} is in {current_state}, not {expected_state}")
+    version = manuscript.get(VERSION, 0)
+    # handle_action() may change the referee list in place:
+    before = {**manuscript, REFEREES: list(manuscript.get(REFEREES) or [])}
     # Determine the new state using handle_action
     new_state = qy.handle_action(
-        current_state, action, title=title, **kwargs
+        current_state, action, manu=manuscript, **kwargs
     )
-    # Update the manuscript state and history in the database
-    dbc.update_doc(
+    when = evt.now()
+    set_dict = {STATE: new_state}
+    if new_state != current_state:
+        set_dict[STATE_SINCE] = when
+    if action in REFEREE_ACTIONS:
+        set_dict[REFEREES] = manuscript[REFEREES]
+    filt = {
+        TITLE: title,
+        STATE: current_state,
+        # docs written before we versioned them have no VERSION field:
+        VERSION: version if version else {'$in': [None, 0]},
+    }
+    updated = dbc.modify_and_return(
         MANUSCRIPTS_COLLECT,
-        {TITLE: title},
+        filt,
         {
-            STATE: new_state,
-            HISTORY: manuscript[HISTORY] + [new_state],
+            '$set': set_dict,
+            '$push': {HISTORY: new_state},
+            '$inc': {VERSION: 1},
         },
     )
-    return title
-
+    if updated is None:
+        raise StateConflictError(
+            f"{title=} changed state while applying {action}")
+    stats.record(before, updated)
+    evt.record(title, action, current_state, new_state,
+               since=manuscript.get(STATE_SINCE), actor=actor,
+               referee=kwargs.get('ref'), when=when)
+    return updated
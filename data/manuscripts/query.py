@@ -1,4 +1,7 @@
+from types import MappingProxyType
+
 import data.manuscripts.fields as flds
+
 # states:
 AUTHOR_REV = 'AUR'
 AUTHOR_REVISION = 'ARE'
@@ -72,7 +75,6 @@ def is_valid_action(action: str) -> bool:
     return action in VALID_ACTIONS
 
 def assign_ref(manu:dict, ref:str, extra=None)-> str:
-    print(extra)
     manu[flds.REFEREES].append(ref)
     return IN_REF_REV
 
@@ -165,10 +167,14 @@ STATE_TABLE = {
 }
 
 
-def get_valid_actions_by_state(state: str):
-    valid_actions = STATE_TABLE[state].keys()
-    print(f'{valid_actions=}')
-    return valid_actions
+# state -> the actions allowed in it; built once and read-only:
+VALID_ACTIONS_BY_STATE = MappingProxyType({
+    state: tuple(actions) for state, actions in STATE_TABLE.items()
+})
+
+
+def get_valid_actions_by_state(state: str) -> tuple:
+    return VALID_ACTIONS_BY_STATE[state]
 
 
 def handle_action(curr_state, action, **kwargs) -> str:
@@ -0,0 +1,221 @@
+"""
+Full-text search over manuscripts' titles, abstracts, authors and
+bodies (a body is searched by its stored words, since the text itself
+is compressed; see data.manuscripts.body), ranked by relevance,
+with a snippet of each hit.
+The database does the ranking where it has a text index (MongoDB's,
+or SQLite's FTS5); otherwise (e.g., mongomock) we fall back to an
+in-process inverted index scored with BM25, rebuilt after any
+manuscript write.
+"""
+import base64
+import binascii
+from collections import Counter
+import heapq
+import json
+import math
+import re
+import threading
+
+import data.db_connect as dbc
+import data.manuscripts.manuscript as mt
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+SNIPPET_CHARS = 160
+ELLIPSIS = '...'
+
+# BM25 parameters:
+K1 = 1.2
+B = 0.75
+
+# result fields:
+SCORE = 'score'
+SNIPPET = 'snippet'
+RESULT_FIELDS = [mt.TITLE, mt.AUTHOR, mt.STATE]
+# where snippets come from, best first:
+SNIPPET_FIELDS = [mt.ABSTRACT, mt.TITLE]
+HIT_FIELDS = RESULT_FIELDS + [mt.ABSTRACT]
+
+TOKEN_OFFSET = 'o'
+
+WORD = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> list:
+    return WORD.findall(text.lower())
+
+
+def encode_offset(offset: int) -> str:
+    raw = json.dumps({TOKEN_OFFSET: offset})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_offset(token: str) -> int:
+    """
+    Raises ValueError on a token we did not issue.
+    """
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(token.encode()))[
+            TOKEN_OFFSET]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError(f'Bad page token: {token}')
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError(f'Bad page token: {token}')
+    return offset
+
+
+class InvertedIndex:
+    """
+    term -> {doc key: term frequency}, with each doc's length,
+    for BM25 ranking.
+    """
+    def __init__(self):
+        self.postings = {}
+        self.lengths = {}
+        self.total_length = 0
+
+    def add(self, key: str, text: str):
+        terms = Counter(tokenize(text))
+        for term, freq in terms.items():
+            self.postings.setdefault(term, {})[key] = freq
+        length = sum(terms.values())
+        self.lengths[key] = length
+        self.total_length += length
+
+    def search(self, terms: list, limit: int) -> list:
+        """
+        Return the best `limit` (key, score) pairs for docs
+        with any of `terms`, best first.
+        """
+        num_docs = len(self.lengths)
+        if not num_docs:
+            return []
+        avg_length = self.total_length / num_docs
+        scores = Counter()
+        for term in set(terms):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (num_docs - len(docs) + 0.5)
+                           / (len(docs) + 0.5))
+            for key, freq in docs.items():
+                norm = K1 * (1 - B + B * self.lengths[key] / avg_length)
+                scores[key] += idf * freq * (K1 + 1) / (freq + norm)
+        return heapq.nlargest(limit, scores.items(),
+                              key=lambda item: (item[1], item[0]))
+
+
+# the backend we found cannot search text, so we need not ask again:
+no_text_search = None
+# the fallback index, until a manuscript write drops it:
+local_index = None
+# bumped on every drop, so an index built from stale data
+# is never kept:
+local_generation = 0
+local_lock = threading.Lock()
+
+
+def drop_local_index(db, collection):
+    global local_index, local_generation
+    if collection == mt.MANUSCRIPTS_COLLECT:
+        with local_lock:
+            local_index = None
+            local_generation += 1
+
+
+dbc.on_invalidate(drop_local_index)
+
+
+def build_local_index() -> InvertedIndex:
+    index = InvertedIndex()
+    for manu in mt.iter_manuscripts(mt.SEARCH_FIELDS):
+        index.add(manu[mt.TITLE], ' '.join(
+            str(manu.get(field) or '') for field in mt.SEARCH_FIELDS))
+    return index
+
+
+def get_local_index() -> InvertedIndex:
+    global local_index
+    index = local_index
+    if index is None:
+        generation = local_generation
+        index = build_local_index()
+        with local_lock:
+            if generation == local_generation:
+                local_index = index
+    return index
+
+
+def local_search(terms: list, limit: int, offset: int) -> list:
+    """
+    Rank on the in-process index, then fetch just this page's docs.
+    """
+    ranked = get_local_index().search(terms, offset + limit)[offset:]
+    if not ranked:
+        return []
+    docs = {doc[mt.TITLE]: doc for doc in dbc.read(
+        mt.MANUSCRIPTS_COLLECT,
+        filt={mt.TITLE: {'$in': [title for title, _ in ranked]}},
+        projection=HIT_FIELDS)}
+    return [(docs[title], score) for title, score in ranked
+            if title in docs]
+
+
+def make_snippet(manu: dict, terms: list) -> str:
+    """
+    About SNIPPET_CHARS of the abstract (or title)
+    around the first word of the query found in it.
+    """
+    found = re.compile(r'\b(' + '|'.join(map(re.escape, terms)) + r')\b',
+                       re.IGNORECASE)
+    for field in SNIPPET_FIELDS:
+        text = str(manu.get(field) or '')
+        match = found.search(text)
+        if match:
+            start = max(0, match.start() - SNIPPET_CHARS // 2)
+            end = start + SNIPPET_CHARS
+            return ((ELLIPSIS if start else '') + text[start:end].strip()
+                    + (ELLIPSIS if end < len(text) else ''))
+    text = str(manu.get(mt.ABSTRACT) or '')
+    return text[:SNIPPET_CHARS] + (ELLIPSIS if len(text) > SNIPPET_CHARS
+                                   else '')
+
+
+def make_result(manu: dict, score: float, terms: list) -> dict:
+    result = {field: manu.get(field) for field in RESULT_FIELDS}
+    result[SCORE] = round(score, 4)
+    result[SNIPPET] = make_snippet(manu, terms)
+    return result
+
+
+def search(query: str, limit: int = DEFAULT_LIMIT,
+           after: str = None) -> tuple:
+    """
+    Return one page of the manuscripts matching any word of `query`,
+    best first, and the token for the next page (None on the last).
+    Each result has the title, author, state, score and a snippet.
+    """
+    global no_text_search
+    terms = tokenize(query)
+    if not terms:
+        raise ValueError('Nothing to search for')
+    if limit < 1:
+        raise ValueError(f'Bad page size: {limit}')
+    limit = min(limit, MAX_LIMIT)
+    offset = decode_offset(after) if after else 0
+    hits = None
+    # one extra hit tells us whether there is another page:
+    if dbc.get_backend() is not no_text_search:
+        try:
+            hits = dbc.text_search(mt.MANUSCRIPTS_COLLECT, query,
+                                   projection=HIT_FIELDS, limit=limit + 1,
+                                   skip=offset)
+        except NotImplementedError:
+            no_text_search = dbc.get_backend()
+    if hits is None:
+        hits = local_search(terms, limit + 1, offset)
+    next_token = (encode_offset(offset + limit) if len(hits) > limit
+                  else None)
+    return ([make_result(manu, score, terms) for manu, score
+             in hits[:limit]], next_token)
@@ -0,0 +1,144 @@
+"""
+Dashboard counters: how many manuscripts there are in each state,
+per editor and per referee, kept in one document.
+Every write to a manuscript that changes what is counted applies
+the difference with a single $inc, so reading the counters is one
+small read however many manuscripts there are.
+rebuild() recounts them from the manuscripts, for repairs:
+
+    python -m data.manuscripts.stats
+"""
+from collections import Counter
+
+import data.db_connect as dbc
+import data.manuscripts.fields as flds
+# (manuscript imports us too; we only use it inside functions)
+import data.manuscripts.manuscript as mt
+
+STATS_COLLECT = 'manuscript_stats'
+STATS_ID = 'totals'
+
+MONGO_ID = '_id'
+
+# the manuscript fields counted:
+STATE = 'state'
+EDITOR_EMAIL = 'editor_email'
+REFEREES = flds.REFEREES
+COUNTED_FIELDS = [STATE, EDITOR_EMAIL, REFEREES]
+
+# stats fields:
+TOTAL = 'total'
+BY_STATE = 'by_state'
+BY_EDITOR = 'by_editor'
+BY_REFEREE = 'by_referee'
+GROUPS = [BY_STATE, BY_EDITOR, BY_REFEREE]
+
+# Counter keys are field names, where '.' and '$' mean something
+# and SQLite paths cannot hold quotes; we escape them:
+KEY_ESCAPES = [('%', '%25'), ('.', '%2E'), ('$', '%24'), ('"', '%22'),
+               ("'", '%27')]
+
+# read straight from the database on every request:
+dbc.skip_sync(STATS_COLLECT)
+
+
+def encode_key(key: str) -> str:
+    for char, escaped in KEY_ESCAPES:
+        key = key.replace(char, escaped)
+    return key
+
+
+def decode_key(key: str) -> str:
+    for char, escaped in reversed(KEY_ESCAPES):
+        key = key.replace(escaped, char)
+    return key
+
+
+def counts(manuscript: dict) -> Counter:
+    """
+    What one manuscript adds to the counters, as {dotted field: 1}.
+    """
+    found = Counter()
+    if not manuscript:
+        return found
+    found[TOTAL] += 1
+    if manuscript.get(STATE):
+        found[f'{BY_STATE}.{encode_key(manuscript[STATE])}'] += 1
+    if manuscript.get(EDITOR_EMAIL):
+        found[f'{BY_EDITOR}.{encode_key(manuscript[EDITOR_EMAIL])}'] += 1
+    for referee in set(manuscript.get(REFEREES) or []):
+        found[f'{BY_REFEREE}.{encode_key(str(referee))}'] += 1
+    return found
+
+
+def changes(before: dict = None, after: dict = None) -> dict:
+    """
+    The $inc that takes the counters from `before` to `after`
+    (either may be None, for a create or a delete).
+    """
+    inc = counts(after)
+    inc.subtract(counts(before))
+    return {field: num for field, num in inc.items() if num}
+
+
+def record(before: dict = None, after: dict = None):
+    """
+    Apply a manuscript's change to the counters.
+    """
+    inc = changes(before, after)
+    if inc:
+        dbc.increment(STATS_COLLECT, {MONGO_ID: STATS_ID}, inc)
+
+
+def record_all(manuscripts: list):
+    """
+    Count many new manuscripts with one write.
+    """
+    inc = Counter()
+    for manuscript in manuscripts:
+        inc.update(counts(manuscript))
+    if inc:
+        dbc.increment(STATS_COLLECT, {MONGO_ID: STATS_ID}, dict(inc))
+
+
+def decode(doc: dict) -> dict:
+    stats = {TOTAL: doc.get(TOTAL, 0)}
+    for group in GROUPS:
+        stats[group] = {decode_key(key): num
+                        for key, num in (doc.get(group) or {}).items()
+                        if num}
+    return stats
+
+
+def read() -> dict:
+    """
+    Return the counters: the total and the counts by state,
+    editor and referee (leaving out zeros).
+    """
+    doc = dbc.read_one(STATS_COLLECT, {MONGO_ID: STATS_ID})
+    return decode(doc or {})
+
+
+def rebuild() -> dict:
+    """
+    Recount every manuscript and overwrite the counters.
+    Returns the new counters.
+    """
+    inc = Counter()
+    for manuscript in mt.iter_manuscripts(COUNTED_FIELDS):
+        inc.update(counts(manuscript))
+    doc = {TOTAL: inc.pop(TOTAL, 0), **{group: {} for group in GROUPS}}
+    for field, num in inc.items():
+        group, key = field.split('.', 1)
+        doc[group][key] = num
+    dbc.bulk_update(STATS_COLLECT, [({MONGO_ID: STATS_ID}, doc)],
+                    upsert=True)
+    return decode(doc)
+
+
+def main():
+    print(rebuild())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import pytest
+
+import data.db_connect as dbc
+import data.manuscripts.body as bdy
+import data.manuscripts.manuscript as mt
+
+TEST_TITLE = 'Test Body Title'
+TEST_TEXT = 'Once upon a time. ' * 200
+
+
+@pytest.fixture
+def temp_manu():
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+    mt.create(TEST_TITLE, 'Test Author', 'author@nyu.edu', TEST_TEXT,
+              'Test Abstract', 'editor@nyu.edu')
+    yield TEST_TITLE
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+
+
+def test_pack_unpack():
+    packed = bdy.pack({mt.TITLE: TEST_TITLE, mt.TEXT: TEST_TEXT})
+    assert mt.TEXT not in packed
+    assert len(packed[bdy.TEXT_Z]) < len(TEST_TEXT)
+    assert bdy.unpack(packed) == {mt.TITLE: TEST_TITLE, mt.TEXT: TEST_TEXT}
+
+
+def test_terms():
+    assert bdy.terms('The cat saw the Cat.') == 'the cat saw'
+    assert bdy.pack({mt.TEXT: 'A b a'})[bdy.TEXT_TERMS] == 'a b'
+
+
+def test_pack_update():
+    assert bdy.pack_update({mt.TITLE: TEST_TITLE}) == {
+        '$set': {mt.TITLE: TEST_TITLE}}
+    update = bdy.pack_update({mt.TEXT: TEST_TEXT})
+    assert update['$unset'] == {mt.TEXT: ''}
+    assert bdy.decompress(update['$set'][bdy.TEXT_Z]) == TEST_TEXT
+
+
+def test_pack_none():
+    assert bdy.unpack(bdy.pack({mt.TEXT: None})) == {mt.TEXT: None}
+
+
+def test_unpack_leaves_doc_alone():
+    packed = bdy.pack({mt.TEXT: TEST_TEXT})
+    bdy.unpack(packed)
+    assert bdy.TEXT_Z in packed
+    manu = {mt.TITLE: TEST_TITLE}
+    assert bdy.unpack(manu) is manu
+
+
+def test_projection():
+    assert bdy.projection() == bdy.NO_BODY
+    assert bdy.projection(with_body=True) == {bdy.TEXT_TERMS: 0}
+    assert bdy.projection([mt.TITLE]) == [mt.TITLE]
+    assert bdy.projection([mt.TITLE, mt.TEXT]) == [
+        mt.TITLE, mt.TEXT, bdy.TEXT_Z]
+
+
+def test_read_one_without_body(temp_manu):
+    manu = mt.read_one(temp_manu)
+    assert manu[mt.ABSTRACT] == 'Test Abstract'
+    assert mt.TEXT not in manu
+    assert bdy.TEXT_Z not in manu
+    assert mt.read_one(temp_manu, with_body=True)[mt.TEXT] == TEST_TEXT
+    assert mt.read_one(temp_manu, [mt.TEXT])[mt.TEXT] == TEST_TEXT
+
+
+def test_stored_compressed(temp_manu):
+    stored = dbc.read_one(mt.MANUSCRIPTS_COLLECT, {mt.TITLE: temp_manu})
+    assert mt.TEXT not in stored
+    assert bdy.decompress(stored[bdy.TEXT_Z]) == TEST_TEXT
+
+
+def test_listings_without_body(temp_manu):
+    assert mt.TEXT not in mt.read()[temp_manu]
+    assert mt.read([mt.TEXT])[temp_manu][mt.TEXT] == TEST_TEXT
+    streamed = [manu for manu in mt.iter_manuscripts()
+                if manu[mt.TITLE] == temp_manu]
+    assert mt.TEXT not in streamed[0]
+
+
+def test_update_text(temp_manu):
+    updated = mt.update(temp_manu, {mt.TEXT: 'New text'})
+    assert updated[mt.TEXT] == 'New text'
+    assert mt.read_one(temp_manu, with_body=True)[mt.TEXT] == 'New text'
+
+
+def test_update_legacy_text(temp_manu):
+    # as written before bodies were compressed:
+    dbc.update_doc(mt.MANUSCRIPTS_COLLECT, {mt.TITLE: temp_manu},
+                   {mt.TEXT: 'Old inline text'})
+    mt.update(temp_manu, {mt.TEXT: 'New text'})
+    stored = dbc.read_one(mt.MANUSCRIPTS_COLLECT, {mt.TITLE: temp_manu})
+    assert mt.TEXT not in stored
+    assert stored[bdy.TEXT_TERMS] == 'new text'
+
+
+def test_terms_not_read(temp_manu):
+    assert bdy.TEXT_TERMS not in mt.read_one(temp_manu)
+    assert bdy.TEXT_TERMS not in mt.read_one(temp_manu, with_body=True)
+
+
+def test_migrate(temp_manu):
+    # as written before bodies were compressed:
+    dbc.update_doc(mt.MANUSCRIPTS_COLLECT, {mt.TITLE: temp_manu},
+                   {mt.TEXT: 'Old inline text'})
+    assert bdy.migrate() >= 1
+    stored = dbc.read_one(mt.MANUSCRIPTS_COLLECT, {mt.TITLE: temp_manu})
+    assert mt.TEXT not in stored
+    assert bdy.decompress(stored[bdy.TEXT_Z]) == 'Old inline text'
+    assert stored[bdy.TEXT_TERMS] == 'old inline text'
+
+
+def test_migrate_adds_terms(temp_manu):
+    # as compressed before the words were stored:
+    dbc.modify_and_return(mt.MANUSCRIPTS_COLLECT, {mt.TITLE: temp_manu},
+                          {'$unset': {bdy.TEXT_TERMS: ''}})
+    assert bdy.migrate() >= 1
+    stored = dbc.read_one(mt.MANUSCRIPTS_COLLECT, {mt.TITLE: temp_manu})
+    assert stored[bdy.TEXT_TERMS] == bdy.terms(TEST_TEXT)
+    assert bdy.decompress(stored[bdy.TEXT_Z]) == TEST_TEXT
+
+
+def test_migrate_in_batches(temp_manu, monkeypatch):
+    titles = [f'{TEST_TITLE} {num}' for num in range(3)]
+    for title in titles:
+        if mt.exists(title):
+            mt.delete(title)
+        mt.create(title, 'Test Author', 'author@nyu.edu', TEST_TEXT,
+                  'Test Abstract', 'editor@nyu.edu')
+        dbc.update_doc(mt.MANUSCRIPTS_COLLECT, {mt.TITLE: title},
+                       {mt.TEXT: 'Old inline text'})
+    batches = []
+    run_bulk = dbc.run_bulk
+
+    def record(collection, ops, ordered):
+        batches.append(len(ops))
+        return run_bulk(collection, ops, ordered)
+    monkeypatch.setattr(bdy, 'MIGRATE_BATCH', 2)
+    monkeypatch.setattr(dbc, 'run_bulk', record)
+    try:
+        assert bdy.migrate() == sum(batches) >= 3
+        assert max(batches) == 2
+    finally:
+        for title in titles:
+            mt.delete(title)
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import data.manuscripts.events as evt
+import data.manuscripts.manuscript as mt
+import data.manuscripts.query as qy
+
+TEST_TITLE = 'Test Events Title'
+TEST_ACTOR = 'editor@nyu.edu'
+TEST_REFEREE = 'Test Referee'
+
+SINCE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+WHEN = SINCE + timedelta(hours=2)
+
+
+@pytest.fixture
+def temp_manu():
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+    mt.create(TEST_TITLE, 'Test Author', 'author@nyu.edu', 'Test Text',
+              'Test Abstract', TEST_ACTOR)
+    yield TEST_TITLE
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+
+
+def test_make_event_dwell():
+    event = evt.make_event(TEST_TITLE, qy.REJECT, qy.SUBMITTED,
+                           qy.REJECTED, WHEN, since=SINCE)
+    assert event[evt.DWELL_SECONDS] == 7200
+    # stored datetimes come back naive:
+    event = evt.make_event(TEST_TITLE, qy.REJECT, qy.SUBMITTED,
+                           qy.REJECTED, WHEN,
+                           since=SINCE.replace(tzinfo=None))
+    assert event[evt.DWELL_SECONDS] == 7200
+
+
+def test_projection_ops():
+    event = evt.make_event(TEST_TITLE, qy.REJECT, qy.SUBMITTED,
+                           qy.REJECTED, WHEN, since=SINCE)
+    leave, enter = evt.projection_ops(event)
+    assert leave[1] == {'_id': qy.SUBMITTED}
+    assert leave[2] == {'$inc': {evt.COUNT: -1, evt.DWELL_TOTAL: 7200,
+                                 evt.EXITS: 1}}
+    assert enter[2] == {'$inc': {evt.COUNT: 1}}
+
+
+def test_projection_ops_unknown_since():
+    event = evt.make_event(TEST_TITLE, qy.REJECT, qy.SUBMITTED,
+                           qy.REJECTED, WHEN)
+    assert [op[1] for op in evt.projection_ops(event)] == [
+        {'_id': qy.REJECTED}]
+
+
+def test_projection_ops_same_state():
+    event = evt.make_event(TEST_TITLE, qy.ASSIGN_REF, qy.IN_REF_REV,
+                           qy.IN_REF_REV, WHEN, since=SINCE)
+    assert evt.projection_ops(event) == []
+
+
+def test_update_state_records_event(temp_manu):
+    mt.update_state(temp_manu, qy.ASSIGN_REF, actor=TEST_ACTOR,
+                    ref=TEST_REFEREE)
+    created, assigned = evt.read_history(temp_manu)[-2:]
+    assert created[evt.ACTION] == evt.CREATED
+    assert created[evt.TO_STATE] == qy.SUBMITTED
+    assert assigned[evt.ACTION] == qy.ASSIGN_REF
+    assert assigned[evt.FROM_STATE] == qy.SUBMITTED
+    assert assigned[evt.TO_STATE] == qy.IN_REF_REV
+    assert assigned[evt.ACTOR] == TEST_ACTOR
+    assert assigned[evt.REFEREE] == TEST_REFEREE
+    assert assigned[evt.DWELL_SECONDS] >= 0
+    assert assigned[evt.TIMESTAMP] >= created[evt.TIMESTAMP]
+
+
+def test_state_stats_follow_events(temp_manu):
+    before = evt.read_state_stats()
+    mt.update_state(temp_manu, qy.REJECT)
+    after = evt.read_state_stats()
+    assert after[qy.SUBMITTED][evt.COUNT] == \
+        before[qy.SUBMITTED][evt.COUNT] - 1
+    assert after[qy.REJECTED][evt.COUNT] == \
+        before[qy.REJECTED][evt.COUNT] + 1
+    assert after[qy.SUBMITTED][evt.AVG_DWELL_SECONDS] >= 0
+    mt.delete(temp_manu)
+    assert evt.read_state_stats()[qy.REJECTED][evt.COUNT] == \
+        before[qy.REJECTED][evt.COUNT]
+
+
+def test_rebuild_projections(temp_manu):
+    mt.update_state(temp_manu, qy.ASSIGN_REF, ref=TEST_REFEREE)
+    counts = {state: stat[evt.COUNT]
+              for state, stat in evt.read_state_stats().items()}
+    rebuilt = evt.rebuild_projections()
+    assert {state: rebuilt[state][evt.COUNT]
+            for state in qy.VALID_STATES} == counts
+    assert {state: stat[evt.COUNT]
+            for state, stat in evt.read_state_stats().items()} == counts
@@ -1,5 +1,8 @@
 import pytest
+from unittest.mock import patch
+
 import data.manuscripts.manuscript as mt
+import data.manuscripts.query as qy
 
 TEST_TITLE = "Test Title"
 TEST_AUTHOR = "Test Author"
@@ -104,4 +107,185 @@ def test_update_state():
     updated_manuscript = mt.read_one(TEST_TITLE)
     assert updated_manuscript['state'] == 'REJ'
     assert updated_manuscript['history'] == ['SUB', 'REJ']
-    mt.delete(TEST_TITLE)
\ No newline at end of file
+    mt.delete(TEST_TITLE)
+
+def test_read_fields():
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+    mt.create(TEST_TITLE, TEST_AUTHOR, TEST_AUTHOR_EMAIL,
+              TEST_TEXT, TEST_ABSTRACT, TEST_EDITOR_EMAIL)
+    manuscripts = mt.read([mt.STATE])
+    assert TEST_TITLE in manuscripts
+    manuscript = manuscripts[TEST_TITLE]
+    assert manuscript[mt.STATE] == 'SUB'
+    assert mt.TEXT not in manuscript
+    mt.delete(TEST_TITLE)
+
+
+def test_read_one_fields():
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+    mt.create(TEST_TITLE, TEST_AUTHOR, TEST_AUTHOR_EMAIL,
+              TEST_TEXT, TEST_ABSTRACT, TEST_EDITOR_EMAIL)
+    manuscript = mt.read_one(TEST_TITLE, [mt.TITLE])
+    assert manuscript[mt.TITLE] == TEST_TITLE
+    assert mt.TEXT not in manuscript
+    mt.delete(TEST_TITLE)
+
+
+def test_create_duplicate():
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+    mt.create(TEST_TITLE, TEST_AUTHOR, TEST_AUTHOR_EMAIL,
+              TEST_TEXT, TEST_ABSTRACT, TEST_EDITOR_EMAIL)
+    with pytest.raises(ValueError, match='already exists'):
+        mt.create(TEST_TITLE, TEST_AUTHOR, TEST_AUTHOR_EMAIL,
+                  TEST_TEXT, TEST_ABSTRACT, TEST_EDITOR_EMAIL)
+    mt.delete(TEST_TITLE)
+
+
+def test_update_not_there():
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+    with pytest.raises(ValueError, match='does not exist'):
+        mt.update(TEST_TITLE, {mt.AUTHOR: TEST_AUTHOR})
+
+
+@pytest.fixture
+def temp_manu():
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+    mt.create(TEST_TITLE, TEST_AUTHOR, TEST_AUTHOR_EMAIL,
+              TEST_TEXT, TEST_ABSTRACT, TEST_EDITOR_EMAIL)
+    yield TEST_TITLE
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+
+
+def test_update_state_returns_manuscript(temp_manu):
+    updated = mt.update_state(temp_manu, qy.ASSIGN_REF, ref=TEST_REFEREE)
+    assert updated[mt.STATE] == qy.IN_REF_REV
+    assert updated[mt.HISTORY] == [qy.SUBMITTED, qy.IN_REF_REV]
+    assert updated[mt.REFEREES] == [TEST_REFEREE]
+    assert updated[mt.VERSION] == 1
+
+
+def test_update_state_not_there():
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+    assert mt.update_state(TEST_TITLE, qy.REJECT) is None
+
+
+def test_update_state_wrong_expected_state(temp_manu):
+    with pytest.raises(mt.StateConflictError):
+        mt.update_state(temp_manu, qy.REJECT, expected_state=qy.IN_REF_REV)
+
+
+def test_update_state_lost_race(temp_manu):
+    stale = mt.read_one(temp_manu)
+    mt.update_state(temp_manu, qy.ASSIGN_REF, ref=TEST_REFEREE)
+    with patch('data.db_connect.read_one', return_value=stale):
+        with pytest.raises(mt.StateConflictError):
+            mt.update_state(temp_manu, qy.REJECT)
+    assert mt.read_one(temp_manu)[mt.STATE] == qy.IN_REF_REV
+
+
+def test_update_state_ignores_cached_read(temp_manu):
+    mt.read_one(temp_manu, [mt.STATE, mt.REFEREES, mt.VERSION,
+                            mt.STATE_SINCE, mt.EDITOR_EMAIL])
+    # another worker's write, which this process's cache has not seen:
+    mt.dbc.get_backend().update_one(mt.dbc.SE_DB, mt.MANUSCRIPTS_COLLECT,
+                                    {mt.TITLE: temp_manu},
+                                    {'$inc': {mt.VERSION: 1}})
+    updated = mt.update_state(temp_manu, qy.ASSIGN_REF, ref=TEST_REFEREE)
+    assert updated[mt.STATE] == qy.IN_REF_REV
+
+
+def test_bulk_create():
+    titles = [TEST_TITLE, TEST_TITLE + ' 2']
+    for title in titles:
+        if mt.exists(title):
+            mt.delete(title)
+    good_row = {mt.TITLE: TEST_TITLE, mt.AUTHOR: TEST_AUTHOR,
+                mt.AUTHOR_EMAIL: TEST_AUTHOR_EMAIL, mt.TEXT: TEST_TEXT,
+                mt.ABSTRACT: TEST_ABSTRACT,
+                mt.EDITOR_EMAIL: TEST_EDITOR_EMAIL}
+    rows = [good_row,
+            {**good_row, mt.TITLE: titles[1], mt.TEXT: ''},
+            good_row]
+    results = mt.bulk_create(rows)
+    assert [result['status'] for result in results] == [
+        'created', 'failed', 'failed']
+    assert mt.exists(TEST_TITLE)
+    assert not mt.exists(titles[1])
+    mt.delete(TEST_TITLE)
+
+
+def test_update_rejects_state(temp_manu):
+    with pytest.raises(mt.StateChangeError):
+        mt.update(temp_manu, {mt.STATE: qy.REJECTED})
+    assert mt.read_one(temp_manu)[mt.STATE] == qy.SUBMITTED
+
+
+def test_update_returns_stored_doc(temp_manu):
+    updated = mt.update(temp_manu, {mt.AUTHOR: 'Updated Author'})
+    assert updated == mt.read_one(temp_manu)
+    assert updated[mt.STATE_SINCE]
+
+
+def test_update_counts_from_pre_image(temp_manu):
+    with patch.object(mt, 'read_one') as mock_read_one:
+        updated = mt.update(temp_manu, {mt.EDITOR_EMAIL: 'other@nyu.edu'})
+    mock_read_one.assert_not_called()
+    assert updated[mt.EDITOR_EMAIL] == 'other@nyu.edu'
+    assert updated == mt.read_one(temp_manu)
+
+
+def test_bulk_create_non_string_field():
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+    good_row = {mt.TITLE: TEST_TITLE, mt.AUTHOR: TEST_AUTHOR,
+                mt.AUTHOR_EMAIL: TEST_AUTHOR_EMAIL, mt.TEXT: TEST_TEXT,
+                mt.ABSTRACT: TEST_ABSTRACT,
+                mt.EDITOR_EMAIL: TEST_EDITOR_EMAIL}
+    results = mt.bulk_create([good_row, {**good_row, mt.TITLE: 42}])
+    assert [result['status'] for result in results] == ['created', 'failed']
+    assert mt.TITLE in results[1]['message']
+    assert mt.exists(TEST_TITLE)
+    mt.delete(TEST_TITLE)
+
+
+def test_delete_not_there():
+    with pytest.raises(mt.ManuscriptNotFoundError):
+        mt.delete('No Such Manuscript Title')
+
+
+def test_read_summaries(temp_manu):
+    mt.update_state(temp_manu, qy.ASSIGN_REF, ref=TEST_REFEREE)
+    summaries = mt.read_summaries(editor_email=TEST_EDITOR_EMAIL)
+    summary = [summ for summ in summaries if summ[mt.TITLE] == temp_manu][0]
+    assert summary[mt.STATE] == qy.IN_REF_REV
+    assert summary[mt.REFEREE_COUNT] == 1
+    assert mt.TEXT not in summary
+    assert mt.ABSTRACT not in summary
+    titles = [summ[mt.TITLE] for summ in summaries]
+    assert titles == sorted(titles)
+
+
+def test_read_summaries_filtered(temp_manu):
+    assert mt.read_summaries(state=qy.PUBLISHED,
+                             author_email=TEST_AUTHOR_EMAIL) == []
+
+
+def test_read_summaries_page(temp_manu):
+    summaries, _ = mt.read_summaries_page(1, state=qy.SUBMITTED,
+                                          author_email=TEST_AUTHOR_EMAIL)
+    assert summaries[0][mt.TITLE] == temp_manu
+    assert summaries[0][mt.REFEREE_COUNT] == 0
+
+
+def test_read_titles_by_state(temp_manu):
+    titles_by_state = mt.read_titles_by_state()
+    assert temp_manu in titles_by_state[qy.SUBMITTED]
+    for titles in titles_by_state.values():
+        assert titles == sorted(titles)
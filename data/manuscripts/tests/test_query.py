@@ -47,4 +47,11 @@ def test_handle_action_valid_return():
                                            manu=mqry.SAMPLE_MANU,
                                            ref='Some ref')
             print(f'{new_state=}')
-            assert mqry.is_valid_state(new_state)
\ No newline at end of file
+            assert mqry.is_valid_state(new_state)
+
+
+def test_valid_actions_by_state():
+    for state, actions in mqry.STATE_TABLE.items():
+        assert mqry.get_valid_actions_by_state(state) == tuple(actions)
+    with pytest.raises(TypeError):
+        mqry.VALID_ACTIONS_BY_STATE[mqry.SUBMITTED] = ()
@@ -0,0 +1,79 @@
+import pytest
+
+import data.manuscripts.manuscript as mt
+import data.manuscripts.search as srch
+
+TITLES = ['Test Search Zebrafish Fins', 'Test Search Zebrafish Gills']
+
+
+@pytest.fixture
+def temp_manus():
+    for title in TITLES:
+        if mt.exists(title):
+            mt.delete(title)
+    mt.create(TITLES[0], 'Test Author', 'author@nyu.edu',
+              'Zebrafish fins regrow. Zebrafish are small.',
+              'How zebrafish regrow their fins.', 'editor@nyu.edu')
+    mt.create(TITLES[1], 'Test Author', 'author@nyu.edu',
+              'Gills, not lungs.', 'Breathing underwater.', 'editor@nyu.edu')
+    yield TITLES
+    for title in TITLES:
+        if mt.exists(title):
+            mt.delete(title)
+
+
+def test_inverted_index_ranks():
+    index = srch.InvertedIndex()
+    index.add('a', 'ocean ocean ocean waves')
+    index.add('b', 'ocean floor')
+    index.add('c', 'mountains')
+    ranked = index.search(['ocean'], 10)
+    assert [key for key, _ in ranked] == ['a', 'b']
+    assert index.search(['desert'], 10) == []
+
+
+def test_offset_token():
+    assert srch.decode_offset(srch.encode_offset(40)) == 40
+    with pytest.raises(ValueError):
+        srch.decode_offset('not a token')
+
+
+def test_make_snippet():
+    manu = {mt.ABSTRACT: 'x' * 200 + ' needle ' + 'y' * 200}
+    snippet = srch.make_snippet(manu, ['needle'])
+    assert 'needle' in snippet
+    assert snippet.startswith(srch.ELLIPSIS)
+    assert snippet.endswith(srch.ELLIPSIS)
+
+
+def test_search(temp_manus):
+    results, next_token = srch.search('Zebrafish!')
+    titles = [result[mt.TITLE] for result in results]
+    assert set(TITLES) <= set(titles)
+    assert titles.index(TITLES[0]) < titles.index(TITLES[1])
+    assert 'zebrafish' in results[0][srch.SNIPPET].lower()
+    assert next_token is None
+
+
+def test_search_body(temp_manus):
+    results, _ = srch.search('lungs')
+    assert [result[mt.TITLE] for result in results] == [TITLES[1]]
+
+
+def test_search_paging(temp_manus):
+    first, next_token = srch.search('zebrafish gills', limit=1)
+    assert len(first) == 1
+    second, _ = srch.search('zebrafish gills', limit=1, after=next_token)
+    assert second[0][mt.TITLE] != first[0][mt.TITLE]
+
+
+def test_search_sees_writes(temp_manus):
+    srch.search('zebrafish')
+    mt.delete(TITLES[0])
+    results, _ = srch.search('zebrafish')
+    assert TITLES[0] not in [result[mt.TITLE] for result in results]
+
+
+def test_search_nothing():
+    with pytest.raises(ValueError):
+        srch.search('  !! ')
@@ -0,0 +1,64 @@
+import pytest
+
+import data.manuscripts.manuscript as mt
+import data.manuscripts.query as qy
+import data.manuscripts.stats as mst
+
+TEST_TITLE = 'Test Stats Title'
+TEST_EDITOR_EMAIL = 'stats.editor@nyu.edu'
+TEST_REFEREE = 'stats.referee@nyu.edu'
+
+
+@pytest.fixture
+def temp_manu():
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+    mt.create(TEST_TITLE, 'Test Author', 'author@nyu.edu', 'Test Text',
+              'Test Abstract', TEST_EDITOR_EMAIL)
+    yield TEST_TITLE
+    if mt.exists(TEST_TITLE):
+        mt.delete(TEST_TITLE)
+
+
+def test_key_round_trip():
+    key = "o'neil.$x%2E@nyu.edu"
+    encoded = mst.encode_key(key)
+    assert '.' not in encoded and '$' not in encoded
+    assert mst.decode_key(encoded) == key
+
+
+def test_changes():
+    before = {mst.STATE: qy.SUBMITTED, mst.EDITOR_EMAIL: 'a@nyu.edu',
+              mst.REFEREES: []}
+    after = {**before, mst.STATE: qy.IN_REF_REV, mst.REFEREES: ['r']}
+    assert mst.changes(before, after) == {
+        f'{mst.BY_STATE}.{qy.SUBMITTED}': -1,
+        f'{mst.BY_STATE}.{qy.IN_REF_REV}': 1,
+        f'{mst.BY_REFEREE}.r': 1,
+    }
+    assert mst.changes(before, before) == {}
+    assert mst.changes(after=before)[mst.TOTAL] == 1
+
+
+def test_counters_follow_writes(temp_manu):
+    stats = mst.read()
+    assert stats[mst.BY_EDITOR][TEST_EDITOR_EMAIL] == 1
+    assert stats[mst.BY_STATE][qy.SUBMITTED] >= 1
+    mt.update_state(temp_manu, qy.ASSIGN_REF, ref=TEST_REFEREE)
+    stats = mst.read()
+    assert stats[mst.BY_REFEREE][TEST_REFEREE] == 1
+    mt.update(temp_manu, {mt.EDITOR_EMAIL: 'other.' + TEST_EDITOR_EMAIL})
+    assert TEST_EDITOR_EMAIL not in mst.read()[mst.BY_EDITOR]
+    total = mst.read()[mst.TOTAL]
+    mt.delete(temp_manu)
+    stats = mst.read()
+    assert stats[mst.TOTAL] == total - 1
+    assert TEST_REFEREE not in stats[mst.BY_REFEREE]
+
+
+def test_rebuild(temp_manu):
+    mst.rebuild()
+    mt.update_state(temp_manu, qy.ASSIGN_REF, ref=TEST_REFEREE)
+    stats = mst.read()
+    assert mst.rebuild() == stats
+    assert mst.read() == stats
@@ -5,11 +5,15 @@ This module interfaces to our user data.
 import re
 
 import data.db_connect as dbc
+import data.logger as lg
 
 import data.roles as rls
+import data.suggest as sg
 
 from werkzeug.security import generate_password_hash, check_password_hash
 
+log = lg.get_logger(__name__)
+
 PEOPLE_COLLECT = 'people'
 USER_COLLECT = 'users'
 
@@ -39,8 +43,17 @@ people_dict = {
     },
 }
 
-client = dbc.connect_db()
-print(f'{client=}')
+USER_ROLE = 'role'
+
+dbc.declare_index(PEOPLE_COLLECT, EMAIL, unique=True)
+dbc.declare_index(PEOPLE_COLLECT, ROLES)
+dbc.declare_index(USER_COLLECT, EMAIL, unique=True)
+dbc.declare_index(USER_COLLECT, USER_ROLE)
+
+# People and users change rarely but are read on every page:
+CACHE_TTL = 30
+dbc.cache_collection(PEOPLE_COLLECT, CACHE_TTL)
+dbc.cache_collection(USER_COLLECT, CACHE_TTL)
 
 first_part = (
     r"[a-zA-Z0-9]"
@@ -52,6 +65,26 @@ third_part = r"[a-zA-Z]{2,6}"
 EMAIL_REGEX = rf"^{first_part}@{second_part}\.{third_part}$"
 
 
+def make_suggest_entry(person: dict) -> tuple:
+    return (person[EMAIL], sg.make_keys(person.get(NAME), person[EMAIL]),
+            {NAME: person.get(NAME), EMAIL: person[EMAIL]})
+
+
+# autocomplete on names and emails; our writes below keep it current:
+suggester = sg.Suggester(PEOPLE_COLLECT,
+                         lambda: dbc.iter_docs(PEOPLE_COLLECT,
+                                               projection=[NAME, EMAIL]),
+                         make_suggest_entry)
+
+
+def suggest(prefix: str, limit: int = sg.DEFAULT_LIMIT) -> list:
+    """
+    Return up to `limit` people ({name, email}) whose name,
+    a word of it, or email starts with `prefix`.
+    """
+    return suggester.suggest(prefix, limit)
+
+
 def is_valid_email(email: str) -> bool:
     return bool(re.match(EMAIL_REGEX, email))
 
@@ -81,20 +114,35 @@ def get_person(email):
         return None
 
 
-def read() -> dict:
+def read(fields: list = None) -> dict:
     """
     Our contract:
-        - No arguments.
+        - Optional list of fields to return (all fields if None).
         - Returns a dictionary of users keyed on user email.
         - Each user email must be the key for another dictionary.
     """
-    people = dbc.read_dict(PEOPLE_COLLECT, EMAIL)
-    if not people:
-        print("There is no people in the mongodb")
-    print(f'{people=}')
+    people = dbc.read_dict(PEOPLE_COLLECT, EMAIL, projection=fields)
+    log.debug('people.read', sample=lg.HOT, count=len(people))
     return people
 
 
+def read_page(limit: int, after: str = None, fields: list = None) -> tuple:
+    """
+    Return one page of people keyed on email (in email order)
+    and the token for the next page, or None on the last page.
+    """
+    people, next_token = dbc.read_page(PEOPLE_COLLECT, EMAIL, limit,
+                                       after=after, projection=fields)
+    return {person[EMAIL]: person for person in people}, next_token
+
+
+def iter_people(fields: list = None):
+    """
+    Yield people one at a time, for streaming responses.
+    """
+    return dbc.iter_docs(PEOPLE_COLLECT, projection=fields)
+
+
 def read_one(email: str) -> dict:
     """
     Return a person record if email present in DB,
@@ -110,27 +158,25 @@ def exists(email: str) -> bool:
 def delete_person(email: str):
     """
     Delete a person from MongoDB by email.
-    If the person does not exist, print a message and return None.
+    If the person does not exist, log it and return None.
+    One round trip: the delete itself tells us whether they existed.
     """
-    person = dbc.fetch_one(PEOPLE_COLLECT, {"email": email})
-    if person is None:
-        print(f'No person found with {email=}')
+    if not dbc.delete(PEOPLE_COLLECT, {"email": email}):
+        log.info('people.delete.not_found', email=email)
         return None
-    result = dbc.delete(PEOPLE_COLLECT, {"email": email})
-    print(result)
-    print(f"Deleted {email=}")
+    suggester.delete(email)
+    log.info('people.deleted', email=email)
     return email
 
 
-def create_person(name: str,
-                  affiliation: str,
-                  email: str,
-                  role: str = None,
-                  roles: list = None):
-
-    if exists(email):
-        raise ValueError(f'Adding duplicate {email=}')
-
+def make_person(name: str,
+                affiliation: str,
+                email: str,
+                role: str = None,
+                roles: list = None) -> dict:
+    """
+    Validate a person and return the record we store for them.
+    """
     # Normalize into a list
     if roles is not None:
         # validate each role in the list
@@ -141,17 +187,75 @@ def create_person(name: str,
         is_valid_person(name, affiliation, email, role=role)
         roles_list = [role] if role else []
 
-    person = {
+    return {
         NAME: name,
         AFFILIATION: affiliation,
         EMAIL: email,
         ROLES: roles_list
     }
-    print("Creating person:", person)
-    dbc.create(PEOPLE_COLLECT, person)
+
+
+def create_person(name: str,
+                  affiliation: str,
+                  email: str,
+                  role: str = None,
+                  roles: list = None):
+    person = make_person(name, affiliation, email, role=role, roles=roles)
+    log.debug('people.create', email=email)
+    try:
+        dbc.create(PEOPLE_COLLECT, person)
+    except ValueError:
+        raise ValueError(f'Adding duplicate {email=}')
+    suggester.put(person)
     return email
 
 
+def bulk_create_people(rows: list, upsert: bool = False,
+                       ordered: bool = False) -> list:
+    """
+    Validate and store many people at once.
+    Each row has the same fields as a single create; `roles` may be
+    a list or a single role code.
+    With `upsert`, existing people (by email) are updated instead of
+    being reported as duplicates.
+    Returns one result per row, in order, with the row's email.
+    """
+    invalid = {}
+    people = []
+    valid_rows = []
+    for row_num, row in enumerate(rows):
+        if not isinstance(row, dict):
+            invalid[row_num] = f'Row {row_num} is not an object'
+            continue
+        roles_input = row.get(ROLES)
+        if isinstance(roles_input, list):
+            role_kw = {'roles': roles_input}
+        else:
+            role_kw = {'role': roles_input}
+        try:
+            people.append(make_person(row.get(NAME), row.get(AFFILIATION),
+                                      row.get(EMAIL) or '', **role_kw))
+            valid_rows.append(row_num)
+        except (ValueError, TypeError) as err:
+            invalid[row_num] = str(err)
+    if upsert:
+        result = dbc.bulk_update(
+            PEOPLE_COLLECT,
+            [({EMAIL: person[EMAIL]}, person) for person in people],
+            upsert=True, ordered=ordered)
+    else:
+        result = dbc.bulk_create(PEOPLE_COLLECT, people, ordered=ordered)
+    results = dbc.bulk_row_results(len(rows), invalid, valid_rows, result)
+    for person, row in zip(people, valid_rows):
+        if results[row][dbc.BULK_STATUS] in (dbc.BULK_CREATED,
+                                             dbc.BULK_UPDATED):
+            suggester.put(person)
+    for row, row_result in zip(rows, results):
+        if isinstance(row, dict):
+            row_result[EMAIL] = row.get(EMAIL)
+    return results
+
+
 def has_arole(person: dict, role: str):
     if role in person[ROLES]:
         return True
@@ -173,52 +277,57 @@ def create_mh_rec(person: dict) -> dict:
     return mh_rec
 
 
-def get_masthead():
-    masthead = {}
+MASTHEAD_FILTER = {ROLES: {'$in': rls.MH_ROLES}}
+
+
+def read_masthead_people() -> list:
+    """
+    Return everyone holding at least one masthead role,
+    fetched with a single query on the roles field.
+    """
+    return dbc.read(PEOPLE_COLLECT, filt=MASTHEAD_FILTER)
+
+
+def build_masthead(people: list) -> dict:
+    """
+    Build the role -> people mapping in a single pass over `people`.
+    """
     mh_roles = rls.get_masthead_roles()
-    for mh_role, text in mh_roles.items():
-        people_w_role = {}
-        for person_email, person_data in read().items():
-            if has_arole(person_data, mh_role):
-                people_w_role[person_email] = person_data
-        masthead[text] = people_w_role
+    masthead = {text: {} for text in mh_roles.values()}
+    for person in people:
+        for role in person.get(ROLES, []):
+            if role in mh_roles:
+                masthead[mh_roles[role]][person[EMAIL]] = person
     return masthead
 
 
+def get_masthead():
+    return build_masthead(read_masthead_people())
+
+
 def update_person(name: str, affiliation: str, email: str, roles: list):
     """
     Update the details of an existing person in MongoDB.
     If the person with the given email exists,
     update their name, affiliation, and roles (appending to existing roles).
     """
-    # Fetch the person from MongoDB
-    person = dbc.fetch_one(PEOPLE_COLLECT, {"email": email})
-
-    if person:
-        # Prepare the fields to update
-        update_fields = {
-            NAME: name,
-            AFFILIATION: affiliation,
-            ROLES: roles
-        }
-
-        # Use update_doc to apply the updates
-        dbc.update_doc(PEOPLE_COLLECT, {"email": email}, update_fields)
-
-        # Return the updated document for confirmation
-        return dbc.fetch_one(PEOPLE_COLLECT, {"email": email})
-    else:
-        # Raise an error if the person does not exist in MongoDB
+    update_fields = {
+        NAME: name,
+        AFFILIATION: affiliation,
+        ROLES: roles
+    }
+    person = dbc.update_and_return(PEOPLE_COLLECT, {EMAIL: email},
+                                   update_fields)
+    if person is None:
         raise ValueError(f'Person with email {email} does not exist')
+    suggester.put(person)
+    return person
 
 
 PASSWORD = 'password'
 
 
 def register_user(email: str, password: str, role: str = "author"):
-    existing_user = dbc.read_one(USER_COLLECT, {EMAIL: email})
-    if existing_user:
-        raise ValueError(f'User already exists: {email}')
     if not is_valid_email(email):
         raise ValueError(f'Invalid email: {email}')
     if not password:
@@ -229,11 +338,14 @@ def register_user(email: str, password: str, role: str = "author"):
     user = {
         EMAIL: email,
         PASSWORD: hashed_pw,
-        "role": role
+        USER_ROLE: role
     }
 
-    dbc.create(USER_COLLECT, user)
-    print(f'User registered: {email}')
+    try:
+        dbc.create(USER_COLLECT, user)
+    except ValueError:
+        raise ValueError(f'User already exists: {email}')
+    log.info('users.registered', email=email)
     return email
 
 
@@ -257,3 +369,25 @@ def get_user_by_email(email: str) -> dict:
 
 def read_users() -> dict:
     return dbc.read_dict(USER_COLLECT, EMAIL)
+
+
+def read_users_page(limit: int, after: str = None,
+                    roles: list = None) -> tuple:
+    """
+    Return one page of users keyed on email (in email order),
+    optionally limited to users with one of `roles`,
+    and the token for the next page, or None on the last page.
+    """
+    filt = {USER_ROLE: {'$in': roles}} if roles else None
+    users, next_token = dbc.read_page(USER_COLLECT, EMAIL, limit,
+                                      after=after, filt=filt,
+                                      projection={PASSWORD: 0})
+    return {user[EMAIL]: user for user in users}, next_token
+
+
+def iter_users():
+    """
+    Yield users one at a time, for streaming responses.
+    Password hashes are never returned.
+    """
+    return dbc.iter_docs(USER_COLLECT, projection={PASSWORD: 0})
@@ -0,0 +1,106 @@
+"""
+An in-process read-through cache for query results.
+Entries are bounded in number (least recently used go first),
+expire after a per-collection TTL, and are dropped all at once
+for a collection whenever that collection is written to.
+"""
+from collections import OrderedDict
+from copy import deepcopy
+import json
+import threading
+import time
+
+DEFAULT_MAX_SIZE = 1000
+DEFAULT_TTL = 30  # seconds
+
+# stats keys:
+HITS = 'hits'
+MISSES = 'misses'
+EVICTIONS = 'evictions'
+EXPIRATIONS = 'expirations'
+INVALIDATIONS = 'invalidations'
+
+
+class QueryCache:
+    """
+    Invalidation bumps a per-collection generation number that is part
+    of every key, so it is O(1): entries from older generations can
+    never be hit again and simply age out of the LRU.
+    Values are deep-copied in and out so callers can mutate what
+    they get back.
+    """
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.ttls = {}
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.stats = {HITS: 0, MISSES: 0, EVICTIONS: 0,
+                      EXPIRATIONS: 0, INVALIDATIONS: 0}
+
+    def enable(self, collection: str, ttl: float = DEFAULT_TTL):
+        if ttl <= 0:
+            raise ValueError(f'Cache TTL must be positive: {ttl}')
+        self.ttls[collection] = ttl
+
+    def disable(self, collection: str):
+        self.ttls.pop(collection, None)
+
+    def is_enabled(self, collection: str) -> bool:
+        return collection in self.ttls
+
+    def make_key(self, db: str, collection: str, op: str, args) -> tuple:
+        """
+        Build the key for one query: the args (filter, projection, etc.)
+        are serialized with sorted keys so equal queries share a key.
+        """
+        gen = self.generations.get((db, collection), 0)
+        return (db, collection, gen, op,
+                json.dumps(args, sort_keys=True, default=str))
+
+    def get(self, key: tuple) -> tuple:
+        """
+        Return (True, value) on a hit, (False, None) on a miss.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats[MISSES] += 1
+                return False, None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                self.stats[EXPIRATIONS] += 1
+                self.stats[MISSES] += 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.stats[HITS] += 1
+        return True, deepcopy(value)
+
+    def put(self, key: tuple, value):
+        collection = key[1]
+        ttl = self.ttls.get(collection)
+        if ttl is None:
+            return
+        value = deepcopy(value)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.stats[EVICTIONS] += 1
+
+    def invalidate(self, db: str, collection: str):
+        with self.lock:
+            gen_key = (db, collection)
+            self.generations[gen_key] = self.generations.get(gen_key, 0) + 1
+            self.stats[INVALIDATIONS] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {**self.stats, 'size': len(self.entries),
+                    'max_size': self.max_size}
@@ -0,0 +1,197 @@
+"""
+In-memory prefix indexes for autocomplete.
+Each index is a sorted array of (normalized key, id) pairs, so a lookup
+is a binary search plus a short scan: no database round trip.
+Keys are the whole normalized string and each word in it, so
+"smi" finds "Jane Smith" as well as "Smith, J.".
+The data module owning a collection keeps its index current from its
+write paths; writes by other workers (which we only hear about
+through data.cache_sync) trigger a rebuild in the background.
+"""
+from bisect import bisect_left, insort
+import threading
+import unicodedata
+
+import data.db_connect as dbc
+import data.logger as lg
+
+log = lg.get_logger(__name__)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# seconds to wait after a write before rebuilding, so a burst of
+# writes costs one rebuild:
+REBUILD_DELAY = 10.0
+
+
+def normalize(text) -> str:
+    """
+    Case-fold, drop accents and collapse whitespace.
+    """
+    text = unicodedata.normalize('NFKD', str(text)).casefold()
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.split())
+
+
+def make_keys(*texts) -> set:
+    keys = set()
+    for text in texts:
+        if not text:
+            continue
+        key = normalize(text)
+        if key:
+            keys.add(key)
+            keys.update(key.split())
+    return keys
+
+
+class PrefixIndex:
+    """
+    Not thread-safe on its own: Suggester serializes writes.
+    """
+    def __init__(self):
+        self.entries = []
+        self.keys_by_id = {}
+        self.records = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add(self, item_id: str, keys: set, record: dict):
+        self.remove(item_id)
+        for key in keys:
+            insort(self.entries, (key, item_id))
+        self.keys_by_id[item_id] = keys
+        self.records[item_id] = record
+
+    def add_all(self, items):
+        """
+        Load many (id, keys, record) items into an empty index,
+        sorting once rather than inserting one key at a time.
+        """
+        for item_id, keys, record in items:
+            self.entries.extend((key, item_id) for key in keys)
+            self.keys_by_id[item_id] = keys
+            self.records[item_id] = record
+        self.entries.sort()
+
+    def remove(self, item_id: str):
+        for key in self.keys_by_id.pop(item_id, ()):
+            pos = bisect_left(self.entries, (key, item_id))
+            if pos < len(self.entries) and \
+                    self.entries[pos] == (key, item_id):
+                del self.entries[pos]
+        self.records.pop(item_id, None)
+
+    def lookup(self, prefix: str, limit: int) -> list:
+        """
+        Return the records of up to `limit` items with a key starting
+        with `prefix` (normalized), in key order.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found = []
+        seen = set()
+        pos = bisect_left(self.entries, (prefix,))
+        while pos < len(self.entries) and len(found) < limit:
+            key, item_id = self.entries[pos]
+            if not key.startswith(prefix):
+                break
+            if item_id not in seen:
+                seen.add(item_id)
+                record = self.records.get(item_id)
+                if record is not None:
+                    found.append(record)
+            pos += 1
+        return found
+
+
+class Suggester:
+    """
+    A PrefixIndex over one collection.
+    `load()` yields the docs to index and `make_entry(doc)` returns
+    (id, keys, record) for one of them.
+    The index is built on first use.
+    """
+    def __init__(self, collection: str, load, make_entry,
+                 rebuild_delay: float = REBUILD_DELAY):
+        self.collection = collection
+        self.load = load
+        self.make_entry = make_entry
+        self.rebuild_delay = rebuild_delay
+        self.index = None
+        self.lock = threading.RLock()
+        # bumped on every invalidation, so a rebuild that raced
+        # a write is followed by another:
+        self.generation = 0
+        self.timer = None
+        # our own writes come through put() and delete():
+        dbc.on_invalidate(self.note_invalidated, local=False)
+
+    def build(self) -> PrefixIndex:
+        index = PrefixIndex()
+        index.add_all(map(self.make_entry, self.load()))
+        return index
+
+    def get_index(self) -> PrefixIndex:
+        index = self.index
+        if index is None:
+            with self.lock:
+                if self.index is None:
+                    self.index = self.build()
+                index = self.index
+        return index
+
+    def put(self, doc: dict):
+        """
+        Add or replace one doc (called by the write paths).
+        """
+        if self.index is None:
+            return
+        with self.lock:
+            self.index.add(*self.make_entry(doc))
+
+    def delete(self, item_id: str):
+        if self.index is None:
+            return
+        with self.lock:
+            self.index.remove(item_id)
+
+    def suggest(self, prefix: str, limit: int = DEFAULT_LIMIT) -> list:
+        if limit < 1:
+            raise ValueError(f'Bad limit: {limit}')
+        return self.get_index().lookup(prefix, min(limit, MAX_LIMIT))
+
+    def note_invalidated(self, db, collection):
+        if collection != self.collection or self.index is None:
+            return
+        with self.lock:
+            self.generation += 1
+            if self.timer is None:
+                self.timer = threading.Timer(self.rebuild_delay,
+                                             self.rebuild)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def rebuild(self):
+        """
+        Rebuild from the database, to pick up other workers' writes.
+        Serves the old index meanwhile.
+        """
+        with self.lock:
+            generation = self.generation
+        try:
+            index = self.build()
+        except dbc.DB_ERRORS as err:
+            log.warning('suggest.rebuild.failed',
+                        collection=self.collection, error=str(err))
+            index = None
+        with self.lock:
+            self.timer = None
+            if generation != self.generation:
+                # written to while we were reading; go again later
+                self.generation -= 1
+                self.note_invalidated(dbc.SE_DB, self.collection)
+            elif index is not None:
+                self.index = index
@@ -0,0 +1,185 @@
+import time
+
+import pymongo as pm
+import pytest
+
+import data.backends as bk
+import data.cache_sync as cs
+import data.db_connect as dbc
+
+TEST_COLLECT = 'people'
+
+
+@pytest.fixture
+def invalidated():
+    seen = []
+
+    def listener(db, collection):
+        seen.append(collection)
+
+    dbc.on_invalidate(listener)
+    yield seen
+    dbc.invalidation_listeners.remove(listener)
+
+
+@pytest.fixture
+def remote():
+    seen = []
+
+    def listener(db, collection):
+        seen.append(collection)
+
+    dbc.on_invalidate(listener, local=False)
+    yield seen
+    dbc.remote_listeners.remove(listener)
+
+
+@pytest.fixture
+def bumping():
+    old_bump = dbc.bump_versions
+    dbc.bump_versions = True
+    yield
+    dbc.bump_versions = old_bump
+
+
+def test_note_write_bumps_version(bumping):
+    before = dbc.read_versions().get(TEST_COLLECT, 0)
+    dbc.note_write(TEST_COLLECT)
+    assert dbc.read_versions()[TEST_COLLECT] == before + 1
+
+
+@pytest.mark.skipif(bk.get_backend_name() != bk.MONGO,
+                    reason='writes through the Mongo client')
+def test_poll_once_sees_other_workers_writes(bumping, invalidated):
+    watcher = cs.CacheWatcher([TEST_COLLECT])
+    watcher.versions = dbc.read_other_versions()
+    watcher.poll_once()
+    assert invalidated == []
+    # what another worker's write looks like from here:
+    dbc.get_client()[dbc.SE_DB][dbc.VERSIONS_COLLECT].update_one(
+        {dbc.MONGO_ID: TEST_COLLECT}, {'$inc': {dbc.VERSION: 1}},
+        upsert=True)
+    watcher.poll_once()
+    assert invalidated == [TEST_COLLECT]
+
+
+def test_poll_once_skips_own_writes(bumping, remote):
+    watcher = cs.CacheWatcher([TEST_COLLECT])
+    watcher.versions = dbc.read_other_versions()
+    dbc.note_write(TEST_COLLECT)
+    watcher.poll_once()
+    assert remote == []
+
+
+class FakeStream:
+    """
+    Yields `changes`, then raises `error` (if any) or stops the watcher.
+    """
+    def __init__(self, watcher, changes, error=None):
+        self.watcher = watcher
+        self.changes = list(changes)
+        self.error = error
+        self.resume_token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def try_next(self):
+        if not self.changes:
+            if self.error:
+                raise self.error
+            self.watcher.stop()
+            return None
+        change = self.changes.pop(0)
+        self.resume_token = change.get('_id')
+        return change
+
+
+class FakeBackend:
+    """
+    Opens each of `streams` (or raises it, if an exception) in turn,
+    recording the arguments.
+    """
+    def __init__(self, streams):
+        self.streams = list(streams)
+        self.opened = []
+
+    def watch(self, db, pipeline, **kwargs):
+        self.opened.append(kwargs)
+        stream = self.streams.pop(0)
+        if isinstance(stream, Exception):
+            raise stream
+        return stream
+
+
+def change(token):
+    return {'_id': token, 'ns': {'db': dbc.SE_DB, 'coll': TEST_COLLECT}}
+
+
+def run_watcher(monkeypatch, make_streams) -> FakeBackend:
+    watcher = cs.CacheWatcher([TEST_COLLECT])
+    backend = FakeBackend(make_streams(watcher))
+    monkeypatch.setattr(dbc, 'get_backend', lambda: backend)
+    monkeypatch.setattr(cs, 'RETRY_INTERVAL', 0)
+    watcher.run()
+    return backend
+
+
+def test_broken_stream_resumes(monkeypatch, invalidated):
+    backend = run_watcher(monkeypatch, lambda watcher: [
+        FakeStream(watcher, [change('t1')],
+                   error=pm.errors.NetworkTimeout('down')),
+        FakeStream(watcher, [change('t2')]),
+    ])
+    assert 'resume_after' not in backend.opened[0]
+    assert backend.opened[1]['resume_after'] == 't1'
+    # nothing missed, so nothing dropped wholesale:
+    assert invalidated == [TEST_COLLECT, TEST_COLLECT]
+
+
+def test_lost_place_invalidates_after_reopening(monkeypatch, invalidated):
+    backend = run_watcher(monkeypatch, lambda watcher: [
+        FakeStream(watcher, [change('t1')],
+                   error=pm.errors.NetworkTimeout('down')),
+        pm.errors.OperationFailure('resume point lost'),
+        FakeStream(watcher, []),
+    ])
+    assert backend.opened[1]['resume_after'] == 't1'
+    assert 'resume_after' not in backend.opened[2]
+    # one for the change, one for everything once we were back:
+    assert invalidated == [TEST_COLLECT, TEST_COLLECT]
+
+
+def test_watch_invalidates_changed_collections(invalidated):
+    watcher = cs.CacheWatcher([TEST_COLLECT])
+    stream = FakeStream(watcher, [
+        {'ns': {'db': dbc.SE_DB, 'coll': TEST_COLLECT}},
+        {'ns': {'db': dbc.SE_DB, 'coll': 'not watched'}},
+    ])
+    watcher.watch(stream)
+    assert invalidated == [TEST_COLLECT]
+
+
+def test_watch_tells_own_writes_apart(monkeypatch, invalidated, remote):
+    monkeypatch.setattr(dbc, 'own_writes', {})
+    dbc.note_own_write(TEST_COLLECT)
+    watcher = cs.CacheWatcher([TEST_COLLECT])
+    watcher.watch(FakeStream(watcher, [change('t1'), change('t2')]))
+    # the first is taken for the echo of our write:
+    assert invalidated == [TEST_COLLECT, TEST_COLLECT]
+    assert remote == [TEST_COLLECT]
+
+
+def test_ensure_started():
+    cs.stop()
+    watcher = cs.ensure_started()
+    assert cs.ensure_started() is watcher
+    for _ in range(50):
+        if watcher.mode:
+            break
+        time.sleep(0.1)
+    assert watcher.mode in [cs.CHANGE_STREAM, cs.POLLING]
+    cs.stop()
@@ -0,0 +1,59 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+import data.db_config as dbcfg
+
+
+def test_defaults():
+    with patch.dict(os.environ, {}, clear=True):
+        assert dbcfg.get_client_options() == dbcfg.DEFAULTS
+
+
+def test_env_overrides():
+    with patch.dict(os.environ, {'MONGO_MAX_POOL_SIZE': '64',
+                                 'MONGO_COMPRESSORS': 'zstd,zlib'}):
+        options = dbcfg.get_client_options()
+    assert options[dbcfg.MAX_POOL_SIZE] == 64
+    assert options[dbcfg.COMPRESSORS] == 'zstd,zlib'
+
+
+def test_env_not_int():
+    with patch.dict(os.environ, {'MONGO_SOCKET_TIMEOUT_MS': 'soon'}):
+        with pytest.raises(ValueError):
+            dbcfg.get_client_options()
+
+
+def test_bad_compressor():
+    with patch.dict(os.environ, {'MONGO_COMPRESSORS': 'gzip'}):
+        with pytest.raises(ValueError):
+            dbcfg.get_client_options()
+
+
+def test_min_over_max():
+    with patch.dict(os.environ, {'MONGO_MIN_POOL_SIZE': '10',
+                                 'MONGO_MAX_POOL_SIZE': '5'}):
+        with pytest.raises(ValueError):
+            dbcfg.get_client_options()
+
+
+def test_config_file(tmp_path):
+    config_file = tmp_path / 'mongo.json'
+    config_file.write_text(json.dumps({dbcfg.MAX_POOL_SIZE: 8,
+                                       dbcfg.MIN_POOL_SIZE: 1}))
+    with patch.dict(os.environ, {dbcfg.CONFIG_FILE_VAR: str(config_file),
+                                 'MONGO_MIN_POOL_SIZE': '4'}):
+        options = dbcfg.get_client_options()
+    assert options[dbcfg.MAX_POOL_SIZE] == 8
+    # the env wins over the file:
+    assert options[dbcfg.MIN_POOL_SIZE] == 4
+
+
+def test_config_file_unknown_key(tmp_path):
+    config_file = tmp_path / 'mongo.json'
+    config_file.write_text(json.dumps({'maxPoolSise': 8}))
+    with patch.dict(os.environ, {dbcfg.CONFIG_FILE_VAR: str(config_file)}):
+        with pytest.raises(ValueError):
+            dbcfg.get_client_options()
@@ -0,0 +1,162 @@
+import os
+from unittest.mock import patch
+
+from bson import ObjectId
+import pytest
+
+import data.backends as bk
+import data.db_connect as dbc
+import data.people as ppl
+import data.manuscripts.manuscript as mt
+
+
+def test_declare_index_no_duplicates():
+    num_indexes = len(dbc.INDEXES)
+    dbc.declare_index(ppl.PEOPLE_COLLECT, ppl.EMAIL, unique=True)
+    assert len(dbc.INDEXES) == num_indexes
+
+
+def test_ensure_indexes_idempotent():
+    dbc.ensure_indexes()
+    assert dbc.ensure_indexes() == {}
+
+
+@pytest.mark.skipif(bk.get_backend_name() != bk.MONGO,
+                    reason='reads Mongo index metadata')
+@pytest.mark.parametrize('collection, field', [
+    (ppl.PEOPLE_COLLECT, ppl.EMAIL),
+    (ppl.USER_COLLECT, ppl.EMAIL),
+    (mt.MANUSCRIPTS_COLLECT, mt.TITLE),
+])
+def test_unique_indexes(collection, field):
+    dbc.ensure_indexes()
+    info = dbc.get_client()[dbc.SE_DB][collection].index_information()
+    unique_keys = [idx['key'] for idx in info.values() if idx.get('unique')]
+    assert [(field, 1)] in unique_keys
+
+
+def test_create_duplicate_raises_value_error():
+    dup_email = 'dup_key@nyu.edu'
+    dbc.delete(ppl.PEOPLE_COLLECT, {ppl.EMAIL: dup_email})
+    dbc.create(ppl.PEOPLE_COLLECT, {ppl.EMAIL: dup_email})
+    with pytest.raises(ValueError):
+        dbc.create(ppl.PEOPLE_COLLECT, {ppl.EMAIL: dup_email})
+    dbc.delete(ppl.PEOPLE_COLLECT, {ppl.EMAIL: dup_email})
+
+
+UPD_EMAIL = 'update_and_return@nyu.edu'
+
+
+def test_update_and_return():
+    dbc.delete(ppl.PEOPLE_COLLECT, {ppl.EMAIL: UPD_EMAIL})
+    dbc.create(ppl.PEOPLE_COLLECT, {ppl.EMAIL: UPD_EMAIL, ppl.NAME: 'Old'})
+    before = dbc.update_and_return(ppl.PEOPLE_COLLECT, {ppl.EMAIL: UPD_EMAIL},
+                                   {ppl.NAME: 'Mid'}, return_new=False)
+    assert before[ppl.NAME] == 'Old'
+    after = dbc.update_and_return(ppl.PEOPLE_COLLECT, {ppl.EMAIL: UPD_EMAIL},
+                                  {ppl.NAME: 'New'})
+    assert after[ppl.NAME] == 'New'
+    assert isinstance(after[dbc.MONGO_ID], str)
+    dbc.delete(ppl.PEOPLE_COLLECT, {ppl.EMAIL: UPD_EMAIL})
+
+
+def test_update_and_return_not_there():
+    assert dbc.update_and_return(ppl.PEOPLE_COLLECT,
+                                 {ppl.EMAIL: 'not_there@nyu.edu'},
+                                 {ppl.NAME: 'Nobody'}) is None
+
+
+def test_get_pool_stats():
+    stats = dbc.get_pool_stats()
+    for stat in ['created', 'closed', 'checked_out', 'checked_in',
+                 'open', 'in_use']:
+        assert isinstance(stats[stat], int)
+
+
+def test_get_client_reused():
+    assert dbc.get_client() is dbc.get_client()
+
+
+def test_get_client_new_process():
+    parent_client = dbc.get_client()
+    with patch('os.getpid', return_value=os.getpid() + 1):
+        child_client = dbc.get_client()
+    assert child_client is not parent_client
+    dbc.reset_client()
+
+
+def test_reset_client():
+    dbc.get_client()
+    dbc.reset_client()
+    assert dbc.client is None
+    assert dbc.get_client() is not None
+
+
+CACHE_EMAIL = 'cached_person@nyu.edu'
+
+
+def test_cached_read_one_invalidated_by_write():
+    dbc.delete(ppl.PEOPLE_COLLECT, {ppl.EMAIL: CACHE_EMAIL})
+    dbc.create(ppl.PEOPLE_COLLECT, {ppl.EMAIL: CACHE_EMAIL, ppl.NAME: 'Old'})
+    filt = {ppl.EMAIL: CACHE_EMAIL}
+    dbc.read_one(ppl.PEOPLE_COLLECT, filt)
+    hits = dbc.get_cache_stats()['hits']
+    assert dbc.read_one(ppl.PEOPLE_COLLECT, filt)[ppl.NAME] == 'Old'
+    assert dbc.get_cache_stats()['hits'] == hits + 1
+    dbc.update_doc(ppl.PEOPLE_COLLECT, filt, {ppl.NAME: 'New'})
+    assert dbc.read_one(ppl.PEOPLE_COLLECT, filt)[ppl.NAME] == 'New'
+    dbc.delete(ppl.PEOPLE_COLLECT, filt)
+    assert dbc.read_one(ppl.PEOPLE_COLLECT, filt) is None
+
+
+def test_bulk_delete():
+    emails = ['bulk_del_a@nyu.edu', 'bulk_del_b@nyu.edu']
+    dbc.bulk_create(ppl.PEOPLE_COLLECT,
+                    [{ppl.EMAIL: email} for email in emails])
+    result = dbc.bulk_delete(ppl.PEOPLE_COLLECT,
+                             [{ppl.EMAIL: email} for email in emails])
+    assert result['deleted'] == 2
+    assert result['errors'] == {}
+
+
+def test_bulk_row_results():
+    result = {'errors': {1: 'dup'}, 'attempted': 2}
+    rows = dbc.bulk_row_results(4, {0: 'bad'}, [1, 2, 3], result)
+    assert [row[dbc.BULK_STATUS] for row in rows] == [
+        dbc.BULK_FAILED, dbc.BULK_CREATED, dbc.BULK_FAILED,
+        dbc.BULK_SKIPPED]
+
+
+class RecordingBackend:
+    def __init__(self):
+        self.finds = []
+
+    def find(self, db, collection, filt=None, projection=None, sort=None,
+             limit=None, batch_size=None):
+        self.finds.append((filt, sort))
+        return []
+
+
+def test_is_unique_key():
+    assert dbc.is_unique_key(ppl.PEOPLE_COLLECT, ppl.EMAIL)
+    assert dbc.is_unique_key(ppl.PEOPLE_COLLECT, dbc.MONGO_ID)
+    assert not dbc.is_unique_key(ppl.PEOPLE_COLLECT, ppl.ROLES)
+
+
+def test_read_page_unique_key_ranges_on_key_alone(monkeypatch):
+    backend = RecordingBackend()
+    monkeypatch.setattr(dbc, 'get_backend', lambda: backend)
+    token = dbc.encode_page_token('b@nyu.edu', ObjectId())
+    dbc.read_page(ppl.PEOPLE_COLLECT, ppl.EMAIL, 10, after=token)
+    assert backend.finds == [({ppl.EMAIL: {'$gt': 'b@nyu.edu'}},
+                              [(ppl.EMAIL, 1)])]
+
+
+def test_read_page_other_key_breaks_ties_on_id(monkeypatch):
+    backend = RecordingBackend()
+    monkeypatch.setattr(dbc, 'get_backend', lambda: backend)
+    token = dbc.encode_page_token('x', ObjectId())
+    dbc.read_page(ppl.PEOPLE_COLLECT, ppl.NAME, 10, after=token)
+    filt, sort = backend.finds[0]
+    assert '$or' in filt
+    assert sort == [(ppl.NAME, 1), (dbc.MONGO_ID, 1)]
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+import data.backends as bk
+import data.db_connect_async as dba
+import data.people as ppl
+
+# Motor only talks to MongoDB:
+pytestmark = pytest.mark.skipif(bk.get_backend_name() != bk.MONGO,
+                                reason='the async layer is Mongo only')
+
+ASYNC_EMAIL = 'async_person@nyu.edu'
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def crud_round_trip():
+    filt = {ppl.EMAIL: ASYNC_EMAIL}
+    await dba.delete(ppl.PEOPLE_COLLECT, filt)
+    await dba.create(ppl.PEOPLE_COLLECT, {ppl.EMAIL: ASYNC_EMAIL,
+                                          ppl.NAME: 'Async'})
+    created = await dba.read_one(ppl.PEOPLE_COLLECT, filt)
+    await dba.update_doc(ppl.PEOPLE_COLLECT, filt, {ppl.NAME: 'Awaited'})
+    people = await dba.read_dict(ppl.PEOPLE_COLLECT, ppl.EMAIL)
+    num_deleted = await dba.delete(ppl.PEOPLE_COLLECT, filt)
+    gone = await dba.read_one(ppl.PEOPLE_COLLECT, filt)
+    return created, people, num_deleted, gone
+
+
+def test_crud_round_trip():
+    created, people, num_deleted, gone = run(crud_round_trip())
+    assert created[ppl.NAME] == 'Async'
+    assert isinstance(created[dba.MONGO_ID], str)
+    assert people[ASYNC_EMAIL][ppl.NAME] == 'Awaited'
+    assert num_deleted == 1
+    assert gone is None
+
+
+async def create_twice():
+    await dba.delete(ppl.PEOPLE_COLLECT, {ppl.EMAIL: ASYNC_EMAIL})
+    await dba.create(ppl.PEOPLE_COLLECT, {ppl.EMAIL: ASYNC_EMAIL})
+    try:
+        await dba.create(ppl.PEOPLE_COLLECT, {ppl.EMAIL: ASYNC_EMAIL})
+    finally:
+        await dba.delete(ppl.PEOPLE_COLLECT, {ppl.EMAIL: ASYNC_EMAIL})
+
+
+def test_create_duplicate():
+    with pytest.raises(ValueError):
+        run(create_twice())
+
+
+async def read_fields():
+    await dba.delete(ppl.PEOPLE_COLLECT, {ppl.EMAIL: ASYNC_EMAIL})
+    await dba.create(ppl.PEOPLE_COLLECT, {ppl.EMAIL: ASYNC_EMAIL,
+                                          ppl.NAME: 'Async',
+                                          ppl.AFFILIATION: 'NYU'})
+    people = await dba.read_dict(ppl.PEOPLE_COLLECT, ppl.EMAIL,
+                                 projection=[ppl.NAME])
+    await dba.delete(ppl.PEOPLE_COLLECT, {ppl.EMAIL: ASYNC_EMAIL})
+    return people[ASYNC_EMAIL]
+
+
+def test_read_dict_fields():
+    person = run(read_fields())
+    assert person[ppl.NAME] == 'Async'
+    assert ppl.AFFILIATION not in person
+
+
+async def get_client():
+    return dba.get_client()
+
+
+def test_new_loop_closes_old_client(monkeypatch):
+    old = run(get_client())
+    closed = []
+    monkeypatch.setattr(old, 'close', lambda: closed.append(old))
+    new = run(get_client())
+    assert new is not old
+    assert closed == [old]
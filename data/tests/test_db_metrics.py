@@ -0,0 +1,120 @@
+from unittest.mock import patch
+
+import pytest
+
+import data.backends.sqlite as sql
+import data.db_metrics as dbm
+
+TEST_DB = 'testDB'
+TEST_COLLECT = 'things'
+
+
+@pytest.fixture
+def backend():
+    dbm.reset()
+    backend = dbm.InstrumentedBackend(sql.SQLiteBackend())
+    backend.insert_one(TEST_DB, TEST_COLLECT, {'email': 'a@nyu.edu'})
+    backend.insert_one(TEST_DB, TEST_COLLECT, {'email': 'b@nyu.edu'})
+    yield backend
+    dbm.reset()
+
+
+def get_stats(op):
+    for row in dbm.get_metrics():
+        if row['collection'] == TEST_COLLECT and row['op'] == op:
+            return row
+    return None
+
+
+def test_filter_shape():
+    filt = {'email': 'a@nyu.edu', 'roles': {'$in': ['ED']},
+            '$or': [{'a': 1}, {'b': {'$gt': 2}}]}
+    assert dbm.filter_shape(filt) == {
+        'email': '?', 'roles': {'$in': '?'},
+        '$or': [{'a': '?'}, {'b': {'$gt': '?'}}]}
+
+
+def test_bucket_label():
+    assert dbm.bucket_label(0.5) == '<=1'
+    assert dbm.bucket_label(30) == '<=50'
+    assert dbm.bucket_label(10_000) == dbm.OVERFLOW
+
+
+def test_records_calls(backend):
+    assert get_stats('insert_one')[dbm.COUNT] == 2
+    docs = list(backend.find(TEST_DB, TEST_COLLECT, {}))
+    assert len(docs) == 2
+    stats = get_stats('find')
+    assert stats[dbm.COUNT] == 1
+    assert stats[dbm.DOCS] == 2
+    assert stats[dbm.BYTES] > 0
+    assert sum(stats[dbm.HISTOGRAM].values()) == 1
+
+
+def test_bytes_sampled():
+    docs = [{'email': f'{num}@nyu.edu'} for num in range(10)]
+    with patch.object(dbm, 'bytes_sample', 4), \
+            patch.object(dbm, 'doc_size', return_value=30) as doc_size:
+        call = dbm.Call(None, TEST_DB, TEST_COLLECT, 'find')
+        for doc in docs:
+            call.add_doc(doc)
+    assert doc_size.call_count == 3
+    assert call.docs == 10
+    assert call.nbytes == 300
+
+
+def test_bytes_sampling_off():
+    with patch.object(dbm, 'bytes_sample', 0), \
+            patch.object(dbm, 'doc_size') as doc_size:
+        call = dbm.Call(None, TEST_DB, TEST_COLLECT, 'find')
+        call.add_doc({'email': 'a@nyu.edu'})
+    doc_size.assert_not_called()
+    assert call.docs == 1
+    assert call.nbytes == 0
+
+
+def test_find_one_counts_docs(backend):
+    backend.find_one(TEST_DB, TEST_COLLECT, {'email': 'nobody@nyu.edu'})
+    assert get_stats('find_one')[dbm.DOCS] == 0
+
+
+def test_query_listener(backend):
+    seen = []
+
+    def listener(collection, op, seconds):
+        seen.append(op)
+
+    dbm.on_query(listener)
+    try:
+        backend.delete_one(TEST_DB, TEST_COLLECT, {'email': 'a@nyu.edu'})
+    finally:
+        dbm.query_listeners.remove(listener)
+    assert seen == ['delete_one']
+
+
+def test_slow_query_log(backend):
+    with patch.object(dbm, 'slow_query_ms', 0), \
+            patch.object(dbm, 'explain_slow', True):
+        backend.find_one(TEST_DB, TEST_COLLECT, {'email': 'a@nyu.edu'})
+    entry = dbm.get_slow_queries()[-1]
+    assert entry['op'] == 'find_one'
+    assert entry['filter'] == {'email': '?'}
+    assert entry['explain']
+
+
+def test_no_slow_queries_under_threshold(backend):
+    with patch.object(dbm, 'slow_query_ms', 10_000):
+        backend.find_one(TEST_DB, TEST_COLLECT, {'email': 'a@nyu.edu'})
+    assert dbm.get_slow_queries() == []
+
+
+def test_query_counter(backend):
+    counter = dbm.start_counting()
+    try:
+        backend.find_one(TEST_DB, TEST_COLLECT, {'email': 'a@nyu.edu'})
+        list(backend.find(TEST_DB, TEST_COLLECT, {}))
+    finally:
+        dbm.stop_counting()
+    assert counter.queries == 2
+    assert counter.ops == [f'find_one {TEST_COLLECT}', f'find {TEST_COLLECT}']
+    assert dbm.get_counter() is None
@@ -0,0 +1,78 @@
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+
+import data.logger as lg
+
+TEST_LOGGER = 'data.test_logger'
+
+
+@pytest.fixture
+def stream():
+    stream = io.StringIO()
+    lg.configure(level='DEBUG', fmt=lg.JSON, stream=stream)
+    yield stream
+    lg.configure()
+
+
+def lines(stream) -> list:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_json_output(stream):
+    lg.get_logger(TEST_LOGGER).info('thing.done', count=3)
+    line = lines(stream)[0]
+    assert line['event'] == 'thing.done'
+    assert line['level'] == 'INFO'
+    assert line['logger'] == TEST_LOGGER
+    assert line['count'] == 3
+
+
+def test_level_filters_and_skips_callables(stream):
+    lg.configure(level='WARNING', stream=stream)
+    expensive = []
+    lg.get_logger(TEST_LOGGER).debug('thing.debug',
+                                     val=lambda: expensive.append(1))
+    assert stream.getvalue() == ''
+    assert expensive == []
+
+
+def test_callable_fields_evaluated(stream):
+    lg.get_logger(TEST_LOGGER).debug('thing.lazy', val=lambda: 42)
+    assert lines(stream)[0]['val'] == 42
+
+
+def test_sampling(stream):
+    log = lg.get_logger(TEST_LOGGER)
+    with patch('random.random', return_value=0.5):
+        log.info('thing.sampled', sample=0.1)
+        log.info('thing.sampled', sample=0.9)
+    logged = lines(stream)
+    assert len(logged) == 1
+    assert logged[0]['sample_rate'] == 0.9
+
+
+def test_exception(stream):
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        lg.get_logger(TEST_LOGGER).exception('thing.failed')
+    assert 'boom' in lines(stream)[0]['exc']
+
+
+def test_text_format(stream):
+    lg.configure(level='INFO', fmt=lg.TEXT, stream=stream)
+    lg.get_logger(TEST_LOGGER).info('thing.text', count=3)
+    assert 'thing.text count=3' in stream.getvalue()
+
+
+def test_bad_format():
+    with pytest.raises(ValueError):
+        lg.configure(fmt='xml')
+
+
+def test_quiet_in_production():
+    with patch.dict('os.environ', {'CLOUD_MONGO': '1'}):
+        assert lg.default_level() == lg.PROD_LEVEL
@@ -6,6 +6,7 @@ from data.people import get_masthead, create_person, delete_person, NAME, ROLES,
 from data.roles import TEST_CODE
 from unittest.mock import patch
 import data.db_connect as dbc
+import data.roles as rls
 
 TEMP_EMAIL = 'temp_person2@temp.org'
 
@@ -314,3 +315,152 @@ def test_create_person_multiple_roles():
     assert VALID_ROLES[0] not in updated_person[ROLES]
     assert VALID_ROLES[1] in updated_person[ROLES]
     ppl.delete_person(email)
+
+
+MH_EMAIL = 'masthead_person@nyu.edu'
+
+
+@pytest.fixture(scope='function')
+def masthead_person():
+    email = ppl.create_person('Mast Head', 'NYU', MH_EMAIL,
+                              roles=[rls.ED_CODE, rls.AUTHOR_CODE])
+    yield email
+    ppl.delete_person(email)
+
+
+def test_get_masthead_has_role(masthead_person):
+    mh = ppl.get_masthead()
+    editors = mh[rls.ROLES[rls.ED_CODE]]
+    assert masthead_person in editors
+    assert rls.ROLES[rls.AUTHOR_CODE] not in mh
+
+
+def test_read_masthead_people(masthead_person, temp_person):
+    emails = [person[EMAIL] for person in ppl.read_masthead_people()]
+    assert masthead_person in emails
+    assert temp_person not in emails
+
+
+def test_read_fields(temp_person):
+    people = ppl.read([ppl.NAME])
+    assert temp_person in people
+    person = people[temp_person]
+    assert ppl.NAME in person
+    assert ppl.AFFILIATION not in person
+
+
+def test_iter_people(temp_person):
+    emails = [person[EMAIL] for person in ppl.iter_people([EMAIL])]
+    assert temp_person in emails
+
+
+ITER_USER_EMAIL = 'iter_user@nyu.edu'
+
+
+def test_iter_users_hides_password():
+    dbc.delete(ppl.USER_COLLECT, {EMAIL: ITER_USER_EMAIL})
+    ppl.register_user(ITER_USER_EMAIL, 'secret')
+    users = list(ppl.iter_users())
+    dbc.delete(ppl.USER_COLLECT, {EMAIL: ITER_USER_EMAIL})
+    assert ITER_USER_EMAIL in [user[EMAIL] for user in users]
+    for user in users:
+        assert ppl.PASSWORD not in user
+
+
+PAGE_EMAILS = ['page_a@nyu.edu', 'page_b@nyu.edu', 'page_c@nyu.edu']
+
+
+@pytest.fixture(scope='function')
+def paged_people():
+    for email in PAGE_EMAILS:
+        if ppl.exists(email):
+            ppl.delete_person(email)
+        ppl.create_person('Page Person', 'NYU', email, TEST_ROLE_CODE)
+    yield PAGE_EMAILS
+    for email in PAGE_EMAILS:
+        ppl.delete_person(email)
+
+
+def test_read_page(paged_people):
+    seen = []
+    after = None
+    while True:
+        people, after = ppl.read_page(2, after)
+        assert len(people) <= 2
+        seen.extend(people)
+        if after is None:
+            break
+    assert seen == sorted(seen)
+    assert len(seen) == len(set(seen))
+    assert set(seen) == set(ppl.read())
+    for email in paged_people:
+        assert email in seen
+
+
+def test_read_page_bad_token():
+    with pytest.raises(ValueError):
+        ppl.read_page(2, 'not a real token')
+
+
+def test_read_page_bad_limit():
+    with pytest.raises(ValueError):
+        ppl.read_page(0)
+
+
+def test_register_duplicate_user():
+    dbc.delete(ppl.USER_COLLECT, {EMAIL: ITER_USER_EMAIL})
+    ppl.register_user(ITER_USER_EMAIL, 'secret')
+    with pytest.raises(ValueError, match='User already exists'):
+        ppl.register_user(ITER_USER_EMAIL, 'other secret')
+    dbc.delete(ppl.USER_COLLECT, {EMAIL: ITER_USER_EMAIL})
+
+
+BULK_EMAILS = ['bulk_a@nyu.edu', 'bulk_b@nyu.edu']
+
+
+@pytest.fixture
+def no_bulk_people():
+    dbc.bulk_delete(PEOPLE_COLLECT, [{EMAIL: email} for email in BULK_EMAILS])
+    yield BULK_EMAILS
+    dbc.bulk_delete(PEOPLE_COLLECT, [{EMAIL: email} for email in BULK_EMAILS])
+
+
+def bulk_row(email, name='Bulk Person'):
+    return {NAME: name, AFFILIATION: 'NYU', EMAIL: email,
+            ROLES: [TEST_ROLE_CODE]}
+
+
+def test_bulk_create_people(no_bulk_people):
+    rows = [bulk_row(BULK_EMAILS[0]),
+            bulk_row('not an email'),
+            bulk_row(BULK_EMAILS[0]),
+            bulk_row(BULK_EMAILS[1])]
+    results = ppl.bulk_create_people(rows)
+    statuses = [result[dbc.BULK_STATUS] for result in results]
+    assert statuses == [dbc.BULK_CREATED, dbc.BULK_FAILED,
+                        dbc.BULK_FAILED, dbc.BULK_CREATED]
+    assert [result[EMAIL] for result in results] == [
+        row[EMAIL] for row in rows]
+    for email in BULK_EMAILS:
+        assert ppl.exists(email)
+
+
+def test_bulk_create_people_ordered(no_bulk_people):
+    rows = [bulk_row(BULK_EMAILS[0]),
+            bulk_row(BULK_EMAILS[0]),
+            bulk_row(BULK_EMAILS[1])]
+    results = ppl.bulk_create_people(rows, ordered=True)
+    statuses = [result[dbc.BULK_STATUS] for result in results]
+    assert statuses == [dbc.BULK_CREATED, dbc.BULK_FAILED,
+                        dbc.BULK_SKIPPED]
+    assert not ppl.exists(BULK_EMAILS[1])
+
+
+def test_bulk_upsert_people(no_bulk_people):
+    ppl.bulk_create_people([bulk_row(BULK_EMAILS[0])])
+    results = ppl.bulk_create_people([bulk_row(BULK_EMAILS[1]),
+                                      bulk_row(BULK_EMAILS[0], 'Renamed')],
+                                     upsert=True)
+    statuses = [result[dbc.BULK_STATUS] for result in results]
+    assert statuses == [dbc.BULK_CREATED, dbc.BULK_UPDATED]
+    assert ppl.read_one(BULK_EMAILS[0])[NAME] == 'Renamed'
@@ -0,0 +1,82 @@
+from unittest.mock import patch
+
+import pytest
+
+import data.query_cache as qc
+
+TEST_DB = 'testDB'
+TEST_COLLECT = 'things'
+
+
+@pytest.fixture
+def cache():
+    cache = qc.QueryCache(max_size=2)
+    cache.enable(TEST_COLLECT, ttl=10)
+    return cache
+
+
+def make_key(cache, filt):
+    return cache.make_key(TEST_DB, TEST_COLLECT, 'read', filt)
+
+
+def test_miss_then_hit(cache):
+    key = make_key(cache, {'a': 1})
+    assert cache.get(key) == (False, None)
+    cache.put(key, {'a': 1})
+    assert cache.get(key) == (True, {'a': 1})
+    stats = cache.get_stats()
+    assert stats[qc.HITS] == 1
+    assert stats[qc.MISSES] == 1
+
+
+def test_key_ignores_dict_order(cache):
+    assert (make_key(cache, {'a': 1, 'b': 2})
+            == make_key(cache, {'b': 2, 'a': 1}))
+
+
+def test_returns_copies(cache):
+    key = make_key(cache, {})
+    cache.put(key, {'list': [1]})
+    _, val = cache.get(key)
+    val['list'].append(2)
+    assert cache.get(key) == (True, {'list': [1]})
+
+
+def test_lru_eviction(cache):
+    keys = [make_key(cache, {'n': n}) for n in range(3)]
+    cache.put(keys[0], 0)
+    cache.put(keys[1], 1)
+    cache.get(keys[0])  # now keys[1] is least recently used
+    cache.put(keys[2], 2)
+    assert cache.get(keys[1]) == (False, None)
+    assert cache.get(keys[0]) == (True, 0)
+    assert cache.get_stats()[qc.EVICTIONS] == 1
+
+
+def test_ttl_expiry(cache):
+    key = make_key(cache, {})
+    with patch('time.monotonic', return_value=100):
+        cache.put(key, 'val')
+    with patch('time.monotonic', return_value=105):
+        assert cache.get(key) == (True, 'val')
+    with patch('time.monotonic', return_value=111):
+        assert cache.get(key) == (False, None)
+    assert cache.get_stats()[qc.EXPIRATIONS] == 1
+
+
+def test_invalidate(cache):
+    key = make_key(cache, {})
+    cache.put(key, 'val')
+    cache.invalidate(TEST_DB, TEST_COLLECT)
+    assert cache.get(make_key(cache, {})) == (False, None)
+
+
+def test_not_enabled(cache):
+    key = cache.make_key(TEST_DB, 'not cached', 'read', {})
+    cache.put(key, 'val')
+    assert cache.get(key) == (False, None)
+
+
+def test_bad_ttl(cache):
+    with pytest.raises(ValueError):
+        cache.enable(TEST_COLLECT, ttl=0)
@@ -0,0 +1,143 @@
+import pytest
+
+import data.db_connect as dbc
+import data.manuscripts.manuscript as mt
+import data.people as ppl
+import data.suggest as sg
+from data.roles import TEST_CODE as TEST_ROLE_CODE
+
+TEMP_EMAIL = 'suggest_temp@temp.org'
+TEMP_NAME = 'Zoë Quintanilla'
+TEMP_TITLE = 'Zzyzx Suggest Test Title'
+
+
+def make_index(*items) -> sg.PrefixIndex:
+    index = sg.PrefixIndex()
+    for item_id, text in items:
+        index.add(item_id, sg.make_keys(text), {'id': item_id})
+    return index
+
+
+def test_normalize():
+    assert sg.normalize('  Zoë   QUINTANILLA ') == 'zoe quintanilla'
+
+
+def test_make_keys():
+    assert sg.make_keys('Jane Smith', None, 'js@nyu.edu') == {
+        'jane smith', 'jane', 'smith', 'js@nyu.edu'}
+
+
+def test_lookup_word_prefix():
+    index = make_index(('1', 'Jane Smith'), ('2', 'Smithers'),
+                       ('3', 'John Doe'))
+    # in key order: "smith" before "smithers"
+    assert index.lookup('SMI', 10) == [{'id': '1'}, {'id': '2'}]
+    assert index.lookup('smithe', 10) == [{'id': '2'}]
+    assert index.lookup('x', 10) == []
+    assert index.lookup('  ', 10) == []
+
+
+def test_lookup_no_duplicates():
+    index = make_index(('1', 'Jane Janeway'))
+    assert index.lookup('jane', 10) == [{'id': '1'}]
+
+
+def test_lookup_limit():
+    index = make_index(*[(str(num), f'Name {num}') for num in range(20)])
+    assert len(index.lookup('name', 5)) == 5
+
+
+def test_add_all_matches_add():
+    items = [(str(num), sg.make_keys(f'Name {num}'), {'id': str(num)})
+             for num in range(20)]
+    index = sg.PrefixIndex()
+    index.add_all(items)
+    assert index.entries == make_index(
+        *[(str(num), f'Name {num}') for num in range(20)]).entries
+
+
+def test_add_replaces_and_remove():
+    index = make_index(('1', 'Old Name'))
+    index.add('1', sg.make_keys('New Name'), {'id': '1'})
+    assert index.lookup('old', 10) == []
+    assert index.lookup('new', 10) == [{'id': '1'}]
+    index.remove('1')
+    assert index.lookup('new', 10) == []
+    assert len(index) == 0
+    assert index.entries == []
+
+
+def test_suggest_bad_limit():
+    with pytest.raises(ValueError):
+        ppl.suggest('a', 0)
+
+
+def test_rebuild_picks_up_other_writes():
+    docs = [{'id': '1', 'name': 'Ada'}]
+    suggester = sg.Suggester(
+        'suggest_test', lambda: list(docs),
+        lambda doc: (doc['id'], sg.make_keys(doc['name']), doc))
+    assert suggester.suggest('ad') == [docs[0]]
+    # as if another worker had written it:
+    docs.append({'id': '2', 'name': 'Adele'})
+    assert len(suggester.suggest('ad')) == 1
+    suggester.rebuild()
+    assert len(suggester.suggest('ad')) == 2
+
+
+def test_rebuilds_only_for_other_workers_writes():
+    suggester = sg.Suggester('suggest_test', lambda: [],
+                             lambda doc: (doc['id'], set(), doc),
+                             rebuild_delay=60)
+    suggester.suggest('ad')
+    # our own writes reach the index through put() and delete():
+    dbc.invalidate('suggest_test')
+    assert suggester.timer is None
+    dbc.invalidate('suggest_test', remote=True)
+    assert suggester.timer is not None
+    suggester.timer.cancel()
+
+
+@pytest.fixture
+def temp_person():
+    ppl.suggest('warm up')
+    ppl.create_person(TEMP_NAME, 'NYU', TEMP_EMAIL, TEST_ROLE_CODE)
+    yield TEMP_EMAIL
+    if ppl.exists(TEMP_EMAIL):
+        ppl.delete_person(TEMP_EMAIL)
+
+
+def test_people_suggest_follows_writes(temp_person):
+    found = {ppl.NAME: TEMP_NAME, ppl.EMAIL: TEMP_EMAIL}
+    assert found in ppl.suggest('quinta')
+    assert found in ppl.suggest('zoe')
+    assert found in ppl.suggest('suggest_temp@')
+    ppl.update_person('Zed Other', 'NYU', TEMP_EMAIL, [TEST_ROLE_CODE])
+    assert found not in ppl.suggest('quinta')
+    assert {ppl.NAME: 'Zed Other', ppl.EMAIL: TEMP_EMAIL} \
+        in ppl.suggest('zed')
+    ppl.delete_person(TEMP_EMAIL)
+    assert not [person for person in ppl.suggest('suggest_temp@')
+                if person[ppl.EMAIL] == TEMP_EMAIL]
+
+
+@pytest.fixture
+def temp_manu():
+    mt.suggest('warm up')
+    if mt.exists(TEMP_TITLE):
+        mt.delete(TEMP_TITLE)
+    mt.create(TEMP_TITLE, 'Test Author', 'author@nyu.edu', 'Test Text',
+              'Test Abstract', 'editor@nyu.edu')
+    yield TEMP_TITLE
+    if mt.exists(TEMP_TITLE):
+        mt.delete(TEMP_TITLE)
+
+
+def test_manuscript_suggest_follows_writes(temp_manu):
+    found = {mt.TITLE: TEMP_TITLE, mt.AUTHOR: 'Test Author'}
+    assert found in mt.suggest('zzyz')
+    mt.update(TEMP_TITLE, {mt.AUTHOR: 'Other Author'})
+    assert {mt.TITLE: TEMP_TITLE, mt.AUTHOR: 'Other Author'} \
+        in mt.suggest('zzyz')
+    mt.delete(TEMP_TITLE)
+    assert mt.suggest('zzyzx') == []
@@ -1,6 +1,9 @@
 from functools import wraps
 
 # import data.db_connect as dbc
+import data.logger as lg
+
+log = lg.get_logger(__name__)
 
 """
 Our record format to meet our requirements (see security.md) will be:
@@ -64,6 +67,8 @@ DUAL_FACTOR = 'dual_factor'
 # Features:
 PEOPLE = 'people'
 TEXTS = 'texts'
+MANUSCRIPTS = 'manuscripts'
+DB_METRICS = 'db_metrics'
 BAD_FEATURE = 'baaaad feature'
 
 PEOPLE_MISSING_ACTION = READ
@@ -85,6 +90,13 @@ TEST_RECS = {
         DELETE: PEOPLE_CHANGE_PERMISSIONS,
         UPDATE: PEOPLE_CHANGE_PERMISSIONS,
     },
+    MANUSCRIPTS: {
+        CREATE: PEOPLE_CHANGE_PERMISSIONS,
+    },
+    DB_METRICS: {
+        READ: PEOPLE_CHANGE_PERMISSIONS,
+        DELETE: PEOPLE_CHANGE_PERMISSIONS,
+    },
     TEXTS: {
         CREATE: {
             USER_LIST: [GOOD_USER_ID],
@@ -181,6 +193,8 @@ def is_permitted(feature_name: str, action: str,
         return True
     if USER_LIST in prot[action]:
         if user_id not in prot[action][USER_LIST]:
+            log.info('security.denied', feature=feature_name, action=action,
+                     user_id=user_id, reason='user_list')
             return False
     if CHECKS not in prot[action]:
         return True
@@ -188,5 +202,7 @@ def is_permitted(feature_name: str, action: str,
         if check not in CHECK_FUNCS:
             raise ValueError(f'Bad check passed to is_permitted: {check}')
         if not CHECK_FUNCS[check](user_id, **kwargs):
+            log.info('security.denied', feature=feature_name, action=action,
+                     user_id=user_id, reason=check)
             return False
     return True
\ No newline at end of file
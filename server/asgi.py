@@ -0,0 +1,174 @@
+"""
+ASGI entry point for the API: run it with `uvicorn server.asgi:app`.
+The busiest read-only endpoints are served natively on the event loop
+with data.db_connect_async, so one process can have many of them
+waiting on MongoDB at once.
+Every other request (and any request with paging, streaming or other
+query args) is handed to the Flask app in server.endpoints unchanged,
+as is everything when data.db_connect is not using the Mongo backend.
+Flask requests each get a thread, so they run concurrently.
+Native requests get the same X-DB-Queries/X-DB-Time headers and
+DB budget check as the Flask endpoints they stand in for.
+"""
+import asyncio
+import json
+from http import HTTPStatus
+import os
+from urllib.parse import parse_qs
+import weakref
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+import werkzeug.exceptions as wz
+
+import data.backends as bk
+import data.cache_sync as cs
+import data.db_connect_async as dba
+import data.db_metrics as dbm
+import data.manuscripts.body as bdy
+import data.manuscripts.manuscript as mt
+import data.people as ppl
+import server.endpoints as ep
+
+WSGI_THREADS_VAR = 'WSGI_THREADS'
+DEFAULT_WSGI_THREADS = 32
+
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    """
+    asgiref runs a wrapped WSGI app "thread-sensitively": every
+    request on one shared thread, one at a time.
+    Ours is thread-safe, so each request runs in a ThreadSensitiveContext
+    of its own, which gives it a thread of its own; at most
+    `max_workers` run at once.
+    """
+    def __init__(self, wsgi_application, max_workers: int = None):
+        super().__init__(wsgi_application)
+        self.max_workers = max_workers or int(os.environ.get(
+            WSGI_THREADS_VAR, DEFAULT_WSGI_THREADS))
+        # an asyncio semaphore belongs to one event loop:
+        self.slots = weakref.WeakKeyDictionary()
+
+    async def __call__(self, scope, receive, send):
+        slots = self.slots.setdefault(asyncio.get_running_loop(),
+                                      asyncio.Semaphore(self.max_workers))
+        async with slots, ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+
+flask_app = ThreadPoolWsgiToAsgi(ep.app)
+
+JSON_HEADERS = [
+    (b'content-type', b'application/json'),
+    # match the CORS policy of the Flask app:
+    (b'access-control-allow-origin', b'*'),
+]
+
+
+async def send_json(send, body, status=HTTPStatus.OK,
+                    headers: dict = None):
+    payload = json.dumps(body, default=str).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': int(status),
+        'headers': JSON_HEADERS + [
+            (b'content-length', str(len(payload)).encode()),
+        ] + [(name.lower().encode(), val.encode())
+             for name, val in (headers or {}).items()],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def get_people(fields):
+    return await dba.read_dict(ppl.PEOPLE_COLLECT, ppl.EMAIL,
+                               projection=fields)
+
+
+async def get_manuscripts(fields):
+    manuscripts = await dba.read_dict(mt.MANUSCRIPTS_COLLECT, mt.TITLE,
+                                      projection=bdy.projection(fields))
+    return {title: bdy.unpack(manu) for title, manu in manuscripts.items()}
+
+
+async def get_masthead(fields):
+    people = await dba.read(ppl.PEOPLE_COLLECT, filt=ppl.MASTHEAD_FILTER)
+    return {ep.MASTHEAD: ppl.build_masthead(people)}
+
+
+ASYNC_ROUTES = {
+    ep.PEOPLE_EP: get_people,
+    f'{ep.MANUSCRIPT_EP}/read': get_manuscripts,
+    f'{ep.PEOPLE_EP}/masthead': get_masthead,
+}
+
+
+def get_async_route(scope):
+    """
+    Return (handler, fields) if we can serve this request natively,
+    else (None, None).
+    Only plain GETs, optionally with `?fields=`, qualify.
+    """
+    if scope['method'] != 'GET' or scope['path'] not in ASYNC_ROUTES:
+        return None, None
+    if bk.get_backend_name() != bk.MONGO:
+        return None, None
+    args = parse_qs(scope.get('query_string', b'').decode())
+    if set(args) - {ep.FIELDS_ARG}:
+        return None, None
+    for name, val in scope.get('headers', []):
+        if name == b'accept' and ep.NDJSON_MIME.encode() in val:
+            return None, None
+    fields = None
+    if ep.FIELDS_ARG in args:
+        fields = [fld.strip() for fld in args[ep.FIELDS_ARG][0].split(',')
+                  if fld.strip()] or None
+    return ASYNC_ROUTES[scope['path']], fields
+
+
+def get_budget(scope):
+    """
+    The DB budget of the Flask endpoint a native route stands in for.
+    """
+    try:
+        endpoint, _ = ep.app.url_map.bind('').match(scope['path'],
+                                                    scope['method'])
+    except wz.HTTPException:
+        return None
+    return ep.get_view_budget(endpoint, scope['method'])
+
+
+async def serve_native(scope, send, handler, fields):
+    cs.ensure_started()
+    counter = dbm.start_counting()
+    try:
+        body = await handler(fields)
+    except Exception as err:
+        return await send_json(send, {'message': str(err)},
+                               HTTPStatus.INTERNAL_SERVER_ERROR,
+                               ep.get_db_headers(counter))
+    finally:
+        dbm.stop_counting()
+    ep.check_db_budget(scope['method'], scope['path'], counter,
+                       get_budget(scope))
+    return await send_json(send, body, headers=ep.get_db_headers(counter))
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            cs.ensure_started()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] == 'http':
+        handler, fields = get_async_route(scope)
+        if handler:
+            return await serve_native(scope, send, handler, fields)
+    return await flask_app(scope, receive, send)
@@ -3,7 +3,9 @@ This is the file containing all of the endpoints for our flask app.
 The endpoint called `endpoints` will return all available endpoints.
 """
 
-from flask import Flask, request
+import json
+
+from flask import Flask, Response, request, stream_with_context
 from flask_cors import CORS
 from flask_restx import Api, Resource, fields
 from http import HTTPStatus
@@ -11,10 +13,19 @@ import werkzeug.exceptions as wz
 import security.security as sec
 from werkzeug.utils import secure_filename
 import os
+import threading
+import data.cache_sync as cs
+import data.db_connect as dbc
+import data.db_metrics as dbm
+import data.logger as lg
 import data.people as ppl
 import data.text as txt
+import data.manuscripts.events as evt
 import data.manuscripts.manuscript as mt
+import data.manuscripts.stats as mst
 import data.manuscripts.query as qy
+import data.manuscripts.search as srch
+import data.suggest as sg
 from data.roles import (
     get_roles,
     get_role_codes,
@@ -22,10 +33,109 @@ from data.roles import (
     get_masthead_roles,
 )
 
+log = lg.get_logger(__name__)
+
 app = Flask(__name__)
+# stored timestamps (e.g., a manuscript's state_since) are datetimes:
+app.config["RESTX_JSON"] = {"default": str}
 CORS(app, resources={r"/*": {"origins": "*"}})
 api = Api(app)
 
+
+@app.before_request
+def start_cache_sync():
+    """
+    Each worker process watches for other workers' writes
+    so its caches never serve stale data.
+    """
+    cs.ensure_started()
+
+
+DB_QUERIES_HEADER = "X-DB-Queries"
+DB_TIME_HEADER = "X-DB-Time"
+# where db_budget() stores an endpoint's budget:
+DB_BUDGET = "db_budget"
+# set to 1 to fail requests over budget outside of tests too:
+ENFORCE_BUDGETS_VAR = "DB_BUDGET_ENFORCE"
+
+
+class DBBudgetExceeded(AssertionError):
+    pass
+
+
+def db_budget(max_queries: int):
+    """
+    Declare the most DB round trips an endpoint method may make.
+    Over budget is an error in tests and a warning in production.
+    A write's budget includes the cache version bump other workers
+    poll when change streams are unavailable (see data.cache_sync).
+    """
+    def decorate(func):
+        setattr(func, DB_BUDGET, max_queries)
+        return func
+    return decorate
+
+
+def get_view_budget(endpoint: str, method: str):
+    view = app.view_functions.get(endpoint)
+    view_class = getattr(view, "view_class", None)
+    handler = getattr(view_class, method.lower(), None)
+    return getattr(handler, DB_BUDGET, None)
+
+
+def get_db_budget():
+    return get_view_budget(request.endpoint, request.method)
+
+
+def enforce_budgets() -> bool:
+    return (app.testing
+            or "PYTEST_CURRENT_TEST" in os.environ
+            or os.environ.get(ENFORCE_BUDGETS_VAR) == "1")
+
+
+@app.before_request
+def start_db_counter():
+    dbm.start_counting()
+
+
+def get_db_headers(counter: dbm.QueryCounter) -> dict:
+    return {
+        DB_QUERIES_HEADER: str(counter.queries),
+        DB_TIME_HEADER: f"{counter.seconds * 1000:.3f}",
+    }
+
+
+def check_db_budget(method: str, path: str, counter: dbm.QueryCounter,
+                    budget: int):
+    """
+    Raise DBBudgetExceeded (or, in production, log a warning)
+    if a request made more DB round trips than its budget.
+    """
+    if budget is None or counter.queries <= budget:
+        return
+    msg = (f"{method} {path} made {counter.queries} "
+           f"DB queries; its budget is {budget}: {counter.ops}")
+    if enforce_budgets():
+        raise DBBudgetExceeded(msg)
+    log.warning("db.budget.exceeded", method=method, path=path,
+                queries=counter.queries, budget=budget, ops=counter.ops)
+
+
+@app.after_request
+def add_db_headers(response):
+    counter = dbm.get_counter()
+    if counter is None:
+        return response
+    response.headers.update(get_db_headers(counter))
+    check_db_budget(request.method, request.path, counter, get_db_budget())
+    return response
+
+
+@app.teardown_request
+def stop_db_counter(exc):
+    dbm.stop_counting()
+
+
 ENDPOINT_EP = "/endpoints"
 HELLO_EP = "/hello"
 TITLE_EP = "/title"
@@ -35,6 +145,8 @@ MANUSCRIPT_EP = "/manuscript"
 
 MESSAGE = "Message"
 RETURN = "return"
+# who is making a request, where the body says:
+USER_ID = "user_id"
 TITLE = "Journal About Ocean"
 HELLO_RESP = "hello"
 TITLE_RESP = "Title"
@@ -116,6 +228,74 @@ ALLOWED_EXTENSIONS = {"pdf", "doc", "docx"}
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 
+FIELDS_ARG = "fields"
+
+
+def get_fields_arg():
+    """
+    Parse a `?fields=a,b,c` query arg into a list of field names.
+    Returns None (meaning all fields) if the arg is absent or empty.
+    """
+    fields_str = request.args.get(FIELDS_ARG, "")
+    flds = [fld.strip() for fld in fields_str.split(",") if fld.strip()]
+    return flds or None
+
+
+LIMIT_ARG = "limit"
+NEXT_ARG = "next"
+PAGE_DATA = "data"
+PAGE_PARAMS = {
+    LIMIT_ARG: "Page size; turns on paging",
+    NEXT_ARG: "Token from the previous page",
+}
+
+
+def get_page_args():
+    """
+    Read `?limit=N&next=token` paging args.
+    Returns (None, None) when the client did not ask for a page;
+    a limit over dbc.MAX_PAGE_LIMIT is cut down to it.
+    Raises wz.BadRequest on a malformed or non-positive limit.
+    """
+    limit = request.args.get(LIMIT_ARG)
+    after = request.args.get(NEXT_ARG) or None
+    if limit is None and after is None:
+        return None, None
+    try:
+        limit = int(limit) if limit is not None else dbc.MAX_PAGE_LIMIT
+    except ValueError:
+        raise wz.BadRequest(f"Bad {LIMIT_ARG}: {limit}")
+    if limit < 1:
+        raise wz.BadRequest(f"Bad {LIMIT_ARG}: {limit}")
+    return min(limit, dbc.MAX_PAGE_LIMIT), after
+
+
+NDJSON_MIME = "application/x-ndjson"
+FORMAT_ARG = "format"
+NDJSON_FORMAT = "ndjson"
+
+
+def wants_ndjson():
+    """
+    Clients ask for a streamed listing either with `?format=ndjson`
+    or by sending `Accept: application/x-ndjson`.
+    """
+    if request.args.get(FORMAT_ARG) == NDJSON_FORMAT:
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIME
+
+
+def ndjson_response(docs):
+    """
+    Stream docs as newline-delimited JSON,
+    encoding each one as the cursor yields it.
+    """
+    def generate():
+        for doc in docs:
+            yield json.dumps(doc, default=str) + "\n"
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIME)
+
+
 def allowed_file(filename):
     return (
         "." in filename
@@ -146,9 +326,26 @@ class JournalTitle(Resource):
 class People(Resource):
     @api.response(HTTPStatus.OK, "Success")
     @api.response(HTTPStatus.NOT_FOUND, "Person not found")
+    @api.response(HTTPStatus.BAD_REQUEST, "Bad paging arguments")
+    @api.doc(params={
+        FIELDS_ARG: "Comma-separated fields to return",
+        FORMAT_ARG: "Set to ndjson to stream one person per line",
+        **PAGE_PARAMS,
+    })
+    @db_budget(1)
     def get(self):
+        if wants_ndjson():
+            return ndjson_response(ppl.iter_people(get_fields_arg()))
+        limit, after = get_page_args()
+        if limit is not None:
+            try:
+                people, next_token = ppl.read_page(limit, after,
+                                                   get_fields_arg())
+            except ValueError as e:
+                return {"message": str(e)}, HTTPStatus.BAD_REQUEST
+            return {PAGE_DATA: people, NEXT_ARG: next_token}, HTTPStatus.OK
         try:
-            people = ppl.read()
+            people = ppl.read(get_fields_arg())
             return people, HTTPStatus.OK
         except ValueError as e:
             return {"message": str(e)}, HTTPStatus.NOT_FOUND
@@ -156,6 +353,7 @@ class People(Resource):
     @api.expect(person_model)
     @api.response(HTTPStatus.OK, "Person updated successfully")
     @api.response(HTTPStatus.NOT_ACCEPTABLE, "Not acceptable")
+    @db_budget(2)
     def put(self):
         data = request.json
         name = data.get(ppl.NAME)
@@ -178,6 +376,7 @@ class People(Resource):
     @api.expect(person_model)
     @api.response(HTTPStatus.CREATED, "Person added!")
     @api.response(HTTPStatus.NOT_ACCEPTABLE, "Not acceptable")
+    @db_budget(2)
     def post(self):
         data = request.json
         name = data.get(ppl.NAME)
@@ -208,6 +407,7 @@ class People(Resource):
     @api.expect(email_model)
     @api.response(HTTPStatus.OK, "Person deleted successfully")
     @api.response(HTTPStatus.NOT_FOUND, "Person not found")
+    @db_budget(2)
     def delete(self):
         data = api.payload
         email = data.get(ppl.EMAIL)
@@ -328,51 +528,329 @@ class TextEntry(Resource):
             return {"message": "Text entry not found"}, HTTPStatus.NOT_FOUND
 
 
+BULK_PEOPLE = "people"
+BULK_MANUSCRIPTS = "manuscripts"
+BULK_ORDERED = "ordered"
+BULK_UPSERT = "upsert"
+
+bulk_people_model = api.model(
+    "BulkPeople",
+    {
+        BULK_PEOPLE: fields.List(
+            fields.Nested(person_model), required=True,
+            description="The people to add",
+        ),
+        BULK_UPSERT: fields.Boolean(
+            required=False, default=False,
+            description="Update people who already exist",
+        ),
+        BULK_ORDERED: fields.Boolean(
+            required=False, default=False,
+            description="Stop at the first failed write",
+        ),
+    },
+)
+
+
+def bulk_summary(results: list) -> dict:
+    """
+    Count the per-row results of a bulk write by status.
+    """
+    summary = {}
+    for result in results:
+        status = result[dbc.BULK_STATUS]
+        summary[status] = summary.get(status, 0) + 1
+    return summary
+
+
+@api.route(f"{PEOPLE_EP}/bulk")
+class PeopleBulk(Resource):
+    @api.expect(bulk_people_model)
+    @api.response(HTTPStatus.OK, "Rows processed; see per-row results")
+    @api.response(HTTPStatus.BAD_REQUEST, "No list of people")
+    @api.response(HTTPStatus.FORBIDDEN, "Permission denied")
+    def post(self):
+        data = request.json or {}
+        rows = data.get(BULK_PEOPLE)
+        if not isinstance(rows, list):
+            return ({MESSAGE: f"{BULK_PEOPLE} must be a list"},
+                    HTTPStatus.BAD_REQUEST)
+        if not sec.is_permitted(
+            "people", "create", data.get(USER_ID),
+            login_key=data.get("login_key"),
+        ):
+            return {"message": "Permission denied"}, HTTPStatus.FORBIDDEN
+
+        results = ppl.bulk_create_people(
+            rows,
+            upsert=bool(data.get(BULK_UPSERT)),
+            ordered=bool(data.get(BULK_ORDERED)),
+        )
+        return (
+            {MESSAGE: bulk_summary(results), RETURN: results},
+            HTTPStatus.OK,
+        )
+
+
 MASTHEAD = "Masthead"
 
 
+PREFIX_ARG = "prefix"
+SUGGEST_PARAMS = {
+    PREFIX_ARG: "What has been typed so far",
+    LIMIT_ARG: f"At most this many (default {sg.DEFAULT_LIMIT}, "
+               f"at most {sg.MAX_LIMIT})",
+}
+
+
+def get_suggest_args():
+    """
+    Read `?prefix=...&limit=N` autocomplete args.
+    Raises wz.BadRequest on a malformed limit.
+    """
+    limit = request.args.get(LIMIT_ARG)
+    try:
+        limit = int(limit) if limit is not None else sg.DEFAULT_LIMIT
+    except ValueError:
+        raise wz.BadRequest(f"Bad {LIMIT_ARG}: {limit}")
+    return request.args.get(PREFIX_ARG, ""), limit
+
+
+@api.route(f"{PEOPLE_EP}/suggest")
+class PeopleSuggest(Resource):
+    """
+    Name and email of the people whose name (or a word of it)
+    or email starts with the prefix, for autocomplete.
+    """
+    @api.response(HTTPStatus.BAD_REQUEST, "Bad limit")
+    @api.doc(params=SUGGEST_PARAMS)
+    # served from memory, once the first call has loaded the names:
+    @db_budget(1)
+    def get(self):
+        try:
+            return {PAGE_DATA: ppl.suggest(*get_suggest_args())}
+        except ValueError as e:
+            return {MESSAGE: str(e)}, HTTPStatus.BAD_REQUEST
+
+
 @api.route(f"{PEOPLE_EP}/masthead")
 class Masthead(Resource):
+    @db_budget(1)
     def get(self):
         return {MASTHEAD: ppl.get_masthead()}
 
 
 @api.route(f"{MANUSCRIPT_EP}/read")
 class Manuscripts(Resource):
+    @api.response(HTTPStatus.BAD_REQUEST, "Bad paging arguments")
+    @api.doc(params={
+        FIELDS_ARG: "Comma-separated fields to return; "
+                    "the text is only sent when named here",
+        FORMAT_ARG: "Set to ndjson to stream one manuscript per line",
+        **PAGE_PARAMS,
+    })
+    @db_budget(1)
     def get(self):
-        return mt.read()
+        if wants_ndjson():
+            return ndjson_response(mt.iter_manuscripts(get_fields_arg()))
+        limit, after = get_page_args()
+        if limit is not None:
+            try:
+                manuscripts, next_token = mt.read_page(limit, after,
+                                                       get_fields_arg())
+            except ValueError as e:
+                return {"message": str(e)}, HTTPStatus.BAD_REQUEST
+            return {PAGE_DATA: manuscripts, NEXT_ARG: next_token}
+        return mt.read(get_fields_arg())
+
+
+@api.route(f"{MANUSCRIPT_EP}/summaries")
+class ManuscriptSummaries(Resource):
+    """
+    Title, author, state, editor and referee count of each manuscript,
+    without the text or abstract.
+    """
+    @api.response(HTTPStatus.BAD_REQUEST, "Bad paging arguments")
+    @api.doc(params={
+        mt.STATE: "Only manuscripts in this state",
+        mt.AUTHOR_EMAIL: "Only manuscripts by this author",
+        mt.EDITOR_EMAIL: "Only manuscripts with this editor",
+        **PAGE_PARAMS,
+    })
+    @db_budget(1)
+    def get(self):
+        filters = {fld: request.args.get(fld)
+                   for fld in mt.SUMMARY_FILTERS}
+        limit, after = get_page_args()
+        if limit is not None:
+            try:
+                summaries, next_token = mt.read_summaries_page(
+                    limit, after, **filters)
+            except ValueError as e:
+                return {"message": str(e)}, HTTPStatus.BAD_REQUEST
+            return {PAGE_DATA: summaries, NEXT_ARG: next_token}
+        return {PAGE_DATA: mt.read_summaries(**filters)}
+
+
+SEARCH_ARG = "q"
+
+
+@api.route(f"{MANUSCRIPT_EP}/search")
+class ManuscriptSearch(Resource):
+    """
+    Manuscripts whose title, abstract or author has any of the
+    words searched for, best match first, each with a snippet.
+    """
+    @api.response(HTTPStatus.BAD_REQUEST, "No query or bad paging arguments")
+    @api.doc(params={
+        SEARCH_ARG: "The words to search for",
+        LIMIT_ARG: f"Page size (default {srch.DEFAULT_LIMIT}, "
+                   f"at most {srch.MAX_LIMIT})",
+        NEXT_ARG: PAGE_PARAMS[NEXT_ARG],
+    })
+    # without a text index in the DB: probe, rebuild and read the page
+    @db_budget(3)
+    def get(self):
+        limit, after = get_page_args()
+        try:
+            results, next_token = srch.search(
+                request.args.get(SEARCH_ARG, ""),
+                limit if limit is not None else srch.DEFAULT_LIMIT, after)
+        except ValueError as e:
+            return {MESSAGE: str(e)}, HTTPStatus.BAD_REQUEST
+        return {PAGE_DATA: results, NEXT_ARG: next_token}
+
+
+@api.route(f"{MANUSCRIPT_EP}/suggest")
+class ManuscriptSuggest(Resource):
+    """
+    Title and author of the manuscripts whose title (or a word of it)
+    starts with the prefix, for autocomplete.
+    """
+    @api.response(HTTPStatus.BAD_REQUEST, "Bad limit")
+    @api.doc(params=SUGGEST_PARAMS)
+    # served from memory, once the first call has loaded the titles:
+    @db_budget(1)
+    def get(self):
+        try:
+            return {PAGE_DATA: mt.suggest(*get_suggest_args())}
+        except ValueError as e:
+            return {MESSAGE: str(e)}, HTTPStatus.BAD_REQUEST
+
+
+UPDATE_STATE_LINK = {
+    "href": f"{MANUSCRIPT_EP}/update_state",
+    "method": "PUT",
+    "description": "Update manuscript state",
+}
+
+# the /manuscript/states response, until a manuscript write drops it:
+states_resp = None
+# bumped on every drop, so a response built from stale data
+# is never stored:
+states_generation = 0
+states_lock = threading.Lock()
+
+
+def drop_states_resp(db, collection):
+    global states_resp, states_generation
+    if collection == mt.MANUSCRIPTS_COLLECT:
+        with states_lock:
+            states_resp = None
+            states_generation += 1
+
+
+dbc.on_invalidate(drop_states_resp)
+
+
+def build_states_resp() -> dict:
+    """
+    One entry per state, however many manuscripts there are:
+    its titles (grouped by the DB) and the actions allowed in it.
+    """
+    titles_by_state = mt.read_titles_by_state()
+    by_state = {}
+    for state, titles in titles_by_state.items():
+        if state is None:
+            continue
+        by_state[state] = {
+            "titles": titles,
+            "count": len(titles),
+            "available_actions": list(
+                qy.VALID_ACTIONS_BY_STATE.get(state, ())),
+        }
+    return {
+        "states": MANUSCRIPT_STATES,
+        "by_state": by_state,
+        "_links": {"update_state": UPDATE_STATE_LINK},
+    }
+
+
+def get_states_resp() -> dict:
+    global states_resp
+    resp = states_resp
+    if resp is None:
+        generation = states_generation
+        resp = build_states_resp()
+        with states_lock:
+            if generation == states_generation:
+                states_resp = resp
+    return resp
+
+
+def make_manuscript_state(state: str) -> dict:
+    """
+    A manuscript's entry in the per-manuscript /manuscript/states map.
+    """
+    return {
+        "current_state": state,
+        "available_actions": list(qy.VALID_ACTIONS_BY_STATE.get(state, ())),
+        "_links": {"update_state": UPDATE_STATE_LINK},
+    }
+
+
+STATES_MANUSCRIPTS_ARG = "manuscripts"
 
 
 @api.route(f"{MANUSCRIPT_EP}/states")
 class ManuscriptStates(Resource):
+    """
+    The manuscripts in each state, and the actions allowed in it.
+    With `?manuscripts=1` the response also has the older
+    per-manuscript map, which can be paged.
+    """
+    @api.response(HTTPStatus.BAD_REQUEST, "Bad paging arguments")
+    @api.doc(params={
+        STATES_MANUSCRIPTS_ARG: "1 to add the per-manuscript map",
+        **PAGE_PARAMS,
+    })
+    @db_budget(1)
     def get(self):
-        # Get all manuscripts
-        manuscripts = mt.read()
-
-        # For each manuscript, get its current state and available actions
-        state_info = {}
-
-        for title, manuscript in manuscripts.items():
-            current_state = manuscript.get(mt.STATE, "")
-            available_actions = list(
-                qy.get_valid_actions_by_state(current_state)
-            )
-            state_info[title] = {
-                "current_state": current_state,
-                "available_actions": available_actions,
-                "_links": {
-                    "update_state": {
-                        "href": f"{MANUSCRIPT_EP}/update_state",
-                        "method": "PUT",
-                        "description": "Update manuscript state",
-                    }
-                },
+        limit, after = get_page_args()
+        if not request.args.get(STATES_MANUSCRIPTS_ARG):
+            if limit is not None:
+                return ({MESSAGE: "Only the per-manuscript map pages; "
+                                  f"add ?{STATES_MANUSCRIPTS_ARG}=1"},
+                        HTTPStatus.BAD_REQUEST)
+            return get_states_resp()
+        if limit is not None:
+            try:
+                manuscripts, next_token = mt.read_page(limit, after,
+                                                       [mt.STATE])
+            except ValueError as e:
+                return {"message": str(e)}, HTTPStatus.BAD_REQUEST
+            return {
+                "states": MANUSCRIPT_STATES,
+                "manuscripts": {
+                    title: make_manuscript_state(manu.get(mt.STATE, ""))
+                    for title, manu in manuscripts.items()},
+                NEXT_ARG: next_token,
             }
-
-        return {
-            "states": MANUSCRIPT_STATES,
-            "manuscripts": state_info,
-        }
+        resp = get_states_resp()
+        return {**resp, "manuscripts": {
+            title: make_manuscript_state(state)
+            for state, entry in resp["by_state"].items()
+            for title in entry["titles"]}}
 
 
 manuscript_model = api.model(
@@ -411,11 +889,51 @@ manuscript_model = api.model(
 )
 
 
+bulk_manuscripts_model = api.model(
+    "BulkManuscripts",
+    {
+        BULK_MANUSCRIPTS: fields.List(
+            fields.Nested(manuscript_model), required=True,
+            description="The manuscripts to add",
+        ),
+        BULK_ORDERED: fields.Boolean(
+            required=False, default=False,
+            description="Stop at the first failed write",
+        ),
+    },
+)
+
+
+@api.route(f"{MANUSCRIPT_EP}/bulk")
+class ManuscriptBulk(Resource):
+    @api.expect(bulk_manuscripts_model)
+    @api.response(HTTPStatus.OK, "Rows processed; see per-row results")
+    @api.response(HTTPStatus.BAD_REQUEST, "No list of manuscripts")
+    @api.response(HTTPStatus.FORBIDDEN, "Permission denied")
+    def post(self):
+        data = request.json or {}
+        rows = data.get(BULK_MANUSCRIPTS)
+        if not isinstance(rows, list):
+            return ({MESSAGE: f"{BULK_MANUSCRIPTS} must be a list"},
+                    HTTPStatus.BAD_REQUEST)
+        if not sec.is_permitted(
+            sec.MANUSCRIPTS, sec.CREATE, data.get(USER_ID),
+            login_key=data.get("login_key"),
+        ):
+            return {"message": "Permission denied"}, HTTPStatus.FORBIDDEN
+        results = mt.bulk_create(rows, ordered=bool(data.get(BULK_ORDERED)))
+        return (
+            {MESSAGE: bulk_summary(results), RETURN: results},
+            HTTPStatus.OK,
+        )
+
+
 @api.route(f"{MANUSCRIPT_EP}/create")
 class ManuscriptCreate(Resource):
     @api.expect(manuscript_model)
     @api.response(HTTPStatus.OK, "Manuscript added")
     @api.response(HTTPStatus.NOT_ACCEPTABLE, "Not acceptable")
+    @db_budget(5)
     def post(self):
         try:
             data = request.json
@@ -451,6 +969,7 @@ class ManuscriptDelete(Resource):
     @api.response(HTTPStatus.NOT_ACCEPTABLE, "Invalid request")
     @api.response(HTTPStatus.NOT_FOUND, "Manuscript not found")
     @api.response(HTTPStatus.CONFLICT, "Conflict occurred")
+    @db_budget(5)
     def delete(self):
         data = request.get_json(force=True)
         title = data.get("title", "").strip()
@@ -462,11 +981,10 @@ class ManuscriptDelete(Resource):
             )
 
         try:
-            if not mt.exists(title):
-                not_exist = f"Manuscript '{title}' does not exist."
-                return {MESSAGE: not_exist, RETURN: None}, HTTPStatus.NOT_FOUND
-
             mt.delete(title)
+        except mt.ManuscriptNotFoundError:
+            not_exist = f"Manuscript '{title}' does not exist."
+            return {MESSAGE: not_exist, RETURN: None}, HTTPStatus.NOT_FOUND
         except Exception as e:
             cant_delete = f"Could not delete manuscript: {str(e)}"
             return ({MESSAGE: cant_delete, RETURN: None}, HTTPStatus.CONFLICT)
@@ -480,8 +998,10 @@ class ManuscriptDelete(Resource):
 @api.route(f"{MANUSCRIPT_EP}/update")
 class ManuscriptUpdate(Resource):
     @api.response(HTTPStatus.OK, "Manuscript updated successfully")
+    @api.response(HTTPStatus.BAD_REQUEST, "No title, or a state change")
     @api.response(HTTPStatus.NOT_FOUND, "Manuscript not found")
     @api.response(HTTPStatus.CONFLICT, "Error updating")
+    @db_budget(3)
     def put(self):
         title = request.form.get("title")
         if not title:
@@ -489,14 +1009,12 @@ class ManuscriptUpdate(Resource):
                 {"message": "Title is required", "return": None},
                 HTTPStatus.BAD_REQUEST,
             )
-
-        if not mt.exists(title):
+        if request.form.get("state"):
             return (
-                {
-                    "message": f"Manuscript '{title}' does not exist.",
-                    "return": None,
-                },
-                HTTPStatus.NOT_FOUND,
+                {"message": "Change the state with "
+                            f"{MANUSCRIPT_EP}/update_state",
+                 "return": None},
+                HTTPStatus.BAD_REQUEST,
             )
 
         updates = {
@@ -505,7 +1023,6 @@ class ManuscriptUpdate(Resource):
             mt.TEXT: request.form.get("text"),
             mt.ABSTRACT: request.form.get("abstract"),
             mt.EDITOR_EMAIL: request.form.get("editor_email"),
-            mt.STATE: request.form.get("state"),
         }
 
         file = request.files.get("file")
@@ -541,6 +1058,9 @@ class ManuscriptUpdate(Resource):
 class ReceiveAction(Resource):
     @api.response(HTTPStatus.OK, "Action processed successfully")
     @api.response(HTTPStatus.NOT_ACCEPTABLE, "Invalid action or state")
+    @api.response(HTTPStatus.NOT_FOUND, "Manuscript not found")
+    @api.response(HTTPStatus.CONFLICT, "Manuscript state has changed")
+    @db_budget(6)
     def put(self):
         try:
             title = request.json.get(mt.TITLE)
@@ -553,28 +1073,38 @@ class ReceiveAction(Resource):
                 }, HTTPStatus.BAD_REQUEST
 
             kwargs = {}
-            manuscript = mt.read_one(title)
+            if mt.REFEREES in request.json:
+                kwargs["ref"] = request.json.get(mt.REFEREES)
+
+            manuscript = mt.update_state(
+                title, action, expected_state=curr_state,
+                actor=request.json.get(USER_ID), **kwargs
+            )
             if not manuscript:
                 title_no_found = f'Manuscript with title "{title}" not found.'
                 return ({MESSAGE: title_no_found}, HTTPStatus.NOT_FOUND)
 
-            kwargs["manu"] = manuscript
-            if mt.REFEREES in request.json:
-                kwargs["ref"] = request.json.get(mt.REFEREES)
-
-            new_state = qy.handle_action(curr_state, action, **kwargs)
-            mt.update(title, {mt.STATE: new_state})
             message_to_return = "Action processed successfully"
             return (
-                {"message": message_to_return, "new_state": new_state},
+                {
+                    "message": message_to_return,
+                    "new_state": manuscript[mt.STATE],
+                },
                 HTTPStatus.OK,
             )
+        except mt.StateConflictError as err:
+            return {"message": f"Conflict: {err}"}, HTTPStatus.CONFLICT
         except Exception as err:
             return {"message": f"Bad action: {err}"}, HTTPStatus.NOT_ACCEPTABLE
 
 
 @api.route(f"{MANUSCRIPT_EP}/update_state")
 class ManuscriptUpdateState(Resource):
+    @api.response(HTTPStatus.OK, "Manuscript state updated")
+    @api.response(HTTPStatus.NOT_ACCEPTABLE, "Invalid action or state")
+    @api.response(HTTPStatus.NOT_FOUND, "Manuscript not found")
+    @api.response(HTTPStatus.CONFLICT, "Manuscript state has changed")
+    @db_budget(6)
     def put(self):
         try:
             data = request.json
@@ -583,8 +1113,11 @@ class ManuscriptUpdateState(Resource):
             if mt.REFEREES in data:
                 kwargs["ref"] = data.get(mt.REFEREES)
 
-            mt.update_state(title, data.get(mt.ACTION), **kwargs)
-            updated = mt.read_one(title)
+            updated = mt.update_state(title, data.get(mt.ACTION),
+                                      actor=data.get(USER_ID), **kwargs)
+            if not updated:
+                title_no_found = f'Manuscript with title "{title}" not found.'
+                return ({MESSAGE: title_no_found}, HTTPStatus.NOT_FOUND)
 
             return (
                 {
@@ -596,6 +1129,8 @@ class ManuscriptUpdateState(Resource):
                 HTTPStatus.OK,
             )
 
+        except mt.StateConflictError as err:
+            return {"message": f"Conflict: {err}"}, HTTPStatus.CONFLICT
         except Exception as err:
             return (
                 {"message": f"Error updating state: {err}"},
@@ -603,11 +1138,46 @@ class ManuscriptUpdateState(Resource):
             )
 
 
+@api.route(f"{MANUSCRIPT_EP}/history/<path:title>")
+class ManuscriptHistory(Resource):
+    """
+    Every state transition of a manuscript, oldest first:
+    the action, from and to states, who did it and when.
+    """
+    @db_budget(1)
+    def get(self, title):
+        return {"title": title, "events": evt.read_history(title)}
+
+
+@api.route(f"{MANUSCRIPT_EP}/stats")
+class ManuscriptStats(Resource):
+    """
+    Dashboard counters: the number of manuscripts, and the counts
+    by state, by editor and by referee. One read, however many
+    manuscripts there are.
+    """
+    @db_budget(1)
+    def get(self):
+        return mst.read()
+
+
+@api.route(f"{MANUSCRIPT_EP}/state_stats")
+class ManuscriptStateStats(Resource):
+    """
+    How many manuscripts are in each state, and the average time
+    (in seconds) those that left a state spent there.
+    """
+    @db_budget(1)
+    def get(self):
+        return evt.read_state_stats()
+
+
 @api.route("/register")
 class Register(Resource):
     @api.expect(register_model)
     @api.response(HTTPStatus.CREATED, "User registered successfully")
     @api.response(HTTPStatus.CONFLICT, "User already exists or invalid input")
+    @db_budget(2)
     def post(self):
         data = request.json
         email = data.get("email")
@@ -633,7 +1203,7 @@ class Register(Resource):
                 HTTPStatus.CREATED,
             )
         except Exception as e:
-            print("[register endpoint] error inserting user:", e)
+            log.warning("users.register.failed", email=email, error=str(e))
             return {"message": str(e)}, HTTPStatus.CONFLICT
 
 
@@ -642,6 +1212,7 @@ class Login(Resource):
     @api.expect(login_model)
     @api.response(HTTPStatus.OK, "Login successful")
     @api.response(HTTPStatus.UNAUTHORIZED, "Invalid credentials")
+    @db_budget(1)
     def post(self):
         data = request.json
         email = data.get("email")
@@ -680,8 +1251,15 @@ class Roles(Resource):
 class Users(Resource):
     @api.response(HTTPStatus.OK, "User found")
     @api.response(HTTPStatus.NOT_FOUND, "User not found")
+    @api.doc(params={
+        "email": "The user to look up",
+        FORMAT_ARG: "Set to ndjson (without email) to stream all users",
+    })
+    @db_budget(1)
     def get(self):
         email = request.args.get("email")
+        if not email and wants_ndjson():
+            return ndjson_response(ppl.iter_users())
         if not email:
             return {"message": "Email is required"}, HTTPStatus.BAD_REQUEST
 
@@ -698,10 +1276,22 @@ class Users(Resource):
 @api.route("/editors")
 class Editors(Resource):
     @api.response(HTTPStatus.OK, "List of editors retrieved successfully")
+    @api.response(HTTPStatus.BAD_REQUEST, "Bad paging arguments")
+    @api.doc(params=PAGE_PARAMS)
+    @db_budget(1)
     def get(self):
+        editor_roles = {"editor", "consulting editor", "managing editor"}
+        limit, after = get_page_args()
+        if limit is not None:
+            try:
+                editors, next_token = ppl.read_users_page(
+                    limit, after, roles=sorted(editor_roles))
+            except ValueError as e:
+                return {"message": str(e)}, HTTPStatus.BAD_REQUEST
+            return ({"editors": list(editors), NEXT_ARG: next_token},
+                    HTTPStatus.OK)
         try:
             all_users = ppl.read_users()
-            editor_roles = {"editor", "consulting editor", "managing editor"}
             editor_emails = []
 
             for user in all_users.values():
@@ -730,10 +1320,50 @@ class SystemInfo(Resource):
             "flask_version": flask.__version__,
             "endpoints": [rule.rule for rule in api.app.url_map.iter_rules()],
             "total_endpoints": len(list(api.app.url_map.iter_rules())),
+            "db_pool": dbc.get_pool_stats(),
+            "db_cache": dbc.get_cache_stats(),
         }
         return {"data": {"system_info": info}}
 
 
+def db_metrics_permitted(action: str) -> bool:
+    """
+    The DB metrics show query shapes, so only logged-in users
+    (`user_id` and `login_key` query args) may read or reset them.
+    """
+    checks = {}
+    if sec.LOGIN_KEY in request.args:
+        checks[sec.LOGIN_KEY] = request.args[sec.LOGIN_KEY]
+    return sec.is_permitted(sec.DB_METRICS, action,
+                            request.args.get(USER_ID), **checks)
+
+
+@api.route("/dev/db-metrics")
+class DBMetrics(Resource):
+    """
+    Per-collection, per-op DB call stats and the slow-query log.
+    """
+    @api.response(HTTPStatus.OK, "Success")
+    @api.response(HTTPStatus.FORBIDDEN, "Permission denied")
+    def get(self):
+        if not db_metrics_permitted(sec.READ):
+            return {MESSAGE: "Permission denied"}, HTTPStatus.FORBIDDEN
+        return {"data": {
+            "ops": dbm.get_metrics(),
+            "slow_queries": dbm.get_slow_queries(),
+            "slow_query_ms": dbm.slow_query_ms,
+            "buckets_ms": dbm.BUCKETS_MS,
+        }}
+
+    @api.response(HTTPStatus.OK, "Metrics reset")
+    @api.response(HTTPStatus.FORBIDDEN, "Permission denied")
+    def delete(self):
+        if not db_metrics_permitted(sec.DELETE):
+            return {MESSAGE: "Permission denied"}, HTTPStatus.FORBIDDEN
+        dbm.reset()
+        return {MESSAGE: "DB metrics reset"}
+
+
 if __name__ == "__main__":
     app.run(debug=True)
     if not mt.exists("test"):
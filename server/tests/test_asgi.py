@@ -0,0 +1,157 @@
+import asyncio
+import json
+from http import HTTPStatus
+import time
+from unittest.mock import patch
+
+import pytest
+
+import data.backends as bk
+import data.db_metrics as dbm
+import data.manuscripts.body as bdy
+import data.people as ppl
+import server.asgi as asgi
+import server.endpoints as ep
+
+# only served natively on MongoDB (the rest goes to Flask):
+native_only = pytest.mark.skipif(bk.get_backend_name() != bk.MONGO,
+                                 reason='no native routes off Mongo')
+
+
+def make_scope(path, query_string=b'', headers=None) -> dict:
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': query_string,
+        'headers': headers or [],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 1234),
+    }
+
+
+async def receive():
+    return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+
+def call_app(path, query_string=b'', headers=None):
+    """
+    Send one GET through the ASGI app; return (status, json body).
+    """
+    status, _, body = call_app_headers(path, query_string, headers)
+    return status, body
+
+
+def call_app_headers(path, query_string=b'', headers=None):
+    """
+    Like call_app(), also returning the response headers as a dict.
+    """
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi.app(make_scope(path, query_string, headers), receive,
+                         send))
+    status = messages[0]['status']
+    resp_headers = {name.decode(): val.decode()
+                    for name, val in messages[0]['headers']}
+    body = b''.join(msg.get('body', b'') for msg in messages[1:])
+    return status, resp_headers, json.loads(body)
+
+
+@native_only
+def test_get_async_route():
+    handler, fields = asgi.get_async_route({
+        'method': 'GET', 'path': ep.PEOPLE_EP,
+        'query_string': b'fields=name,email'})
+    assert handler is asgi.get_people
+    assert fields == ['name', 'email']
+
+
+def test_get_async_route_paged_goes_to_flask():
+    handler, _ = asgi.get_async_route({
+        'method': 'GET', 'path': ep.PEOPLE_EP,
+        'query_string': b'limit=10'})
+    assert handler is None
+
+
+@native_only
+def test_native_people():
+    async def fake_read_dict(*args, **kwargs):
+        return {'a@nyu.edu': {'name': 'A'}}
+
+    with patch('data.db_connect_async.read_dict', fake_read_dict):
+        status, headers, body = call_app_headers(ep.PEOPLE_EP)
+    assert status == HTTPStatus.OK
+    assert body == {'a@nyu.edu': {'name': 'A'}}
+    assert headers[ep.DB_QUERIES_HEADER.lower()] == '0'
+
+
+@native_only
+def test_native_manuscripts_unpack_body():
+    async def fake_read_dict(*args, **kwargs):
+        assert kwargs['projection'] == ['title', 'text', 'text_z']
+        return {'A': bdy.pack({'title': 'A', 'text': 'Body'})}
+
+    with patch('data.db_connect_async.read_dict', fake_read_dict):
+        status, body = call_app(f'{ep.MANUSCRIPT_EP}/read',
+                                b'fields=title,text')
+    assert status == HTTPStatus.OK
+    assert body == {'A': {'title': 'A', 'text': 'Body'}}
+
+
+@native_only
+def test_native_masthead():
+    async def fake_read(*args, **kwargs):
+        return []
+
+    with patch('data.db_connect_async.read', fake_read):
+        status, body = call_app(f'{ep.PEOPLE_EP}/masthead')
+    assert status == HTTPStatus.OK
+    assert ep.MASTHEAD in body
+
+
+def test_flask_fallback():
+    status, body = call_app(ep.HELLO_EP)
+    assert status == HTTPStatus.OK
+    assert ep.HELLO_RESP in body
+
+
+@native_only
+def test_native_budget_enforced():
+    async def greedy_read_dict(*args, **kwargs):
+        for _ in range(3):
+            dbm.record(ppl.PEOPLE_COLLECT, 'find', 0.0)
+        return {}
+
+    with patch('data.db_connect_async.read_dict', greedy_read_dict):
+        with pytest.raises(ep.DBBudgetExceeded):
+            call_app(ep.PEOPLE_EP)
+
+
+def test_flask_requests_run_concurrently():
+    delay = 0.3
+
+    def slow_wsgi(environ, start_response):
+        time.sleep(delay)
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [b'{}']
+
+    wrapped = asgi.ThreadPoolWsgiToAsgi(slow_wsgi, max_workers=4)
+
+    async def send(message):
+        pass
+
+    async def call_four():
+        await asyncio.gather(*[wrapped(make_scope(ep.HELLO_EP), receive,
+                                       send) for _ in range(4)])
+
+    start = time.perf_counter()
+    asyncio.run(call_four())
+    assert time.perf_counter() - start < 2 * delay
@@ -161,6 +161,56 @@ def test_read(mock_read):
         assert len(_id) > 0
         assert NAME in person
 
+@patch('data.people.iter_people', autospec=True,
+       return_value=iter([{NAME: 'Joe Schmoe'}, {NAME: 'Jane Doe'}]))
+def test_read_ndjson(mock_iter):
+    resp = TEST_CLIENT.get(f'{ep.PEOPLE_EP}?format=ndjson')
+    assert resp.status_code == OK
+    assert resp.mimetype == ep.NDJSON_MIME
+    lines = resp.get_data(as_text=True).splitlines()
+    assert [json.loads(line)[NAME] for line in lines] == [
+        'Joe Schmoe', 'Jane Doe']
+
+
+@patch('data.people.iter_users', autospec=True,
+       return_value=iter([{ppl.EMAIL: 'a@nyu.edu'}]))
+def test_read_users_ndjson(mock_iter):
+    resp = TEST_CLIENT.get('/users',
+                           headers={'Accept': ep.NDJSON_MIME})
+    assert resp.status_code == OK
+    assert resp.mimetype == ep.NDJSON_MIME
+    assert json.loads(resp.get_data(as_text=True)) == {ppl.EMAIL: 'a@nyu.edu'}
+
+
+@patch('data.people.read_page', autospec=True,
+       return_value=({'a@nyu.edu': {NAME: 'Joe Schmoe'}}, 'token'))
+def test_read_page(mock_read_page):
+    resp = TEST_CLIENT.get(f'{ep.PEOPLE_EP}?limit=1&next=prev')
+    assert resp.status_code == OK
+    resp_json = resp.get_json()
+    assert resp_json[ep.NEXT_ARG] == 'token'
+    assert 'a@nyu.edu' in resp_json[ep.PAGE_DATA]
+    mock_read_page.assert_called_once_with(1, 'prev', None)
+
+
+def test_read_page_bad_limit():
+    resp = TEST_CLIENT.get(f'{ep.PEOPLE_EP}?limit=lots')
+    assert resp.status_code == BAD_REQUEST
+
+
+@pytest.mark.parametrize('limit', ['0', '-5'])
+def test_read_page_non_positive_limit(limit):
+    resp = TEST_CLIENT.get(f'{ep.PEOPLE_EP}?limit={limit}')
+    assert resp.status_code == BAD_REQUEST
+
+
+@patch('data.people.read_page', autospec=True, return_value=({}, None))
+def test_read_page_limit_clamped(mock_read_page):
+    resp = TEST_CLIENT.get(f'{ep.PEOPLE_EP}?limit=1000000')
+    assert resp.status_code == OK
+    mock_read_page.assert_called_once_with(ep.dbc.MAX_PAGE_LIMIT, None, None)
+
+
 @patch('data.people.read', autospec=True, return_value={})
 def test_read_nonexistent_person(mock_read):
     resp = TEST_CLIENT.get(ep.PEOPLE_EP)
@@ -518,7 +568,7 @@ def create_test_manuscript():
 
 def test_update_manuscript(create_test_manuscript):
     # Verify that the manuscript was created
-    manuscript = mt.read_one(TEST_TITLE)
+    manuscript = mt.read_one(TEST_TITLE, with_body=True)
     assert manuscript is not None
     assert manuscript[mt.TITLE] == TEST_TITLE
     assert manuscript[mt.AUTHOR] == TEST_AUTHOR
@@ -557,6 +607,13 @@ def test_read_manuscripts(mock_read):
         assert len(title) > 0
         assert mt.TITLE in manu
 
+@patch('data.manuscripts.manuscript.read', autospec=True,
+       return_value={'title': {mt.TITLE: 'Test Title'}})
+def test_read_manuscripts_fields(mock_read):
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/read?fields=title, state')
+    assert resp.status_code == OK
+    mock_read.assert_called_once_with([mt.TITLE, mt.STATE])
+
 def test_manuscript_update_state():
     update_title = "Test ManuscriptUpdateState"
     if mt.exists(update_title):
@@ -613,7 +670,6 @@ def test_manuscript_update_endpoint():
         mt.TEXT: "Updated text",
         mt.ABSTRACT: "Updated abstract",
         mt.EDITOR_EMAIL: "updated_editor@example.com",
-        mt.STATE: "Submitted"
     }
 
     # 发送 PUT 请求（multipart/form-data 格式）
@@ -631,7 +687,7 @@ def test_manuscript_update_endpoint():
     data = response.get_json()
     assert "Manuscript updated successfully" in data.get("message", "")
 
-    updated_manuscript = mt.read_one(title)
+    updated_manuscript = mt.read_one(title, with_body=True)
     assert updated_manuscript[mt.AUTHOR] == "Updated Author"
     assert updated_manuscript[mt.AUTHOR_EMAIL] == "updated@example.com"
     assert updated_manuscript[mt.TEXT] == "Updated text"
@@ -641,6 +697,13 @@ def test_manuscript_update_endpoint():
     mt.delete(title)
 
 
+def test_manuscript_update_endpoint_state():
+    resp = TEST_CLIENT.put(f'{MANUSCRIPT_EP}/update',
+                           data={mt.TITLE: 'Any Title', mt.STATE: 'REJ'},
+                           content_type='multipart/form-data')
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
 @patch('server.endpoints.qy.handle_action', return_value='NEW_STATE')
 def test_receive_action_endpoint(mock_handle_action):
     title = "Test Receive Action Manuscript"
@@ -677,3 +740,258 @@ def test_receive_action_endpoint(mock_handle_action):
 
     # Cleanup: delete the test manuscript
     mt.delete(title)
+
+
+def test_receive_action_conflict():
+    title = "Test Receive Action Conflict"
+    if mt.exists(title):
+        mt.delete(title)
+    mt.create(title, "Test Author", "test@example.com", "Test text",
+              "Test abstract", "editor@example.com")
+    payload = {
+        mt.TITLE: title,
+        mt.STATE: "REV",  # the manuscript is really in SUB
+        mt.ACTION: "ACC",
+    }
+    response = TEST_CLIENT.put(f'{MANUSCRIPT_EP}/receive_action', json=payload)
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert mt.read_one(title)[mt.STATE] == "SUB"
+    mt.delete(title)
+
+
+def test_manuscript_update_state_not_found():
+    title = "Test ManuscriptUpdateState Missing"
+    if mt.exists(title):
+        mt.delete(title)
+    resp = TEST_CLIENT.put(f'{MANUSCRIPT_EP}/update_state',
+                           json={mt.TITLE: title, mt.ACTION: "REJ"})
+    assert resp.status_code == NOT_FOUND
+
+
+@patch('data.people.bulk_create_people', autospec=True,
+       return_value=[{'status': 'created', ppl.EMAIL: 'a@nyu.edu'},
+                     {'status': 'failed', ppl.EMAIL: 'bad'}])
+def test_people_bulk(mock_bulk):
+    rows = [{ppl.EMAIL: 'a@nyu.edu'}, {ppl.EMAIL: 'bad'}]
+    resp = TEST_CLIENT.post(f'{ep.PEOPLE_EP}/bulk',
+                            json={ep.BULK_PEOPLE: rows, 'login_key': 'key'})
+    assert resp.status_code == OK
+    resp_json = resp.get_json()
+    assert resp_json['Message'] == {'created': 1, 'failed': 1}
+    assert len(resp_json['return']) == 2
+    mock_bulk.assert_called_once_with(rows, upsert=False, ordered=False)
+
+
+def test_people_bulk_not_a_list():
+    resp = TEST_CLIENT.post(f'{ep.PEOPLE_EP}/bulk',
+                            json={ep.BULK_PEOPLE: 'nope', 'login_key': 'k'})
+    assert resp.status_code == BAD_REQUEST
+
+
+@patch('data.manuscripts.manuscript.bulk_create', autospec=True,
+       return_value=[{'status': 'created', mt.TITLE: 'A'}])
+def test_manuscript_bulk(mock_bulk):
+    rows = [{mt.TITLE: 'A'}]
+    resp = TEST_CLIENT.post(f'{MANUSCRIPT_EP}/bulk',
+                            json={ep.BULK_MANUSCRIPTS: rows,
+                                  ep.BULK_ORDERED: True,
+                                  'login_key': 'key'})
+    assert resp.status_code == OK
+    mock_bulk.assert_called_once_with(rows, ordered=True)
+
+
+@patch('security.security.is_permitted', autospec=True, return_value=False)
+@patch('data.manuscripts.manuscript.bulk_create', autospec=True)
+def test_manuscript_bulk_not_permitted(mock_bulk, mock_permitted):
+    resp = TEST_CLIENT.post(f'{MANUSCRIPT_EP}/bulk',
+                            json={ep.BULK_MANUSCRIPTS: [{mt.TITLE: 'A'}],
+                                  ep.USER_ID: 'someone@nyu.edu'})
+    assert resp.status_code == HTTPStatus.FORBIDDEN
+    mock_permitted.assert_called_once_with(
+        'manuscripts', 'create', 'someone@nyu.edu', login_key=None)
+    mock_bulk.assert_not_called()
+
+
+DB_METRICS_URL = '/dev/db-metrics'
+DB_METRICS_LOGIN = {'user_id': 'ejc369@nyu.edu', 'login_key': 'key'}
+
+
+def test_db_metrics():
+    TEST_CLIENT.get(ep.PEOPLE_EP)
+    resp = TEST_CLIENT.get(DB_METRICS_URL, query_string=DB_METRICS_LOGIN)
+    assert resp.status_code == OK
+    data = resp.get_json()['data']
+    assert isinstance(data['ops'], list)
+    assert isinstance(data['slow_queries'], list)
+    resp = TEST_CLIENT.delete(DB_METRICS_URL, query_string=DB_METRICS_LOGIN)
+    assert resp.status_code == OK
+
+
+def test_db_metrics_needs_login():
+    assert TEST_CLIENT.get(DB_METRICS_URL).status_code == FORBIDDEN
+    assert TEST_CLIENT.delete(DB_METRICS_URL).status_code == FORBIDDEN
+
+
+def test_db_headers():
+    resp = TEST_CLIENT.get(ep.PEOPLE_EP)
+    assert int(resp.headers[ep.DB_QUERIES_HEADER]) <= 1
+    assert float(resp.headers[ep.DB_TIME_HEADER]) >= 0
+
+
+def test_db_budget_declared():
+    assert getattr(ep.ManuscriptDelete.delete, ep.DB_BUDGET) == 5
+
+
+def n_plus_one_read(fields=None):
+    for _ in range(3):
+        ep.dbm.record(ppl.PEOPLE_COLLECT, 'find_one', 0.001)
+    return {}
+
+
+@patch('data.people.read', side_effect=n_plus_one_read)
+def test_db_budget_exceeded(mock_read):
+    resp = TEST_CLIENT.get(ep.PEOPLE_EP)
+    assert resp.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+@patch('data.people.read', side_effect=n_plus_one_read)
+def test_db_budget_warns_in_production(mock_read):
+    with patch('server.endpoints.enforce_budgets', return_value=False):
+        resp = TEST_CLIENT.get(ep.PEOPLE_EP)
+    assert resp.status_code == OK
+    assert resp.headers[ep.DB_QUERIES_HEADER] == '3'
+
+
+@patch('data.manuscripts.manuscript.read_summaries', autospec=True,
+       return_value=[{mt.TITLE: 'A', mt.STATE: 'SUB'}])
+def test_manuscript_summaries(mock_read):
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/summaries?state=SUB')
+    assert resp.status_code == OK
+    assert resp.get_json()[ep.PAGE_DATA] == [{mt.TITLE: 'A', mt.STATE: 'SUB'}]
+    mock_read.assert_called_once_with(state='SUB', author_email=None,
+                                      editor_email=None)
+
+
+def test_manuscript_summaries_page():
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/summaries?limit=1')
+    assert resp.status_code == OK
+    assert ep.NEXT_ARG in resp.get_json()
+
+
+@patch('data.manuscripts.manuscript.read_titles_by_state', autospec=True,
+       return_value={'SUB': ['A', 'B'], 'REV': ['C']})
+def test_manuscript_states(mock_group):
+    ep.drop_states_resp(None, mt.MANUSCRIPTS_COLLECT)
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/states')
+    assert resp.status_code == OK
+    by_state = resp.get_json()['by_state']
+    assert by_state['SUB']['titles'] == ['A', 'B']
+    assert by_state['SUB']['count'] == 2
+    assert by_state['REV']['available_actions'] == list(
+        ep.qy.VALID_ACTIONS_BY_STATE['REV'])
+    # served from the cached response:
+    TEST_CLIENT.get(f'{MANUSCRIPT_EP}/states')
+    assert mock_group.call_count == 1
+    # until a manuscript write invalidates it:
+    ep.dbc.invalidate(mt.MANUSCRIPTS_COLLECT)
+    TEST_CLIENT.get(f'{MANUSCRIPT_EP}/states')
+    assert mock_group.call_count == 2
+    ep.drop_states_resp(None, mt.MANUSCRIPTS_COLLECT)
+
+
+@patch('data.manuscripts.manuscript.read_titles_by_state', autospec=True,
+       return_value={'SUB': ['A', 'B'], 'REV': ['C']})
+def test_manuscript_states_per_manuscript(mock_group):
+    ep.drop_states_resp(None, mt.MANUSCRIPTS_COLLECT)
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/states?manuscripts=1')
+    assert resp.status_code == OK
+    manuscripts = resp.get_json()['manuscripts']
+    assert manuscripts['C']['current_state'] == 'REV'
+    assert manuscripts['A']['available_actions'] == list(
+        ep.qy.VALID_ACTIONS_BY_STATE['SUB'])
+    assert 'update_state' in manuscripts['A']['_links']
+    ep.drop_states_resp(None, mt.MANUSCRIPTS_COLLECT)
+
+
+def test_manuscript_states_page():
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/states?limit=1')
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/states?manuscripts=1&limit=1')
+    assert resp.status_code == OK
+    assert len(resp.get_json()['manuscripts']) <= 1
+    assert ep.NEXT_ARG in resp.get_json()
+
+
+def test_manuscript_history():
+    title = "Test Manuscript History"
+    if mt.exists(title):
+        mt.delete(title)
+    mt.create(title, TEST_AUTHOR, TEST_AUTHOR_EMAIL, TEST_TEXT,
+              TEST_ABSTRACT, TEST_EDITOR_EMAIL)
+    resp = TEST_CLIENT.put(f'{MANUSCRIPT_EP}/update_state',
+                           json={mt.TITLE: title, mt.ACTION: "REJ",
+                                 ep.USER_ID: TEST_EDITOR_EMAIL})
+    assert resp.status_code == OK
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/history/{title}')
+    assert resp.status_code == OK
+    last = resp.get_json()['events'][-1]
+    assert last[ep.evt.ACTION] == "REJ"
+    assert last[ep.evt.FROM_STATE] == "SUB"
+    assert last[ep.evt.ACTOR] == TEST_EDITOR_EMAIL
+    mt.delete(title)
+
+
+def test_manuscript_state_stats():
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/state_stats')
+    assert resp.status_code == OK
+    stats = resp.get_json()
+    assert set(stats) == set(ep.qy.VALID_STATES)
+    assert ep.evt.COUNT in stats['SUB']
+
+
+@patch('data.manuscripts.stats.read', autospec=True,
+       return_value={'total': 1, 'by_state': {'SUB': 1}, 'by_editor': {},
+                     'by_referee': {}})
+def test_manuscript_stats(mock_read):
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/stats')
+    assert resp.status_code == OK
+    assert resp.get_json()['by_state'] == {'SUB': 1}
+
+
+def test_manuscript_search_no_query():
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/search?q=')
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
+@patch('data.manuscripts.search.search', autospec=True,
+       return_value=([{'title': 'A', 'score': 1.0, 'snippet': 'a'}], 'tok'))
+def test_manuscript_search(mock_search):
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/search?q=ocean&limit=5')
+    assert resp.status_code == OK
+    assert resp.get_json() == {'data': [{'title': 'A', 'score': 1.0,
+                                         'snippet': 'a'}],
+                               'next': 'tok'}
+    mock_search.assert_called_once_with('ocean', 5, None)
+
+
+@patch('data.people.suggest', autospec=True,
+       return_value=[{'name': 'Jane Smith', 'email': 'js@nyu.edu'}])
+def test_people_suggest(mock_suggest):
+    resp = TEST_CLIENT.get(f'{ep.PEOPLE_EP}/suggest?prefix=smi&limit=5')
+    assert resp.status_code == OK
+    assert resp.get_json() == {'data': [{'name': 'Jane Smith',
+                                         'email': 'js@nyu.edu'}]}
+    mock_suggest.assert_called_once_with('smi', 5)
+
+
+def test_people_suggest_bad_limit():
+    resp = TEST_CLIENT.get(f'{ep.PEOPLE_EP}/suggest?prefix=a&limit=x')
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+    resp = TEST_CLIENT.get(f'{ep.PEOPLE_EP}/suggest?prefix=a&limit=0')
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_manuscript_suggest():
+    resp = TEST_CLIENT.get(f'{MANUSCRIPT_EP}/suggest?prefix=')
+    assert resp.status_code == OK
+    assert resp.get_json() == {'data': []}